@@ -26,5 +26,10 @@ class UserSettings(models.Model):
     glucose_target_high = models.IntegerField(default=180)
     glucose_target_very_high = models.IntegerField(default=250)
 
+    @property
+    def target_range(self) -> tuple:
+        """(glucose_target_low, glucose_target_high) in mg/dL."""
+        return self.glucose_target_low, self.glucose_target_high
+
     def __str__(self):
         return f"Settings for {self.user.username}"
@@ -5,6 +5,7 @@ from ninja import Query, Router
 
 from api.schemas.bolus_schema import BolusInSchema, BolusOutSchema
 from diafit_backend.models import BolusEntity
+from summary.services.dirty_tracking import mark_summary_days_dirty
 
 router = Router(tags=["Bolus"])
 
@@ -18,6 +19,7 @@ router = Router(tags=["Bolus"])
 def create_bolus(request, payload: BolusInSchema):
     bolus = BolusEntity(**payload.dict())
     bolus.save()
+    mark_summary_days_dirty([bolus], "timestamp_utc")
     return bolus
 
 
@@ -30,6 +32,7 @@ def create_bolus(request, payload: BolusInSchema):
 def bulk_create_bolus(request, payloads: List[BolusInSchema]):
     entries = [BolusEntity(**p.dict()) for p in payloads]
     BolusEntity.objects.bulk_create(entries, ignore_conflicts=True)
+    mark_summary_days_dirty(entries, "timestamp_utc")
     return 201, f"Inserted {len(entries)} bolus records."
 
 
@@ -4,6 +4,7 @@ from ninja import Query, Router
 
 from api.schemas.cgm_schema import CgmInSchema, CgmOutSchema
 from diafit_backend.models import CgmEntity
+from summary.services.dirty_tracking import mark_summary_days_dirty
 
 router = Router(tags=["CGM"])
 
@@ -55,6 +56,7 @@ def create_cgm(request, payload: CgmInSchema):
     """
     cgm_entry = CgmEntity(**payload.dict())
     cgm_entry.save()
+    mark_summary_days_dirty([cgm_entry], "timestamp")
     return cgm_entry
 
 
@@ -74,5 +76,6 @@ def create_cgm_bulk(request, payload: list[CgmInSchema]):
 
     # Bulk insert all at once
     created = CgmEntity.objects.bulk_create(cgm_objects)
+    mark_summary_days_dirty(created, "timestamp")
 
     return created
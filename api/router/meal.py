@@ -5,6 +5,7 @@ from ninja import Query, Router
 
 from api.schemas.meal_schema import MealInSchema, MealOutSchema, MealUpdateSchema
 from diafit_backend.models import MealEntity
+from summary.services.dirty_tracking import mark_summary_days_dirty
 
 router = Router(tags=["Meal"])
 
@@ -18,6 +19,7 @@ router = Router(tags=["Meal"])
 def create_meal(request, payload: MealInSchema):
     meal = MealEntity(**payload.dict())
     meal.save()
+    mark_summary_days_dirty([meal], "meal_time_utc")
     return meal
 
 
@@ -29,9 +31,12 @@ def create_meal(request, payload: MealInSchema):
 )
 def update_meal(request, meal_id: int, payload: MealUpdateSchema):
     meal = MealEntity.objects.get(id=meal_id)
+    # Both the old and the new meal day change
+    mark_summary_days_dirty([meal], "meal_time_utc")
     for attr, value in payload.dict(exclude_unset=True).items():
         setattr(meal, attr, value)
     meal.save()
+    mark_summary_days_dirty([meal], "meal_time_utc")
     return meal
 
 
@@ -44,6 +49,7 @@ def update_meal(request, meal_id: int, payload: MealUpdateSchema):
 def bulk_create_meal(request, payloads: List[MealInSchema]):
     entries = [MealEntity(**p.dict()) for p in payloads]
     MealEntity.objects.bulk_create(entries, ignore_conflicts=True)
+    mark_summary_days_dirty(entries, "meal_time_utc")
     return 201, f"Inserted {len(entries)} meal records."
 
 
@@ -9,6 +9,7 @@ from api.schemas.sleep_schema import (
     SleepStageOutSchema,
 )
 from diafit_backend.models import SleepSessionEntity, SleepStageEntity
+from summary.services.dirty_tracking import mark_summary_days_dirty
 
 router = Router(tags=["Sleep"])
 
@@ -38,6 +39,8 @@ def create_sleep_session(request, payload: SleepSessionInSchema):
         # Recalculate stage-specific durations
         session.calculate_stage_durations()
 
+    mark_summary_days_dirty([session], "start_time", "end_time")
+
     # Return session with stages
     return SleepSessionOutSchema(
         **{
@@ -199,6 +202,7 @@ def delete_sleep_session(request, session_id: int):
     """
     try:
         session = SleepSessionEntity.objects.get(id=session_id)
+        mark_summary_days_dirty([session], "start_time", "end_time")
         session.delete()
         return 204, None
     except SleepSessionEntity.DoesNotExist:
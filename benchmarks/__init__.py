@@ -0,0 +1,11 @@
+"""
+Benchmarks
+
+Synthetic multi-user data (synthetic, generator), timed scenarios of the
+summary tasks, the AGP pipeline, the home page and the list endpoints
+(scenarios) and their measurement (measure). Run with
+`python manage.py benchmark`.
+
+The AGP functions also have database-free micro-benchmarks on in-memory
+fixtures (micro), run with `python -m benchmarks.micro`.
+"""
@@ -0,0 +1,259 @@
+"""
+Synthetic Data Generator
+
+Writes the synthetic data of benchmark users (see synthetic.py): CGM at a
+5-minute cadence with meal excursions and sensor gaps, meal boluses and
+corrections, meals, one sleep session per night and heart rate. Everything
+is computed with numpy per user and written with bulk inserts.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from pytz import timezone as pytz_timezone
+
+from accounts.models.usersettings import UserSettings
+from diafit_backend.models.bolus_entity import BolusEntity
+from diafit_backend.models.cgm_entity import CgmDirection, CgmEntity
+from diafit_backend.models.hr_entity import HeartRateEntity
+from diafit_backend.models.meal_entity import ImpactType, MealEntity
+from diafit_backend.models.sleep_entity import SleepSessionEntity, SleepType
+
+from .synthetic import (
+    generate_boluses,
+    generate_cgm,
+    generate_heart_rate,
+    generate_meals,
+    generate_sleep,
+)
+
+BENCH_USER_PREFIX = "bench_"
+BENCH_SOURCE = "benchmark"
+BENCH_PUMP_TYPE = "Synthetic"
+
+BATCH_SIZE = 5000
+
+# Upper bounds of the five-minute rate (mg/dL) of each trend arrow
+DIRECTIONS = (
+    (-15, CgmDirection.DOUBLE_DOWN),
+    (-10, CgmDirection.SINGLE_DOWN),
+    (-5, CgmDirection.FORTYFIVE_DOWN),
+    (5, CgmDirection.FLAT),
+    (10, CgmDirection.FORTYFIVE_UP),
+    (15, CgmDirection.SINGLE_UP),
+    (np.inf, CgmDirection.DOUBLE_UP),
+)
+
+
+@dataclass
+class GeneratedCounts:
+    """Number of rows written per model."""
+
+    users: int = 0
+    cgm: int = 0
+    bolus: int = 0
+    meals: int = 0
+    sleep: int = 0
+    heart_rate: int = 0
+
+    def add(self, other: "GeneratedCounts"):
+        for field in self.__dataclass_fields__:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+def get_bench_users():
+    """Queryset of all benchmark users."""
+    return get_user_model().objects.filter(username__startswith=BENCH_USER_PREFIX)
+
+
+def delete_bench_users() -> int:
+    """Delete all benchmark users and their data, return the number of users."""
+    users = get_bench_users()
+    count = users.count()
+    users.delete()
+    return count
+
+
+def generate_bench_data(
+    n_users: int, days: int, now: Optional[datetime] = None, seed: int = 0
+) -> tuple:
+    """
+    Create n_users benchmark users with data from days before today until now.
+
+    Args:
+        n_users (int): Number of users
+        days (int): Number of complete days of data before today
+        now (datetime, optional): End of the data (defaults to the current time)
+        seed (int): Seed of the random generator, runs with equal seeds and
+                    times write equal data
+
+    Returns:
+        (users, GeneratedCounts)
+    """
+    now = now or datetime.now(dt_timezone.utc)
+    rng = np.random.default_rng(seed)
+
+    User = get_user_model()
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{BENCH_USER_PREFIX}{seed}_{i:04d}")
+                for i in range(n_users)
+            ]
+        )
+        # bulk_create skips the post_save signal creating the settings
+        UserSettings.objects.bulk_create(
+            [UserSettings(user=user, timezone=settings.TIME_ZONE) for user in users]
+        )
+
+    counts = GeneratedCounts(users=len(users))
+    for user in users:
+        with transaction.atomic():
+            counts.add(generate_user_data(user, days, now, rng))
+    return users, counts
+
+
+def generate_user_data(user, days: int, now: datetime, rng) -> GeneratedCounts:
+    """Generate and bulk insert the data of one user."""
+    today = now.astimezone(pytz_timezone(settings.TIME_ZONE)).date()
+    day_starts = _local_day_starts(today - timedelta(days=days), days + 1)
+    start, end = int(day_starts[0]), int(now.timestamp())
+
+    meal_times, meal_types, carbs = generate_meals(day_starts, end, rng)
+    sleep_starts, sleep_ends = generate_sleep(day_starts, end, rng)
+    cgm_times, cgm_values, cgm_rates = generate_cgm(start, end, meal_times, carbs, rng)
+    bolus_times, bolus_values = generate_boluses(meal_times, carbs, start, end, rng)
+    hr_times, hr_values = generate_heart_rate(start, end, sleep_starts, sleep_ends, rng)
+
+    direction_index = np.searchsorted([bound for bound, _ in DIRECTIONS], cgm_rates)
+    directions = [DIRECTIONS[i][1] for i in direction_index.tolist()]
+
+    CgmEntity.objects.bulk_create(
+        (
+            CgmEntity(
+                user=user,
+                timestamp=timestamp,
+                value_mgdl=value,
+                five_minute_rate_mgdl=rate,
+                direction=direction,
+                source=BENCH_SOURCE,
+            )
+            for timestamp, value, rate, direction in zip(
+                _datetimes(cgm_times),
+                cgm_values.tolist(),
+                cgm_rates.tolist(),
+                directions,
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    MealEntity.objects.bulk_create(
+        (
+            MealEntity(
+                user=user,
+                created_at_utc=timestamp,
+                meal_time_utc=timestamp,
+                carbohydrates=meal_carbs,
+                calories=meal_carbs * 8,
+                proteins=meal_carbs // 3,
+                fats=meal_carbs // 4,
+                impact_type=ImpactType.MEDIUM,
+                meal_type=meal_type,
+                source=BENCH_SOURCE,
+            )
+            for timestamp, meal_carbs, meal_type in zip(
+                _datetimes(meal_times), carbs.tolist(), meal_types
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    BolusEntity.objects.bulk_create(
+        (
+            BolusEntity(
+                user=user,
+                timestamp_utc=timestamp,
+                created_at_utc=timestamp,
+                updated_at_utc=timestamp,
+                value=value,
+                event_type="Meal Bolus" if is_meal else "Correction Bolus",
+                is_smb=not is_meal,
+                pump_type=BENCH_PUMP_TYPE,
+                pump_serial=f"{BENCH_SOURCE}-{user.id}",
+                pump_id=user.id,
+                source=BENCH_SOURCE,
+            )
+            for timestamp, value, is_meal in zip(
+                _datetimes(bolus_times),
+                bolus_values.tolist(),
+                np.isin(bolus_times, meal_times).tolist(),
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    SleepSessionEntity.objects.bulk_create(
+        (
+            SleepSessionEntity(
+                user=user,
+                start_time=sleep_start,
+                end_time=sleep_end,
+                type=SleepType.SLEEP,
+                source=BENCH_SOURCE,
+                total_duration_minutes=minutes,
+                deep_sleep_minutes=minutes // 5,
+                light_sleep_minutes=minutes // 2,
+                rem_sleep_minutes=minutes // 5,
+                awake_minutes=minutes - minutes // 5 * 2 - minutes // 2,
+            )
+            for sleep_start, sleep_end, minutes in zip(
+                _datetimes(sleep_starts),
+                _datetimes(sleep_ends),
+                ((sleep_ends - sleep_starts) // 60).tolist(),
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    HeartRateEntity.objects.bulk_create(
+        (
+            HeartRateEntity(
+                user=user, timestamp=timestamp, value=value, source=BENCH_SOURCE
+            )
+            for timestamp, value in zip(_datetimes(hr_times), hr_values.tolist())
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    return GeneratedCounts(
+        cgm=len(cgm_times),
+        bolus=len(bolus_times),
+        meals=len(meal_times),
+        sleep=len(sleep_starts),
+        heart_rate=len(hr_times),
+    )
+
+
+def _local_day_starts(first_day: date, days: int) -> np.ndarray:
+    """Epoch seconds of local midnight of each day, in the default timezone."""
+    tz = pytz_timezone(settings.TIME_ZONE)
+    return np.array(
+        [
+            int(
+                tz.localize(
+                    datetime.combine(first_day + timedelta(days=i), time())
+                ).timestamp()
+            )
+            for i in range(days)
+        ],
+        dtype=np.int64,
+    )
+
+
+def _datetimes(epoch_seconds: np.ndarray) -> List[datetime]:
+    return [
+        datetime.fromtimestamp(t, tz=dt_timezone.utc) for t in epoch_seconds.tolist()
+    ]
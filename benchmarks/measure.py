@@ -0,0 +1,55 @@
+"""
+Scenario Measurement
+
+Runs a scenario repeatedly and reports its median wall time, the number of
+database queries and the peak Python memory. A first untimed run warms up
+lazy imports and caches. Memory is traced in a separate last run,
+tracemalloc slows allocations down and would distort the wall time.
+"""
+
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+
+def measure(scenario: Callable[[], object], repeat: int = 3) -> dict:
+    """
+    Measure a scenario.
+
+    Args:
+        scenario: Callable without arguments, run repeat + 2 times
+        repeat (int): Number of timed runs, the median is reported
+
+    Returns:
+        dict with wall_ms (median), wall_ms_min, queries and peak_memory_kib
+    """
+    scenario()
+
+    wall_ms = []
+    for _ in range(max(repeat, 1)):
+        # The query log is a bounded deque, a full log would count nothing
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            scenario()
+            wall_ms.append((time.perf_counter() - started) * 1000)
+        # Captured queries are read from the log, which the next request resets
+        n_queries = len(queries)
+
+    tracemalloc.start()
+    try:
+        scenario()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms": round(statistics.median(wall_ms), 2),
+        "wall_ms_min": round(min(wall_ms), 2),
+        "queries": n_queries,
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
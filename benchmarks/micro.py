@@ -0,0 +1,190 @@
+"""
+AGP Micro-Benchmarks
+
+Times the pure AGP and pattern functions (summary.features.agp) on in-memory
+CGM fixtures of 1, 14, 90 and 365 days (see synthetic.make_cgm_fixture).
+Neither Django settings nor a database are needed:
+
+    python -m benchmarks.micro [--days 14,90] [--only detect_agp_patterns]
+
+Like pytest-benchmark, every function is calibrated to a number of loops
+per round, timed over several rounds with garbage collection disabled and
+reported as ops/sec of the fastest and median round. Allocations are the
+peak memory traced by tracemalloc during one extra call.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+import numpy as np
+
+from summary.features.agp import (
+    TIME_PERIODS,
+    calculate_agp,
+    calculate_agp_from_arrays,
+    calculate_agp_summary,
+    calculate_stats,
+    calculate_stats_from_arrays,
+    detect_agp_patterns,
+    format_agp_json,
+)
+
+from .synthetic import make_cgm_fixture
+
+FIXTURE_DAYS = (1, 14, 90, 365)
+USER_TIMEZONE = "Europe/Berlin"
+
+# Minimum duration of one timed round and number of rounds
+MIN_ROUND_SECONDS = 0.05
+ROUNDS = 5
+
+
+def bench(
+    func: Callable[[], object],
+    min_round_seconds: float = MIN_ROUND_SECONDS,
+    rounds: int = ROUNDS,
+) -> dict:
+    """
+    Benchmark a callable without arguments.
+
+    Returns:
+        dict with ops_per_sec (fastest round), ops_per_sec_median, mean_ms of
+        one call in the fastest round, loops per round, rounds and
+        peak_alloc_kib of one call
+    """
+    # Warm up, then double the loops until a round takes min_round_seconds
+    func()
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_round_seconds or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    round_seconds = [elapsed] + [_time_loops(func, loops) for _ in range(rounds - 1)]
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    fastest = min(round_seconds)
+    return {
+        "ops_per_sec": round(loops / fastest, 2),
+        "ops_per_sec_median": round(loops / statistics.median(round_seconds), 2),
+        "mean_ms": round(fastest / loops * 1000, 4),
+        "loops": loops,
+        "rounds": len(round_seconds),
+        "peak_alloc_kib": round(peak / 1024, 1),
+    }
+
+
+def _time_loops(func: Callable[[], object], loops: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def get_cases(days: int) -> Dict[str, Callable[[], object]]:
+    """Benchmark cases of the fixture of days, setup runs here untimed."""
+    timestamps, values = make_cgm_fixture(days)
+    # calculate_stats and calculate_agp also accept rows instead of a queryset
+    logs = [
+        {"timestamp": datetime.fromtimestamp(t, tz=timezone.utc), "value_mgdl": v}
+        for t, v in zip(timestamps.tolist(), values.tolist())
+    ]
+    agp = calculate_agp_from_arrays(timestamps, values, user_timezone=USER_TIMEZONE)
+    agp_data = format_agp_json(*agp)
+
+    return {
+        "calculate_stats": lambda: calculate_stats(logs, "cgm", "hour", USER_TIMEZONE),
+        "calculate_stats_from_arrays": lambda: calculate_stats_from_arrays(
+            timestamps, values, "hour", USER_TIMEZONE
+        ),
+        "calculate_agp": lambda: calculate_agp(logs, user_timezone=USER_TIMEZONE),
+        "calculate_agp_from_arrays": lambda: calculate_agp_from_arrays(
+            timestamps, values, user_timezone=USER_TIMEZONE
+        ),
+        "format_agp_json": lambda: format_agp_json(*agp),
+        "calculate_agp_summary": lambda: calculate_agp_summary(agp_data, TIME_PERIODS),
+        "detect_agp_patterns": lambda: detect_agp_patterns(agp_data),
+    }
+
+
+def run(days_list=FIXTURE_DAYS, only=None, min_round_seconds=MIN_ROUND_SECONDS):
+    """Benchmark all cases on every fixture, return {case: {days: result}}."""
+    results = {}
+    for days in days_list:
+        for name, func in get_cases(days).items():
+            if only and name not in only:
+                continue
+            results.setdefault(name, {})[f"{days}d"] = bench(func, min_round_seconds)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the AGP functions on in-memory fixtures and "
+        "report ops/sec and allocations as JSON."
+    )
+    parser.add_argument(
+        "--days",
+        type=str,
+        default=",".join(map(str, FIXTURE_DAYS)),
+        help="Comma-separated fixture sizes in days (default: 1,14,90,365)",
+    )
+    parser.add_argument(
+        "--only",
+        type=str,
+        required=False,
+        help="Comma-separated functions to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--min-round-seconds",
+        type=float,
+        default=MIN_ROUND_SECONDS,
+        help=f"Minimum duration of a timed round (default: {MIN_ROUND_SECONDS})",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=False,
+        help="JSONL file the result is appended to, to diff runs over time",
+    )
+    options = parser.parse_args(argv)
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": run(
+            [int(days) for days in options.days.split(",")],
+            options.only.split(",") if options.only else None,
+            options.min_round_seconds,
+        ),
+    }
+
+    print(json.dumps(result, indent=2))
+    if options.output:
+        with open(options.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Benchmark Scenarios
+
+Every scenario is a factory taking the BenchContext and returning the
+callable that is timed, so setup (loading users, precomputing an AGP) stays
+outside the measurement. Summary tasks run inline for the benchmark users
+only (one shard), so their queries are counted.
+
+Scenarios run in SCENARIOS order: the summary tasks first, since the rollups,
+the home page and the summary endpoints read the summaries they write.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+
+from diafit_backend.features.timezones import get_user_timezone
+from summary.features import agp
+from summary.models import DirtySummaryDay
+from summary.tasks.runner import run_for_users
+
+# Rolling periods of the home page AGP
+ROLLING_PERIODS = [1, 3, 7, 14, 30, 90]
+HOME_RANGES = (1, 14, 90)
+API_LIST_COUNT = 1000
+
+
+@dataclass
+class BenchContext:
+    """Benchmark users and the generated date range [start_date, end_date)."""
+
+    user_ids: List[int]
+    start_date: date
+    end_date: date
+    now: datetime
+
+    @property
+    def last_day(self) -> date:
+        return self.end_date - timedelta(days=1)
+
+    @property
+    def end(self) -> datetime:
+        return datetime.combine(
+            self.end_date, datetime.min.time(), tzinfo=dt_timezone.utc
+        )
+
+    def users(self):
+        return list(
+            get_user_model()
+            .objects.filter(id__in=self.user_ids)
+            .select_related("settings")
+            .order_by("id")
+        )
+
+
+def run_task(func_path: str, context: BenchContext, *args) -> Callable:
+    """Run a per-user summary function inline for the benchmark users."""
+
+    def scenario():
+        result = run_for_users(
+            func_path, *args, concurrency=1, user_ids=context.user_ids
+        )
+        if result["failed"]:
+            raise RuntimeError(f"{func_path} failed: {result['failed']}")
+
+    return scenario
+
+
+def backfill_summaries(context: BenchContext) -> Callable:
+    return run_task(
+        "summary.tasks.backfill_summaries.backfill_summaries_for_user",
+        context,
+        context.start_date,
+        context.last_day,
+        context.now,
+    )
+
+
+def create_daily_summary(context: BenchContext) -> Callable:
+    start = context.end - timedelta(days=1)
+    return run_task(
+        "summary.tasks.create_daily_summary.create_daily_summary_for_user",
+        context,
+        start,
+        start + timedelta(days=1),
+        context.last_day,
+    )
+
+
+def create_weekly_summary(context: BenchContext) -> Callable:
+    # The week of the last generated day
+    year, week, weekday = context.last_day.isocalendar()
+    week_start = context.last_day - timedelta(days=weekday - 1)
+    return run_task(
+        "summary.tasks.create_weekly_summary.create_weekly_summary_for_user",
+        context,
+        year,
+        week,
+        week_start,
+        week_start + timedelta(days=6),
+    )
+
+
+def create_monthly_summary(context: BenchContext) -> Callable:
+    month_start = context.last_day.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    return run_task(
+        "summary.tasks.create_monthly_summary.create_monthly_summary_for_user",
+        context,
+        month_start.year,
+        month_start.month,
+        month_start,
+        next_month - timedelta(days=1),
+    )
+
+
+def create_quarterly_summary(context: BenchContext) -> Callable:
+    quarter = (context.last_day.month - 1) // 3 + 1
+    quarter_start = date(context.last_day.year, 3 * quarter - 2, 1)
+    next_quarter = (quarter_start + timedelta(days=95)).replace(day=1)
+    return run_task(
+        "summary.tasks.create_quarterly_summary.create_quarterly_summary_for_user",
+        context,
+        quarter_start.year,
+        quarter,
+        quarter_start,
+        next_quarter - timedelta(days=1),
+    )
+
+
+def create_rolling_summary(context: BenchContext) -> Callable:
+    return run_task(
+        "summary.tasks.create_rolling_summary.create_rolling_summary_for_user",
+        context,
+        ROLLING_PERIODS,
+        context.end_date,
+        context.now,
+    )
+
+
+def recompute_dirty_summaries(context: BenchContext) -> Callable:
+    """Mark the last generated day dirty for every user and recompute it."""
+    recompute = run_task(
+        "summary.tasks.recompute_dirty_summaries.recompute_dirty_summaries_for_user",
+        context,
+        context.now,
+    )
+
+    def scenario():
+        # One bulk insert, part of every ingestion
+        DirtySummaryDay.objects.bulk_create(
+            [
+                DirtySummaryDay(
+                    user_id=user_id, date=context.last_day, marked_at=context.now
+                )
+                for user_id in context.user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        recompute()
+
+    return scenario
+
+
+def get_last_cgm(user, context: BenchContext, days: int):
+    """CGM queryset of the last days generated for user."""
+    return user.cgmentity_set.filter(
+        timestamp__range=(context.end - timedelta(days=days), context.end)
+    )
+
+
+def calculate_agp(context: BenchContext) -> Callable:
+    """AGP of the last 14 days of every user, from a CGM queryset."""
+    users = context.users()
+
+    def scenario():
+        for user in users:
+            agp.calculate_agp(
+                get_last_cgm(user, context, days=14),
+                user_timezone=get_user_timezone(user),
+            )
+
+    return scenario
+
+
+def detect_agp_patterns(context: BenchContext) -> Callable:
+    """Pattern detection on the 14-day AGP of every user (precomputed)."""
+    agp_data = [
+        agp.calculate_agp_from_cgm(
+            get_last_cgm(user, context, days=14),
+            user_timezone=get_user_timezone(user),
+        )
+        for user in context.users()
+    ]
+    agp_data = [data for data in agp_data if data]
+
+    def scenario():
+        for data in agp_data:
+            agp.detect_agp_patterns(data)
+
+    return scenario
+
+
+def get_client(user) -> Client:
+    """Test client logged in as user, on a host the settings allow."""
+    host = (settings.ALLOWED_HOSTS or ["*"])[0].lstrip(".")
+    client = Client(HTTP_HOST="testserver" if host == "*" else host)
+    client.force_login(user)
+    return client
+
+
+def get_page(client: Client, url: str, **params) -> Callable:
+    def scenario():
+        response = client.get(url, params)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    return scenario
+
+
+def home_view(range_days: int) -> Callable:
+    def factory(context: BenchContext) -> Callable:
+        client = get_client(context.users()[0])
+        return get_page(client, reverse("home:home"), range_days=range_days)
+
+    return factory
+
+
+def api_list(path: str, with_user: bool = False) -> Callable:
+    def factory(context: BenchContext) -> Callable:
+        params = {"count": API_LIST_COUNT}
+        if with_user:
+            params["user_id"] = context.user_ids[0]
+        client = get_client(context.users()[0])
+        return get_page(client, f"/api/{path}", **params)
+
+    return factory
+
+
+# Scenario name -> factory, in run order
+SCENARIOS: Dict[str, Callable[[BenchContext], Callable]] = {
+    "backfill_summaries": backfill_summaries,
+    "create_daily_summary": create_daily_summary,
+    "create_weekly_summary": create_weekly_summary,
+    "create_monthly_summary": create_monthly_summary,
+    "create_quarterly_summary": create_quarterly_summary,
+    "create_rolling_summary": create_rolling_summary,
+    "recompute_dirty_summaries": recompute_dirty_summaries,
+    "calculate_agp": calculate_agp,
+    "detect_agp_patterns": detect_agp_patterns,
+    **{f"home_view_{days}d": home_view(days) for days in HOME_RANGES},
+    "api_cgm_list": api_list("cgm/list"),
+    "api_bolus_list": api_list("bolus/list"),
+    "api_meal_list": api_list("meal/list"),
+    "api_sleep_list": api_list("sleep/list"),
+    "api_heart_rate_list": api_list("heart_rate/list"),
+    "api_summary_daily": api_list("summary/daily", with_user=True),
+    "api_summary_rolling": api_list("summary/rolling", with_user=True),
+}
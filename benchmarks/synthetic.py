@@ -0,0 +1,122 @@
+"""
+Synthetic Series
+
+Pure numpy generators of the benchmark data, without Django: meals, sleep,
+CGM with meal excursions and sensor gaps, boluses and heart rate, all as
+epoch-second arrays. Used by the database generator (generator.py) and as
+in-memory fixtures of the AGP micro-benchmarks.
+"""
+
+import numpy as np
+
+CGM_INTERVAL_SECONDS = 300
+
+# (meal type, mean local hour, std hours, mean carbs, probability per day)
+MEALS = (
+    ("BREAKFAST", 7.5, 0.75, 45, 0.9),
+    ("LUNCH", 12.5, 0.75, 60, 0.85),
+    ("DINNER", 19.0, 1.0, 70, 0.95),
+    ("SNACK", 16.0, 2.0, 20, 0.4),
+)
+
+# Fixtures end at a fixed time, so every run benchmarks the same data
+FIXTURE_END = 1748736000  # 2025-06-01 00:00 UTC
+
+
+def make_cgm_fixture(days: int, seed: int = 0) -> tuple:
+    """Return (timestamps, values) of days of CGM readings ending at FIXTURE_END."""
+    rng = np.random.default_rng(seed)
+    day_starts = FIXTURE_END - 86400 * np.arange(days, 0, -1, dtype=np.int64)
+    meal_times, _, carbs = generate_meals(day_starts, FIXTURE_END, rng)
+    timestamps, values, _ = generate_cgm(
+        int(day_starts[0]), FIXTURE_END, meal_times, carbs, rng
+    )
+    return timestamps, values
+
+
+def generate_meals(day_starts: np.ndarray, end: int, rng) -> tuple:
+    """Return sorted (times, meal types, carbs) of the meals before end."""
+    times, types, carbs = [], [], []
+    for meal_type, hour, std_hours, mean_carbs, probability in MEALS:
+        eaten = rng.random(len(day_starts)) < probability
+        hours = np.clip(rng.normal(hour, std_hours, len(day_starts)), 0, 23.9)
+        times.append(day_starts[eaten] + (hours[eaten] * 3600).astype(np.int64))
+        carbs.append(
+            np.clip(rng.normal(mean_carbs, mean_carbs / 4, eaten.sum()), 5, 150)
+        )
+        types.extend([meal_type] * int(eaten.sum()))
+
+    times, carbs = np.concatenate(times), np.concatenate(carbs).astype(np.int64)
+    order = np.argsort(times, kind="stable")
+    order = order[times[order] < end]
+    return times[order], [types[i] for i in order.tolist()], carbs[order]
+
+
+def generate_sleep(day_starts: np.ndarray, end: int, rng) -> tuple:
+    """Return (starts, ends) of one night of sleep before each day, ended by end."""
+    starts = day_starts + (rng.normal(-1, 0.75, len(day_starts)) * 3600).astype(
+        np.int64
+    )
+    ends = day_starts + (rng.normal(7, 0.75, len(day_starts)) * 3600).astype(np.int64)
+    ended = ends <= end
+    return starts[ended], ends[ended]
+
+
+def generate_cgm(start: int, end: int, meal_times, carbs, rng) -> tuple:
+    """
+    Return (timestamps, values, five-minute rates) of CGM readings.
+
+    Glucose is a per-user baseline with a dawn rise, a meal excursion of
+    ~3 mg/dL per gram of carbs peaking after ~1h, and smoothed noise. About
+    2% of the readings are dropped in sensor gaps.
+    """
+    timestamps = np.arange(start, end, CGM_INTERVAL_SECONDS, dtype=np.int64)
+    hours = (timestamps - start) % 86400 / 3600
+
+    baseline = rng.normal(130, 15)
+    glucose = baseline + 25 * np.exp(-(((hours - 6) / 1.5) ** 2))
+
+    # Meal excursions, dt * exp(1 - dt) peaks at dt = 1 (one peak time)
+    peak_seconds = 3600
+    excursion_points = int(5 * peak_seconds / CGM_INTERVAL_SECONDS)
+    meal_index = np.searchsorted(timestamps, meal_times)
+    dt = np.arange(excursion_points) * CGM_INTERVAL_SECONDS / peak_seconds
+    shape = dt * np.exp(1 - dt)
+    for index, meal_carbs in zip(meal_index.tolist(), carbs.tolist()):
+        window = glucose[index : index + excursion_points]
+        window += 3 * meal_carbs * shape[: len(window)]
+
+    noise = rng.normal(0, 6, len(timestamps))
+    kernel = np.exp(-np.arange(12) / 4)
+    glucose += np.convolve(noise, kernel / kernel.sum() * 4, mode="same")
+
+    values = np.clip(np.round(glucose), 40, 400).astype(np.int64)
+    rates = np.diff(values, prepend=values[0]).astype(np.float64)
+
+    # Sensor gaps of about 2 hours
+    keep = np.ones(len(timestamps), dtype=bool)
+    for gap_start in rng.integers(0, len(timestamps), max(1, len(timestamps) // 1200)):
+        keep[gap_start : gap_start + 24] = False
+    return timestamps[keep], values[keep], rates[keep]
+
+
+def generate_boluses(meal_times, carbs, start: int, end: int, rng) -> tuple:
+    """Return sorted (times, units) of meal boluses and small corrections."""
+    meal_units = np.round(carbs / rng.normal(10, 1) * rng.normal(1, 0.1, len(carbs)), 1)
+    n_corrections = int((end - start) / 86400 * 1.5)
+    correction_times = np.sort(rng.integers(start, end, n_corrections))
+    correction_units = np.round(rng.uniform(0.1, 2, n_corrections), 1)
+
+    times = np.concatenate((meal_times, correction_times))
+    units = np.concatenate((np.maximum(meal_units, 0.1), correction_units))
+    order = np.argsort(times, kind="stable")
+    return times[order], units[order]
+
+
+def generate_heart_rate(start: int, end: int, sleep_starts, sleep_ends, rng) -> tuple:
+    """Return (timestamps, bpm) at a 5-minute cadence, lower while asleep."""
+    timestamps = np.arange(start, end, CGM_INTERVAL_SECONDS, dtype=np.int64)
+    night = np.searchsorted(sleep_starts, timestamps, side="right") - 1
+    asleep = (night >= 0) & (timestamps < sleep_ends[np.maximum(night, 0)])
+    bpm = np.where(asleep, 55, 75) + rng.normal(0, 6, len(timestamps))
+    return timestamps, np.clip(np.round(bpm), 40, 180).astype(np.int64)
@@ -2,11 +2,12 @@ from charts.charts.base import (
     get_base_config,  # noqa: F401
     get_base_layout,  # noqa: F401
 )
+from charts.charts.figure import (
+    dumps_figure,  # noqa: F401
+    scatter,  # noqa: F401
+)
 from charts.charts.target_range import get_target_range_chart  # noqa: F401
 from charts.charts.util import (
     calculate_tick_positions,  # noqa: F401
     datetime_to_numeric,  # noqa: F401
-    datetimes_to_numeric,  # noqa: F401
-    find_closest_time_index,  # noqa: F401
-    timestrings_to_numeric,  # noqa: F401
 )
@@ -1,4 +1,7 @@
 from charts.charts.agp.agp_chart import get_agp_chart  # noqa: F401
 from charts.charts.agp.agp_chart_data import get_agp_chart_data  # noqa: F401
-from charts.charts.agp.agp_chart_layout import get_agp_chart_layout  # noqa: F401
+from charts.charts.agp.agp_chart_layout import (
+    get_agp_chart_layout,  # noqa: F401
+    get_agp_chart_xaxis,  # noqa: F401
+)
 from charts.charts.agp.agp_chart_traces import get_agp_chart_traces  # noqa: F401
@@ -1,16 +1,28 @@
-import json
 from datetime import datetime, timedelta
+from functools import lru_cache
 
-from plotly.utils import PlotlyJSONEncoder
-
-from charts.charts.agp.agp_chart_data import get_agp_chart_data
-from charts.charts.agp.agp_chart_layout import get_agp_chart_layout
-from charts.charts.agp.agp_chart_traces import get_agp_chart_traces
+from charts.charts.agp.agp_chart_layout import (
+    get_agp_chart_layout,
+    get_agp_chart_xaxis,
+)
+from charts.charts.agp.agp_chart_payload import get_agp_payload_traces
 from charts.charts.base import get_base_config
+from charts.charts.figure import dumps_figure
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
+
+
+@lru_cache(maxsize=32)
+def get_agp_chart_base_layout(target_range: tuple = DEFAULT_TARGET_RANGE) -> dict:
+    """Build the AGP chart layout as a plain dict, once per target range.
+
+    Only the x-axis (ticks and range) depends on the chart, see
+    get_agp_chart_xaxis. Treat the returned dict as read-only.
+    """
+    return get_agp_chart_layout(target_range=target_range).to_plotly_json()
 
 
 def get_agp_chart(
-    agp_data: dict,
+    agp_chart_payload: dict,
     start_timestamp: datetime = datetime.strptime("00:00", "%H:%M"),
     end_timestamp: datetime = datetime.strptime("00:00", "%H:%M") + timedelta(days=1),
     extend_hours: int = 0,
@@ -18,20 +30,24 @@ def get_agp_chart(
     """Generate a Plotly AGP chart and return JSON for embedding.
 
     Args:
-        agp_chart_data: Dictionary containing AGP percentile data (always 0:00-24:00)
+        agp_chart_payload: Precomputed AGP bands (always 0:00-24:00), see
+            build_agp_chart_payload
 
     Returns:
         JSON string containing the Plotly figure data, layout, and config.
     """
 
-    chart_data = get_agp_chart_data(
-        agp_data, start_timestamp, end_timestamp, extend_hours
+    traces = get_agp_payload_traces(
+        agp_chart_payload, start_timestamp, end_timestamp, extend_hours
     )
-    traces = get_agp_chart_traces(chart_data)
-    layout = get_agp_chart_layout(start_timestamp, end_timestamp)
+    base_layout = get_agp_chart_base_layout(tuple(agp_chart_payload["target_range"]))
+    layout = {
+        **base_layout,
+        "xaxis": {
+            **base_layout.get("xaxis", {}),
+            **get_agp_chart_xaxis(start_timestamp, end_timestamp),
+        },
+    }
     config = get_base_config()
 
-    return json.dumps(
-        {"data": traces, "layout": layout, "config": config},
-        cls=PlotlyJSONEncoder,
-    )
+    return dumps_figure(traces, layout, config)
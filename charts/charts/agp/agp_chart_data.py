@@ -1,94 +1,98 @@
-from datetime import datetime, timedelta
-
-from charts.charts.util import (
-    find_closest_time_index,
-    timestrings_to_numeric,
-)
-
-
-def rotate_agp_chart_data(
-    time_labels: list,
-    p10: list,
-    p25: list,
-    p50: list,
-    p75: list,
-    p90: list,
-    end_timestamp: str,
-) -> tuple:
-    """Rotate AGP data arrays based on end_timestamp."""
-
-    def interpolate(a, b):
-        return (a + b) / 2
-
-    def interpolate_time_label(t1, t2):
-        dt1 = datetime.strptime(t1, "%H:%M")
-        dt2 = datetime.strptime(t2, "%H:%M")
-        # handle midnight wrap
-        if dt2 < dt1:
-            dt2 += timedelta(days=1)
-        avg_dt = dt1 + (dt2 - dt1) / 2
-        return avg_dt.strftime("%H:%M")
-
-    rotation_hours = 0
-
-    if end_timestamp != "00:00":
-        try:
-            end_time = datetime.strptime(end_timestamp, "%H:%M")
-            rotation_hours = end_time.hour + end_time.minute / 60.0
-            end_index = find_closest_time_index(
-                time_labels, end_time.hour, end_time.minute
-            )
-
-            if end_index > 0:
-                # Interpolate for time_labels (assume string times, so just duplicate end_index value)
-                time_labels = (
-                    time_labels[end_index:-1]
-                    + [interpolate_time_label(time_labels[-2], time_labels[0])]
-                    + time_labels[:end_index]
-                )
-                p10 = (
-                    p10[end_index:-1] + [interpolate(p10[-2], p10[0])] + p10[:end_index]
-                )
-                p25 = (
-                    p25[end_index:-1] + [interpolate(p25[-2], p25[0])] + p25[:end_index]
-                )
-                p50 = (
-                    p50[end_index:-1] + [interpolate(p50[-2], p50[0])] + p50[:end_index]
-                )
-                p75 = (
-                    p75[end_index:-1] + [interpolate(p75[-2], p75[0])] + p75[:end_index]
-                )
-                p90 = (
-                    p90[end_index:-1] + [interpolate(p90[-2], p90[0])] + p90[:end_index]
-                )
-        except ValueError:
-            pass
-
-    return time_labels, p10, p25, p50, p75, p90, rotation_hours
-
-
-def extend_agp_chart_data(
-    time_labels: list,
-    p10: list,
-    p25: list,
-    p50: list,
-    p75: list,
-    p90: list,
-    extend_hours: int,
-) -> tuple:
-    """Extend AGP data arrays by duplicating the first N hours at the end."""
-    if extend_hours > 0:
-        points_per_hour = len(time_labels) // 24
-        points_for_extend = points_per_hour * extend_hours
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+PERCENTILES = ("p10", "p25", "p50", "p75", "p90")
+MINUTES_PER_DAY = 24 * 60
+
 
-        time_labels = time_labels + time_labels[:points_for_extend]
-        p10 = p10 + p10[:points_for_extend]
-        p25 = p25 + p25[:points_for_extend]
-        p50 = p50 + p50[:points_for_extend]
-        p75 = p75 + p75[:points_for_extend]
-        p90 = p90 + p90[:points_for_extend]
+def get_points_per_day(agp_data: dict) -> int:
+    """Number of AGP points per day, without a closing 24:00 point."""
+    n_points = len(agp_data.get("p50", []))
+    return n_points - n_points % 24
 
-    return time_labels, p10, p25, p50, p75, p90
+
+def get_rotation_index(end_timestamp, points_per_day: int) -> int:
+    """Index of the AGP point closest to the time of day of end_timestamp."""
+    minute_of_day = end_timestamp.hour * 60 + end_timestamp.minute
+    return round(minute_of_day * points_per_day / MINUTES_PER_DAY) % points_per_day
+
+
+def get_agp_x_start(rotation_index: int, points_per_day: int, start_timestamp):
+    """Hours from start_timestamp to the first point of the rotated AGP.
+
+    The point is placed at its time of day closest to start_timestamp
+    (wall-clock time), e.g. 00:00 after a 23:58 start.
+    """
+    start_seconds = (
+        start_timestamp.hour * 3600
+        + start_timestamp.minute * 60
+        + start_timestamp.second
+    )
+    point_seconds = rotation_index * MINUTES_PER_DAY * 60 / points_per_day
+    offset = (point_seconds - start_seconds + 12 * 3600) % (24 * 3600) - 12 * 3600
+    return offset / 3600
+
+
+@lru_cache(maxsize=64)
+def get_point_positions(
+    points_per_day: int, rotation_index: int, extend_points: int
+) -> np.ndarray:
+    """
+    Positions of the rotated AGP points in units of one point (read-only).
+
+    The day holds the points_per_day points and the wrap point (see
+    rotate_agp_rows), followed by extend_points repeated points a day later.
+    """
+    positions = np.arange(points_per_day, dtype=np.float64)
+    wrap_index = points_per_day - rotation_index
+    positions = np.insert(
+        positions, wrap_index, wrap_index - 0.5 if rotation_index else wrap_index
+    )
+    extend_index = np.arange(extend_points) % len(positions)
+    positions = np.concatenate((positions, positions[extend_index] + points_per_day))
+    positions.flags.writeable = False
+    return positions
+
+
+def rotate_agp_rows(
+    rows: np.ndarray, start_timestamp, end_timestamp, extend_hours: int = 0
+) -> tuple:
+    """
+    Rotate rows of AGP points to start at the time of day of end_timestamp.
+
+    Point i of a row is at minute i * 1440 / points_per_day, so rotation is
+    an np.roll of the (n_rows, points_per_day) array. Like the 24:00 point
+    of a stored AGP, a wrap point joins the end of the day to its start:
+    midway between the last and the first point where the rotation wraps
+    around midnight, the 00:00 point repeated at 24:00 without rotation.
+    The first extend_hours of the rotated day are repeated after it.
+
+    Returns:
+        (x_values, rows): hours since start_timestamp and the rotated rows
+    """
+    points_per_day = rows.shape[1]
+    rotation_index = get_rotation_index(end_timestamp, points_per_day)
+    rows = np.roll(rows, -rotation_index, axis=1)
+
+    wrap_index = points_per_day - rotation_index
+    if rotation_index:
+        wrap = (rows[:, wrap_index - 1] + rows[:, wrap_index]) / 2
+    else:
+        wrap = rows[:, 0]
+    rows = np.insert(rows, wrap_index, wrap, axis=1)
+
+    extend_points = rows.shape[1] // 24 * max(extend_hours, 0)
+    if extend_points:
+        extend_index = np.arange(extend_points) % rows.shape[1]
+        rows = np.concatenate((rows, rows[:, extend_index]), axis=1)
+
+    positions = get_point_positions(points_per_day, rotation_index, extend_points)
+    x_values = positions * (24 / points_per_day) + get_agp_x_start(
+        rotation_index, points_per_day, start_timestamp
+    )
+    return x_values, rows
 
 
 def get_agp_chart_data(
@@ -97,34 +101,43 @@ def get_agp_chart_data(
     end_timestamp: datetime = datetime.strptime("00:00", "%H:%M"),
     extend_hours: int = 0,
 ) -> dict:
-    # Convert end_timestamp to string for processing
-    end_timestamp_str = end_timestamp.strftime("%H:%M")
-
-    # Extract and prepare data
-    time_labels = agp_data.get("time", [])
-    p10 = agp_data.get("p10", [])
-    p25 = agp_data.get("p25", [])
-    p50 = agp_data.get("p50", [])
-    p75 = agp_data.get("p75", [])
-    p90 = agp_data.get("p90", [])
-
-    # Rotate data to start/end at specified timestamp
-    time_labels, p10, p25, p50, p75, p90, rotation_hours = rotate_agp_chart_data(
-        time_labels, p10, p25, p50, p75, p90, end_timestamp_str
-    )
-
-    # Extend data for additional hours if requested
-    time_labels, p10, p25, p50, p75, p90 = extend_agp_chart_data(
-        time_labels, p10, p25, p50, p75, p90, extend_hours
+    """
+    Rotate the AGP day to start at the time of day of end_timestamp.
+
+    The percentiles are rotated as one (5, points_per_day) array (see
+    rotate_agp_rows), independent of how the time labels are formatted.
+
+    Args:
+        agp_data: Stored AGP data (time labels and percentiles, always 0:00-24:00)
+        start_timestamp: Start of the x-axis
+        end_timestamp: Time of day the AGP is rotated to
+        extend_hours: Hours the AGP is repeated after one day
+
+    Returns:
+        dict with x_values (hours since start_timestamp), the percentile
+        lists and rotation_hours; no time labels, the charts only place
+        points by x_values
+    """
+    points_per_day = get_points_per_day(agp_data)
+    if points_per_day == 0:
+        return {
+            "x_values": [],
+            **{percentile: [] for percentile in PERCENTILES},
+            "rotation_hours": 0,
+        }
+
+    x_values, values = rotate_agp_rows(
+        np.array(
+            [agp_data[percentile][:points_per_day] for percentile in PERCENTILES],
+            dtype=np.float64,
+        ),
+        start_timestamp,
+        end_timestamp,
+        extend_hours,
     )
 
     return {
-        "time_labels": time_labels,
-        "x_values": timestrings_to_numeric(time_labels, start_timestamp),
-        "p10": p10,
-        "p25": p25,
-        "p50": p50,
-        "p75": p75,
-        "p90": p90,
-        "rotation_hours": rotation_hours,
+        "x_values": x_values.tolist(),
+        **dict(zip(PERCENTILES, values.tolist())),
+        "rotation_hours": end_timestamp.hour + end_timestamp.minute / 60,
     }
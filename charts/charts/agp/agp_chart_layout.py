@@ -1,32 +1,21 @@
 from datetime import datetime, timedelta
-
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING
 
 from charts.charts.base import get_base_layout
-from charts.charts.target_range import get_target_range_chart
+from charts.charts.target_range import DEFAULT_TARGET_RANGE, get_target_range_chart
 from charts.charts.util import calculate_tick_positions, datetime_to_numeric
 
-TARGET_RANGE = (70, 180)  # TODO: Get from user settings
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 
-def get_agp_chart_layout(
-    start_timestamp: datetime = datetime.strptime("00:00", "%H:%M"),
-    end_timestamp: datetime = datetime.strptime("00:00", "%H:%M") + timedelta(days=1),
-) -> go.Layout:
-    """Generate Plotly layout for AGP chart."""
+def get_agp_chart_xaxis(start_timestamp, end_timestamp) -> dict:
     tick_vals, tick_texts = calculate_tick_positions(
         start_timestamp,
         end_timestamp,
         interval_hours=3,
     )
-
-    layout = get_base_layout()
-    layout.update(
-        margin=dict(l=2, r=0, t=0, b=0),
-        shapes=[get_target_range_chart()],
-    )
-
-    layout.xaxis.update(
+    return dict(
         tickmode="array",
         tickvals=tick_vals,
         ticktext=tick_texts,
@@ -35,9 +24,26 @@ def get_agp_chart_layout(
         tickfont=dict(color="#8b949e"),
         zeroline=True,
     )
+
+
+def get_agp_chart_layout(
+    start_timestamp: datetime = datetime.strptime("00:00", "%H:%M"),
+    end_timestamp: datetime = datetime.strptime("00:00", "%H:%M") + timedelta(days=1),
+    target_range: tuple = DEFAULT_TARGET_RANGE,
+) -> "go.Layout":
+    """Generate Plotly layout for AGP chart, with the target range as y ticks."""
+    import plotly.graph_objects as go
+
+    layout = get_base_layout()
+    layout.update(
+        margin=dict(l=2, r=0, t=0, b=0),
+        shapes=[get_target_range_chart(target_range)],
+    )
+
+    layout.xaxis.update(get_agp_chart_xaxis(start_timestamp, end_timestamp))
     layout.yaxis.update(
         range=[0, 250],
-        tickvals=[TARGET_RANGE[0], TARGET_RANGE[1]],
+        tickvals=list(target_range),
         showgrid=False,
         tickfont=dict(color="#8b949e"),
         zeroline=True,
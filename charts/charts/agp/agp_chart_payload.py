@@ -0,0 +1,70 @@
+"""
+Precomputed AGP chart payload.
+
+The AGP bands only depend on a summary's AGP and on the user's target range,
+so the rolling summary task stores them clipped and rounded next to the AGP
+(RollingSummary.agp_chart). Rendering a chart only rotates the stored rows to
+the chart's time of day and builds the fill polygons.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from charts.charts.agp.agp_chart_data import (
+    PERCENTILES,
+    get_points_per_day,
+    rotate_agp_rows,
+)
+from charts.charts.agp.agp_chart_traces import get_agp_band_rows, get_agp_band_traces
+
+# Bump when the rows change, stored payloads of other versions are rebuilt
+AGP_CHART_PAYLOAD_VERSION = 1
+
+# Decimals of the stored rows (the AGP itself is stored with one)
+PAYLOAD_DECIMALS = 1
+
+
+def build_agp_chart_payload(agp_data: dict, target_range: tuple) -> Optional[dict]:
+    """
+    Build the chart payload of an AGP for a target range.
+
+    Returns:
+        {"version", "target_range", "rows"}, with rows in the order of
+        AGP_BAND_ROWS over one day from 00:00, or None without AGP data
+    """
+    points_per_day = get_points_per_day(agp_data or {})
+    if points_per_day == 0:
+        return None
+
+    rows = get_agp_band_rows(
+        *(agp_data[percentile][:points_per_day] for percentile in PERCENTILES),
+        target_range=target_range,
+    )
+    return {
+        "version": AGP_CHART_PAYLOAD_VERSION,
+        "target_range": list(target_range),
+        "rows": np.round(rows, PAYLOAD_DECIMALS).tolist(),
+    }
+
+
+def is_agp_chart_payload_current(payload: Optional[dict], target_range) -> bool:
+    """Whether a stored payload was built for target_range by this version."""
+    return (
+        payload is not None
+        and payload.get("version") == AGP_CHART_PAYLOAD_VERSION
+        and payload.get("target_range") == list(target_range)
+    )
+
+
+def get_agp_payload_traces(
+    payload: dict, start_timestamp, end_timestamp, extend_hours: int = 0
+) -> list:
+    """Generate the AGP trace dicts of a payload rotated to end_timestamp."""
+    x_values, rows = rotate_agp_rows(
+        np.array(payload["rows"], dtype=np.float64),
+        start_timestamp,
+        end_timestamp,
+        extend_hours,
+    )
+    return get_agp_band_traces(x_values, rows, tuple(payload["target_range"]))
@@ -1,23 +1,61 @@
-import plotly.graph_objects as go
+import numpy as np
 
+from charts.charts.figure import scatter
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
 from core.colors import COLORS
 
-TARGET_RANGE = (70, 180)  # TODO: Get from user settings
+# Rows of get_agp_band_rows
+AGP_BAND_ROWS = (
+    "p10_in_range",
+    "p25_in_range",
+    "p50",
+    "p75_in_range",
+    "p90_in_range",
+    "p75_above",
+    "p90_above",
+    "p25_below",
+    "p10_below",
+)
 
 
-def get_agp_chart_traces(
-    agp_chart_data: dict,
-):
-    """Generate Plotly traces for AGP percentile bands."""
-    target_lower, target_upper = TARGET_RANGE
+def get_agp_band_rows(p10, p25, p50, p75, p90, target_range=DEFAULT_TARGET_RANGE):
+    """
+    Clip the AGP percentiles to the parts drawn in and around the target range.
 
-    def clip_to_range(values, lower, upper):
-        return [max(lower, min(upper, v)) for v in values]
+    Returns:
+        float array of shape (len(AGP_BAND_ROWS), n_points)
+    """
+    target_lower, target_upper = target_range
+    p10, p25, p50, p75, p90 = (
+        np.asarray(values, dtype=np.float64) for values in (p10, p25, p50, p75, p90)
+    )
+    return np.array(
+        [
+            np.clip(p10, target_lower, target_upper),
+            np.clip(p25, target_lower, target_upper),
+            p50,
+            np.clip(p75, target_lower, target_upper),
+            np.clip(p90, target_lower, target_upper),
+            np.maximum(p75, target_upper),
+            np.maximum(p90, target_upper),
+            np.minimum(p25, target_lower),
+            np.minimum(p10, target_lower),
+        ]
+    )
+
+
+def get_agp_band_traces(x_values, rows, target_range=DEFAULT_TARGET_RANGE):
+    """Generate Plotly trace dicts for AGP percentile bands from band rows."""
+    target_lower, target_upper = target_range
+    x_values = np.asarray(x_values, dtype=np.float64)
+    row = dict(zip(AGP_BAND_ROWS, rows))
+    upper_line = np.full(len(x_values), target_upper, dtype=np.float64)
+    lower_line = np.full(len(x_values), target_lower, dtype=np.float64)
 
-    def get_fill_trace(name, x, y_upper, y_lower, color):
-        trace = go.Scatter(
-            x=x + x[::-1],
-            y=y_upper + y_lower[::-1],
+    def get_fill_trace(name, y_upper, y_lower, color):
+        trace = scatter(
+            x=np.concatenate((x_values, x_values[::-1])),
+            y=np.concatenate((y_upper, y_lower[::-1])),
             mode="lines",
             fill="toself",
             fillcolor=color,
@@ -29,96 +67,62 @@ def get_agp_chart_traces(
         )
         return trace
 
-    # Create traces
-    traces = []
-    x_values = agp_chart_data["x_values"]  # Use indices instead of time_labels
+    median_trace = scatter(
+        x=x_values,
+        y=row["p50"],
+        mode="lines",
+        line=dict(color=COLORS["agp"]["in_range_median"], width=3),
+        showlegend=False,
+        hoverinfo="skip",
+        hovertemplate=None,
+        name="Median",
+    )
 
-    # In-range 90th band
-    p10_in_range = clip_to_range(agp_chart_data["p10"], target_lower, target_upper)
-    p90_in_range = clip_to_range(agp_chart_data["p90"], target_lower, target_upper)
-    traces.append(
+    return [
         get_fill_trace(
             "In Range 90th",
-            x_values,
-            p90_in_range,
-            p10_in_range,
+            row["p90_in_range"],
+            row["p10_in_range"],
             COLORS["agp"]["in_range_90th"],
-        )
-    )
-
-    # In-range 75th band
-    p25_in_range = clip_to_range(agp_chart_data["p25"], target_lower, target_upper)
-    p75_in_range = clip_to_range(agp_chart_data["p75"], target_lower, target_upper)
-    traces.append(
+        ),
         get_fill_trace(
             "In Range 75th",
-            x_values,
-            p75_in_range,
-            p25_in_range,
+            row["p75_in_range"],
+            row["p25_in_range"],
             COLORS["agp"]["in_range_75th"],
-        )
-    )
-
-    # Median line
-    traces.append(
-        go.Scatter(
-            x=x_values,
-            y=agp_chart_data["p50"],
-            mode="lines",
-            line=dict(color=COLORS["agp"]["in_range_median"], width=3),
-            showlegend=False,
-            hoverinfo="skip",
-            hovertemplate=None,
-            name="Median",
-        )
-    )
-
-    # Above-range 75th band
-    p75_above = [max(v, target_upper) for v in agp_chart_data["p75"]]
-    traces.append(
+        ),
+        median_trace,
         get_fill_trace(
             "Above Range 75th",
-            x_values,
-            p75_above,
-            [target_upper] * len(x_values),
+            row["p75_above"],
+            upper_line,
             COLORS["agp"]["above_range_75th"],
-        )
-    )
-
-    # Above-range 90th band
-    p90_above = [max(v, target_upper) for v in agp_chart_data["p90"]]
-    traces.append(
+        ),
         get_fill_trace(
             "Above Range 90th",
-            x_values,
-            p90_above,
-            p75_above,
+            row["p90_above"],
+            row["p75_above"],
             COLORS["agp"]["above_range_90th"],
-        )
-    )
-
-    # Below-range 25th band
-    p25_below = [min(v, target_lower) for v in agp_chart_data["p25"]]
-    traces.append(
+        ),
         get_fill_trace(
             "Below Range 25th",
-            x_values,
-            [target_lower] * len(x_values),
-            p25_below,
+            lower_line,
+            row["p25_below"],
             COLORS["agp"]["under_range_75th"],
-        )
-    )
-
-    # Below-range 10th band
-    p10_below = [min(v, target_lower) for v in agp_chart_data["p10"]]
-    traces.append(
+        ),
         get_fill_trace(
             "Below Range 10th",
-            x_values,
-            p25_below,
-            p10_below,
+            row["p25_below"],
+            row["p10_below"],
             COLORS["agp"]["under_range_90th"],
-        )
-    )
+        ),
+    ]
+
 
-    return traces
+def get_agp_chart_traces(agp_chart_data: dict, target_range=DEFAULT_TARGET_RANGE):
+    """Generate Plotly trace dicts for AGP percentile bands."""
+    rows = get_agp_band_rows(
+        *(agp_chart_data[p] for p in ("p10", "p25", "p50", "p75", "p90")),
+        target_range=target_range,
+    )
+    return get_agp_band_traces(agp_chart_data["x_values"], rows, target_range)
@@ -1,8 +1,13 @@
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
-def get_base_layout() -> go.Layout:
+
+def get_base_layout() -> "go.Layout":
     """Generate base Plotly layout for charts."""
+    import plotly.graph_objects as go
+
     layout = go.Layout(
         hovermode=False,
         template="plotly_dark",
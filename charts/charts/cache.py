@@ -0,0 +1,34 @@
+from typing import Callable, Optional
+
+from django.core.cache import cache
+
+CHART_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+
+
+def get_chart_cache_key(
+    name: str, user_id: int, period_days: int, updated_at, *parts
+) -> str:
+    """Build a cache key for a chart block derived from a rolling summary.
+
+    The key contains the summary's updated_at, so recomputing the summary
+    invalidates every cached block built from it.
+    """
+    version = updated_at.strftime("%Y%m%d%H%M%S%f") if updated_at else "none"
+    return ":".join(
+        str(part) for part in ("chart", name, user_id, period_days, version, *parts)
+    )
+
+
+def get_or_build_chart(key: Optional[str], build: Callable):
+    """Return the cached chart block for key, building and caching it on a miss.
+
+    Without a key the block is built and not cached.
+    """
+    if key is None:
+        return build()
+
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, CHART_CACHE_TIMEOUT)
+    return value
@@ -1,31 +1,109 @@
-from charts.charts.util import datetimes_to_numeric
+import numpy as np
+
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
+from charts.charts.util import timestamps_to_numeric
 from core.colors import COLORS
 
-TARGET_RANGE = (70, 180)  # TODO: Get from user settings
+# (longest range in days, bin size in seconds) of the CGM level of detail:
+# raw readings for short ranges, min/mean/max per bin for longer ones
+CGM_LEVELS_OF_DETAIL = (
+    (3, None),
+    (14, 15 * 60),
+    (None, 60 * 60),
+)
+
+# Marker colour per category of get_cgm_categories
+CGM_COLORS = np.array(
+    [
+        COLORS["diafit"]["under_range"],
+        COLORS["diafit"]["in_range"],
+        COLORS["diafit"]["above_range"],
+    ],
+    dtype=object,
+)
+
+
+def get_cgm_categories(values, target_range=DEFAULT_TARGET_RANGE) -> np.ndarray:
+    """Return 0 (below), 1 (in range) or 2 (above) per glucose value."""
+    target_lower, target_upper = target_range
+    return np.select(
+        [values < target_lower, values > target_upper], [0, 2], default=1
+    ).astype(np.intp)
+
+
+def get_cgm_bin_seconds(range_days: int):
+    """Return the bin size in seconds of a chart range, None for raw readings."""
+    for max_days, bin_seconds in CGM_LEVELS_OF_DETAIL:
+        if max_days is None or range_days <= max_days:
+            return bin_seconds
+
 
+def get_cgm_envelope_band(x, timestamps, minimum, maximum, bin_seconds):
+    """
+    Return the (x, y) polygons of the min-max band of binned readings.
 
-def get_cgm_chart_data(cgm_data, start_timestamp):
-    target_lower, target_upper = TARGET_RANGE
+    The band is split where bins are missing, so it does not bridge sensor
+    gaps; polygons are separated by None as Plotly draws them with fill="toself".
+    """
+    bounds = np.concatenate(
+        (
+            [0],
+            np.flatnonzero(np.diff(timestamps) > bin_seconds) + 1,
+            [len(timestamps)],
+        )
+    )
+    band_x, band_y = [], []
+    for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        band_x.extend((x[lo:hi], x[lo:hi][::-1], [None]))
+        band_y.extend((maximum[lo:hi], minimum[lo:hi][::-1], [None]))
+    return (
+        np.concatenate(band_x, dtype=object),
+        np.concatenate(band_y, dtype=object),
+    )
 
-    day_y = []
-    day_colors = []
-    timestamps = []
 
-    for reading in cgm_data:
-        day_y.append(reading["value"])
-        timestamps.append(reading["timestamp"])
+def get_cgm_chart_data(
+    timestamps,
+    values,
+    start_timestamp,
+    target_range=DEFAULT_TARGET_RANGE,
+    envelope=None,
+    bin_seconds=None,
+):
+    """
+    Prepare CGM readings for the chart.
 
-        value = reading["value"]
-        if value < target_lower:
-            day_colors.append(COLORS["diafit"]["under_range"])
-        elif value > target_upper:
-            day_colors.append(COLORS["diafit"]["above_range"])
-        else:
-            day_colors.append(COLORS["diafit"]["in_range"])
+    Args:
+        timestamps: Array of epoch seconds (UTC), see fetch_arrays
+        values: Array of glucose values (mg/dL)
+        start_timestamp: Start of the x-axis (timezone-aware, in the user's
+            timezone, which is used for the hover labels)
+        target_range: (low, high) target in mg/dL, see UserSettings.target_range
+        envelope: (minimum, maximum) arrays when timestamps and values are the
+            bins and means of fetch_binned_arrays, None for raw readings
+        bin_seconds: Bin size of the envelope in seconds
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values)
+    day_x = timestamps_to_numeric(timestamps, start_timestamp)
 
-    return {
-        "day_x": datetimes_to_numeric(timestamps, start_timestamp),
-        "day_y": day_y,
-        "day_colors": day_colors,
+    chart_data = {
+        "day_x": day_x,
+        "day_y": values,
+        "day_colors": CGM_COLORS[get_cgm_categories(values, target_range)],
         "timestamps": timestamps,
+        "user_timezone": start_timestamp.tzinfo,
+        "envelope": None,
     }
+    if envelope is not None:
+        minimum, maximum = (np.rint(bound).astype(np.int64) for bound in envelope)
+        # Means are only shown to 0.1 mg/dL, round them for the payload
+        chart_data["day_y"] = np.round(values, 1)
+        chart_data["envelope"] = {
+            "minimum": minimum,
+            "maximum": maximum,
+            "band": get_cgm_envelope_band(
+                day_x, timestamps, minimum, maximum, bin_seconds
+            ),
+        }
+    return chart_data
@@ -1,41 +1,116 @@
-import pandas as pd
-import plotly.graph_objects as go
+import time
+from datetime import datetime, timedelta
 
-# TODO: Get from user settings
-TARGET_RANGE = (70, 180)
-TIMEZONE = "Europe/Berlin"
+import numpy as np
 
+from charts.charts.figure import scatter
+from charts.charts.util import local_time_labels
+from core.colors import COLORS
+from diafit_backend.features.timezones import utc_offsets
 
-def get_customdata_structured(timestamps):
-    now = pd.Timestamp.now(tz=TIMEZONE)
-    today = now.normalize()
-    yesterday = today - pd.Timedelta(days=1)
+DAY_SECONDS = 24 * 60 * 60
 
-    dates = pd.Series(timestamps).dt.normalize()
-    times = pd.Series(timestamps).dt.strftime("%H:%M")
 
-    def format_date(date):
-        if date == today:
-            return "Today"
-        elif date == yesterday:
-            return "Yesterday"
-        else:
-            return date.strftime("%d.%m.%Y")
+def format_day(day: int, today: int) -> str:
+    """Label of a local day (days since epoch) relative to today."""
+    if day == today:
+        return "Today"
+    elif day == today - 1:
+        return "Yesterday"
+    else:
+        return (datetime(1970, 1, 1) + timedelta(days=int(day))).strftime("%d.%m.%Y")
 
-    formatted_dates = dates.apply(format_date)
-    return pd.DataFrame({"date": formatted_dates, "time": times}).to_numpy()
+
+def get_customdata_structured(timestamps, user_timezone=None, now=None):
+    """
+    Return the [date, time] hover labels of epoch timestamps.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        user_timezone: Timezone name or tzinfo (default None uses Europe/Berlin)
+        now (datetime, optional): Reference for "Today" and "Yesterday"
+
+    Returns:
+        Object array of shape (n, 2)
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    local = timestamps + utc_offsets(timestamps, user_timezone)
+
+    now_seconds = int(now.timestamp() if now else time.time())
+    today = (now_seconds + utc_offsets([now_seconds], user_timezone)[0]) // DAY_SECONDS
+    # Only a few distinct days, format each once
+    days, day_index = np.unique(local // DAY_SECONDS, return_inverse=True)
+    day_labels = np.array([format_day(day, today) for day in days], dtype=object)
+
+    customdata = np.empty((len(timestamps), 2), dtype=object)
+    customdata[:, 0] = day_labels[day_index]
+    customdata[:, 1] = local_time_labels(timestamps, user_timezone)
+    return customdata
+
+
+ENVELOPE_COLOR = COLORS["agp"]["in_range_90th"]
+
+
+def get_cgm_envelope_traces(cgm_chart_data: dict):
+    """Generate the min-max band and mean markers of binned CGM readings."""
+    envelope = cgm_chart_data["envelope"]
+    if len(cgm_chart_data["timestamps"]) == 0:
+        return []
+
+    band_x, band_y = envelope["band"]
+    band_trace = scatter(
+        x=band_x,
+        y=band_y,
+        mode="lines",
+        fill="toself",
+        fillcolor=ENVELOPE_COLOR,
+        line=dict(width=0),
+        opacity=0.6,
+        showlegend=False,
+        hoverinfo="skip",
+    )
+
+    customdata = np.column_stack(
+        (
+            get_customdata_structured(
+                cgm_chart_data["timestamps"], cgm_chart_data["user_timezone"]
+            ),
+            envelope["minimum"],
+            envelope["maximum"],
+        )
+    )
+    mean_trace = scatter(
+        x=cgm_chart_data["day_x"],
+        y=cgm_chart_data["day_y"],
+        mode="markers",
+        name="CGM",
+        marker=dict(size=4, color=cgm_chart_data["day_colors"], opacity=1.0),
+        customdata=customdata,
+        showlegend=False,
+        hoverinfo="y",
+        hovertemplate=(
+            "%{customdata[0]}, %{customdata[1]}<br><b>%{y:.0f} mg/dL</b>"
+            "<br>%{customdata[2]}-%{customdata[3]} mg/dL"
+        ),
+    )
+    return [band_trace, mean_trace]
 
 
 def get_cgm_chart_traces(cgm_chart_data: dict):
-    """Generate Plotly traces for CGM scatter points."""
+    """Generate Plotly trace dicts for CGM scatter points."""
+    if cgm_chart_data.get("envelope"):
+        return get_cgm_envelope_traces(cgm_chart_data)
+
     # Create scatter trace for CGM data points
-    scatter_trace = go.Scatter(
+    scatter_trace = scatter(
         x=cgm_chart_data["day_x"],
         y=cgm_chart_data["day_y"],
         mode="markers",
         name="CGM",
         marker=dict(size=6, color=cgm_chart_data["day_colors"], opacity=1.0),
-        customdata=get_customdata_structured(cgm_chart_data["timestamps"]),
+        customdata=get_customdata_structured(
+            cgm_chart_data["timestamps"], cgm_chart_data["user_timezone"]
+        ),
         showlegend=False,
         hoverinfo="y",
         hovertemplate="%{customdata[0]}, %{customdata[1]}<br><b>%{y} mg/dL</b>",
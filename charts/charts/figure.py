@@ -0,0 +1,71 @@
+"""
+Plain-dict Plotly figures.
+
+Traces are built as the dicts Plotly.js reads instead of plotly.graph_objects,
+which validate (and copy) every property on construction. The figure JSON is
+the same; it is written with orjson when installed (the "fast" extra) and
+with the standard library otherwise.
+"""
+
+import json
+from datetime import date, datetime
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def scatter(**properties) -> dict:
+    """Build a scatter trace dict.
+
+    Properties are given as Plotly.js attributes, with nested attributes as
+    dicts (e.g. hoverlabel=dict(font=dict(size=9)), not font_size). Properties
+    set to None are left out, as go.Scatter does.
+    """
+    trace = {"type": "scatter"}
+    trace.update(
+        (name, value) for name, value in properties.items() if value is not None
+    )
+    return trace
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "to_plotly_json"):
+        # plotly.graph_objects (e.g. a go.Layout)
+        return obj.to_plotly_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_figure(data: list, layout, config: dict) -> str:
+    """Serialize a figure to the JSON embedded in the templates.
+
+    Args:
+        data: Trace dicts (see scatter)
+        layout: Layout dict or go.Layout
+        config: Plotly config dict
+
+    Returns:
+        JSON string containing the Plotly figure data, layout, and config.
+    """
+    figure = {"data": data, "layout": layout, "config": config}
+    if orjson is not None:
+        return orjson.dumps(
+            figure, default=_default, option=orjson.OPT_SERIALIZE_NUMPY
+        ).decode()
+
+    try:
+        return json.dumps(figure, default=_default, allow_nan=False)
+    except ValueError:
+        # NaN and Infinity are not valid JSON, Plotly's encoder writes them as null
+        from plotly.utils import PlotlyJSONEncoder
+
+        return json.dumps(figure, cls=PlotlyJSONEncoder)
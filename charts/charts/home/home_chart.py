@@ -1,10 +1,9 @@
-import json
 from datetime import timedelta
+from functools import lru_cache
+from typing import Optional
 
-from plotly.subplots import make_subplots
-from plotly.utils import PlotlyJSONEncoder
-
-from charts.charts import get_base_config
+from charts.charts import dumps_figure, get_base_config
+from charts.charts.agp.agp_chart_payload import get_agp_payload_traces
 from charts.charts.home.home_chart_data import get_home_chart_data
 from charts.charts.home.home_chart_layout import (
     get_home_chart_layout,
@@ -12,21 +11,91 @@ from charts.charts.home.home_chart_layout import (
 )
 from charts.charts.home.home_chart_traces import get_home_chart_traces
 from charts.charts.sleep import get_sleep_chart_layout
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
 from charts.charts.treatments import get_treatment_chart_layout
 
 
+@lru_cache(maxsize=32)
+def get_home_chart_base_layout(target_range: tuple = DEFAULT_TARGET_RANGE) -> dict:
+    """Build the layout of the four-row home chart as a plain dict.
+
+    The layout (subplot grid, template, axes) only depends on the target
+    range, so it is built once per range instead of running make_subplots
+    and update_layout on every request. Only xaxis4 (ticks and range) is set
+    per request. Treat the returned dict as read-only.
+    """
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=4,
+        cols=1,
+        shared_xaxes=True,
+        row_heights=[0.8, 0.1, 0.1, 0.1],
+        vertical_spacing=0,
+    )
+    fig.update_layout(get_home_chart_layout(target_range))
+    fig.update_layout(get_treatment_chart_layout())
+    fig.update_layout(get_sleep_chart_layout())
+    return fig.layout.to_plotly_json()
+
+
+def get_home_agp_traces(
+    agp_chart_payload: Optional[dict],
+    start_timestamp,
+    end_timestamp,
+    extend_hours: int,
+) -> list:
+    """Generate the AGP traces of the home chart as plain Plotly dicts.
+
+    The AGP is drawn behind the last 24 hours before end_timestamp (and the
+    extension), also when the x-axis spans several days.
+
+    Args:
+        agp_chart_payload: Precomputed AGP bands, see build_agp_chart_payload
+        start_timestamp, end_timestamp: x-axis range (local time)
+        extend_hours: Hours the AGP is repeated after end_timestamp
+    """
+    if not agp_chart_payload:
+        return []
+
+    agp_start_timestamp = end_timestamp - timedelta(hours=24)
+    shift = (agp_start_timestamp - start_timestamp).total_seconds() / 3600
+    return [
+        {**trace, "x": trace["x"] + shift, "xaxis": "x4", "yaxis": "y"}
+        for trace in get_agp_payload_traces(
+            agp_chart_payload, agp_start_timestamp, end_timestamp, extend_hours
+        )
+    ]
+
+
 def get_home_chart(
     extend_hours: int,
     x_axis_range: tuple,
-    agp_data,
+    agp_chart_payload,
     cgm_data,
     sleep_data,
     bolus_data,
     carb_data,
+    target_range: tuple = DEFAULT_TARGET_RANGE,
+    cgm_bin_seconds: Optional[int] = None,
 ):
+    """Generate the home chart JSON.
+
+    agp_chart_payload holds the precomputed AGP bands of the summary (see
+    build_agp_chart_payload). cgm_data, bolus_data and carb_data are
+    (timestamps, values) pairs of arrays (epoch seconds, values) and
+    sleep_data is a (start, end) pair of epoch arrays, as returned by
+    fetch_arrays; target_range colours the CGM readings. With cgm_bin_seconds, cgm_data is the (bins, mean, min, max)
+    of fetch_binned_arrays and is drawn as a min-max band with mean markers.
+    """
     start_timestamp, end_timestamp = x_axis_range
+    agp_traces = get_home_agp_traces(
+        agp_chart_payload, start_timestamp, end_timestamp, extend_hours
+    )
+
+    # The AGP is drawn from the precomputed payload, skip it here
     home_chart_data = get_home_chart_data(
-        agp_data,
+        None,
         cgm_data,
         sleep_data,
         bolus_data,
@@ -34,6 +103,8 @@ def get_home_chart(
         start_timestamp,
         end_timestamp,
         extend_hours,
+        target_range,
+        cgm_bin_seconds,
     )
     home_chart_traces = get_home_chart_traces(
         home_chart_data["agp_chart_data"],
@@ -43,46 +114,29 @@ def get_home_chart(
         home_chart_data["carb_chart_data"],
     )
 
-    fig = make_subplots(
-        rows=4,
-        cols=1,
-        shared_xaxes=True,
-        row_heights=[0.8, 0.1, 0.1, 0.1],
-        vertical_spacing=0,
-    )
+    # Row 1 is the glucose panel, rows 2-4 hold sleep, bolus and carbs;
+    # all rows share the bottom x-axis
+    data = list(agp_traces)
+    for traces_key, yaxis in (
+        ("cgm_traces", "y"),
+        ("sleep_traces", "y2"),
+        ("bolus_traces", "y3"),
+        ("carb_traces", "y4"),
+    ):
+        for trace in home_chart_traces[traces_key]:
+            data.append({**trace, "xaxis": "x4", "yaxis": yaxis})
 
-    for trace in home_chart_traces["agp_traces"]:
-        fig.add_trace(trace, row=1, col=1)
-
-    for trace in home_chart_traces["cgm_traces"]:
-        fig.add_trace(trace, row=1, col=1)
-
-    for trace in home_chart_traces["sleep_traces"]:
-        fig.add_trace(trace, row=2, col=1)
-
-    for trace in home_chart_traces["bolus_traces"]:
-        fig.add_trace(trace, row=3, col=1)
-
-    for trace in home_chart_traces["carb_traces"]:
-        fig.add_trace(trace, row=4, col=1)
-
-    # Layout updates
-    home_layout = get_home_chart_layout()
-    treatment_layout = get_treatment_chart_layout()
-    sleep_layout = get_sleep_chart_layout()
-    fig.update_layout(home_layout)
-    fig.update_layout(treatment_layout)
-    fig.update_layout(sleep_layout)
-    fig.update_traces(xaxis="x4")
-    fig.update_layout(
-        xaxis4=get_home_chart_xaxis(
-            start_timestamp, end_timestamp + timedelta(hours=extend_hours)
-        ),
-    )
+    base_layout = get_home_chart_base_layout(tuple(target_range))
+    layout = {
+        **base_layout,
+        "xaxis4": {
+            **base_layout.get("xaxis4", {}),
+            **get_home_chart_xaxis(
+                start_timestamp, end_timestamp + timedelta(hours=extend_hours)
+            ),
+        },
+    }
 
     config = get_base_config()
 
-    return json.dumps(
-        {"data": fig.data, "layout": fig.layout, "config": config},
-        cls=PlotlyJSONEncoder,
-    )
+    return dumps_figure(data, layout, config)
@@ -2,44 +2,63 @@ from charts.charts.agp import (
     get_agp_chart_data,
 )
 from charts.charts.cgm import get_cgm_chart_data
+from charts.charts.cgm.cgm_chart_data import DEFAULT_TARGET_RANGE
 from charts.charts.sleep import get_sleep_chart_data
 from charts.charts.treatments import get_treatment_chart_data
 
 
 def get_home_chart_data(
     agp_data: dict,
-    cgm_data: dict,
-    sleep_data: dict,
-    bolus_data: dict,
-    carb_data: dict,
+    cgm_data: tuple,
+    sleep_data: tuple,
+    bolus_data: tuple,
+    carb_data: tuple,
     start_timestamp,
     end_timestamp,
     extend_hours: int,
+    target_range: tuple = DEFAULT_TARGET_RANGE,
+    cgm_bin_seconds=None,
 ) -> dict:
-    agp_chart_data = get_agp_chart_data(
-        agp_data,
-        start_timestamp=start_timestamp,
-        end_timestamp=end_timestamp,
-        extend_hours=extend_hours,
+    agp_chart_data = (
+        get_agp_chart_data(
+            agp_data,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            extend_hours=extend_hours,
+        )
+        if agp_data
+        else None
     )
 
+    # Binned readings carry their (min, max) envelope after the means
+    cgm_timestamps, cgm_values, *cgm_envelope = cgm_data
     cgm_chart_data = get_cgm_chart_data(
-        cgm_data=cgm_data, start_timestamp=start_timestamp
+        cgm_timestamps,
+        cgm_values,
+        start_timestamp=start_timestamp,
+        target_range=target_range,
+        envelope=cgm_envelope if cgm_bin_seconds else None,
+        bin_seconds=cgm_bin_seconds,
     )
 
+    sleep_start_times, sleep_end_times = sleep_data
     sleep_chart_data = get_sleep_chart_data(
-        sleep_data=sleep_data, start_timestamp=start_timestamp
+        sleep_start_times, sleep_end_times, start_timestamp=start_timestamp
     )
 
+    bolus_timestamps, bolus_values = bolus_data
     bolus_chart_data = get_treatment_chart_data(
-        treatment_data=bolus_data,
+        bolus_timestamps,
+        bolus_values,
         log_type="bolus",
         start_timestamp=start_timestamp,
         max_value=10,
     )
 
+    carb_timestamps, carb_values = carb_data
     carb_chart_data = get_treatment_chart_data(
-        treatment_data=carb_data,
+        carb_timestamps,
+        carb_values,
         log_type="carbs",
         start_timestamp=start_timestamp,
         max_value=100,
@@ -1,16 +1,37 @@
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING
 
 from charts.charts.agp import get_agp_chart_layout
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
 from charts.charts.util import calculate_tick_positions, datetime_to_numeric
 
-TARGET_RANGE = (70, 180)  # TODO: Get from user settings
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# (longest range in hours, tick interval in hours, label format)
+TICK_INTERVALS = (
+    (36, 3, "%H:%M"),
+    (4 * 24, 12, "%d.%m %H:%M"),
+    (15 * 24, 24, "%d.%m"),
+    (None, 7 * 24, "%d.%m"),
+)
+
+
+def get_tick_interval(total_hours: float) -> tuple:
+    """Return (interval_hours, label_format) of the ticks for a range."""
+    for max_hours, interval_hours, label_format in TICK_INTERVALS:
+        if max_hours is None or total_hours <= max_hours:
+            return interval_hours, label_format
 
 
 def get_home_chart_xaxis(start_timestamp, end_timestamp):
+    interval_hours, label_format = get_tick_interval(
+        (end_timestamp - start_timestamp).total_seconds() / 3600
+    )
     tick_vals, tick_texts = calculate_tick_positions(
         start_timestamp,
         end_timestamp,
-        interval_hours=3,
+        interval_hours=interval_hours,
+        label_format=label_format,
     )
     return dict(
         gridcolor="#30363d",
@@ -32,10 +53,10 @@ def get_home_chart_xaxis(start_timestamp, end_timestamp):
     )
 
 
-def get_home_chart_layout() -> go.Layout:
+def get_home_chart_layout(target_range: tuple = DEFAULT_TARGET_RANGE) -> "go.Layout":
     """Generate Plotly layout for Home chart."""
 
-    layout = get_agp_chart_layout()
+    layout = get_agp_chart_layout(target_range=target_range)
     layout.update(
         hovermode="x unified",
         spikedistance=-1,
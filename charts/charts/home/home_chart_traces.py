@@ -14,7 +14,7 @@ def get_home_chart_traces(
     carb_chart_data: dict,
 ):
     # agp
-    agp_traces = get_agp_chart_traces(agp_chart_data)
+    agp_traces = get_agp_chart_traces(agp_chart_data) if agp_chart_data else []
 
     # cgm
     cgm_traces = get_cgm_chart_traces(cgm_chart_data)
@@ -1,15 +1,15 @@
-from charts.charts.util import datetimes_to_numeric
+from charts.charts.util import timestamps_to_numeric
 
 
-def get_sleep_chart_data(sleep_data, start_timestamp):
-    sleep_starts = []
-    sleep_ends = []
-
-    for sleep_session in sleep_data:
-        sleep_starts.append(sleep_session["start"])
-        sleep_ends.append(sleep_session["end"])
+def get_sleep_chart_data(start_times, end_times, start_timestamp):
+    """
+    Prepare sleep sessions for the chart.
 
+    Args:
+        start_times, end_times: Arrays of epoch seconds (UTC), see fetch_arrays
+        start_timestamp: Start of the x-axis (timezone-aware)
+    """
     return {
-        "sleep_start_x": datetimes_to_numeric(sleep_starts, start_timestamp),
-        "sleep_end_x": datetimes_to_numeric(sleep_ends, start_timestamp),
+        "sleep_start_x": timestamps_to_numeric(start_times, start_timestamp),
+        "sleep_end_x": timestamps_to_numeric(end_times, start_timestamp),
     }
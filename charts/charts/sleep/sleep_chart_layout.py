@@ -1,7 +1,12 @@
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+def get_sleep_chart_layout() -> "go.Layout":
+    import plotly.graph_objects as go
 
-def get_sleep_chart_layout() -> go.Layout:
     layout = go.Layout(
         yaxis2=dict(
             showgrid=False,
@@ -1,7 +1,8 @@
 import re
 
-import plotly.graph_objs as go
+import numpy as np
 
+from charts.charts.figure import scatter
 from core.colors import COLORS
 
 
@@ -14,46 +15,46 @@ def set_rgba_alpha(rgba_str, alpha):
     return rgba_str  # fallback if not matched
 
 
+SLEEP_COLOR = COLORS["diafit"]["sleep"]
+SLEEP_LINE_COLOR = set_rgba_alpha(SLEEP_COLOR, 0.4)
+
+
 def get_sleep_chart_traces(sleep_chart_data: dict):
+    """
+    Generate one trace with a start-to-end segment per sleep session.
+
+    Sessions are separated by None so they are not connected; each point's
+    customdata tells whether it is the start or the end of a session.
+    """
     y_level = 0  # fixed y position for badges
-    traces = []
-
-    for x_start, x_end in zip(
-        sleep_chart_data["sleep_start_x"], sleep_chart_data["sleep_end_x"]
-    ):
-        traces.append(
-            go.Scatter(
-                x=[x_start, x_end],
-                y=[y_level, y_level],
-                name="Sleep",
-                mode="lines+markers",
-                line=dict(
-                    width=9,
-                    dash="solid",
-                    color=set_rgba_alpha(COLORS["diafit"]["sleep"], 0.4),
-                ),
-                marker=dict(
-                    size=20,
-                    symbol="circle",  # start marker
-                    color=COLORS["diafit"]["sleep"],
-                ),
-                customdata=["start", "end"],
-                hovertemplate="%{customdata}",
-            )
+    sleep_start_x = sleep_chart_data["sleep_start_x"]
+    if len(sleep_start_x) == 0:
+        return []
+
+    x = np.full((len(sleep_start_x), 3), None, dtype=object)
+    x[:, 0] = sleep_start_x
+    x[:, 1] = sleep_chart_data["sleep_end_x"]
+    y = np.full(x.shape, None, dtype=object)
+    y[:, :2] = y_level
+    customdata = np.tile(np.array(["start", "end", None], dtype=object), len(x))
+
+    return [
+        scatter(
+            x=x.ravel(),
+            y=y.ravel(),
+            name="Sleep",
+            mode="lines+markers",
+            line=dict(
+                width=9,
+                dash="solid",
+                color=SLEEP_LINE_COLOR,
+            ),
+            marker=dict(
+                size=20,
+                symbol="circle",  # start marker
+                color=SLEEP_COLOR,
+            ),
+            customdata=customdata,
+            hovertemplate="%{customdata}",
         )
-
-        # end marker (separate trace so symbol differs)
-        # traces.append(
-        #     go.Scatter(
-        #         x=[x_end],
-        #         y=[y_level],
-        #         mode="markers",
-        #         marker=dict(
-        #             size=12,
-        #             symbol="triangle-down",  # end marker
-        #             color="blue",
-        #         ),
-        #         showlegend=False,
-        #     )
-        # )
-    return traces
+    ]
@@ -1,11 +1,11 @@
-import plotly.graph_objects as go
-
 from core.colors import COLORS
 
-target_range = (70, 180)  # TODO: fetch from user settings
+DEFAULT_TARGET_RANGE = (70, 180)
+
 
+def get_target_range_chart(target_range=DEFAULT_TARGET_RANGE):
+    import plotly.graph_objects as go
 
-def get_target_range_chart():
     rect = go.layout.Shape(
         type="rect",
         xref="paper",
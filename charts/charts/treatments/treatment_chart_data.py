@@ -1,130 +1,149 @@
+from functools import lru_cache
+
 import numpy as np
-import pandas as pd
 
-from charts.charts import datetime_to_numeric
-from diafit_backend.features.cluster_treatments import (
-    hierarchical_clustering_treatments,
-)
+from charts.charts.util import local_time_labels, timestamps_to_numeric
+from diafit_backend.features.cluster_treatments import cluster_treatments
 
+# Half the width of a cluster's badge, around the middle of the cluster
+CLUSTER_HALF_WIDTH_HOURS = 0.5
 
-def generate_rounded_rect_coords(
-    x_min, x_max, y_min, y_max, radius=0.15, num_points=10
-):
+
+@lru_cache(maxsize=None)
+def get_rounded_rect_template(radius=0.15, num_points=10):
     """
-    Generate x, y coordinates for a rounded rectangle.
+    Corner arcs of a rounded rectangle, independent of its bounds.
 
     Parameters:
-        x_min, x_max: horizontal bounds
-        y_min, y_max: vertical bounds
-        radius: corner radius (in y-axis units)
+        radius: corner radius (in y-axis units, already clamped)
         num_points: number of points per corner arc
 
     Returns:
-        x_coords, y_coords: lists of coordinates forming a closed rounded rectangle
+        right, top, dx, dy: read-only arrays with one entry per point of the
+        closed outline; right/top select the bound the arc centre is inset
+        from (0: x_min/y_min, 1: x_max/y_max), dx/dy are the offsets from
+        the arc centre
     """
-    x_coords = []
-    y_coords = []
+    # Counterclockwise from the bottom-left corner
+    corners = [
+        (0, 0, np.pi, 3 * np.pi / 2),
+        (1, 0, 3 * np.pi / 2, 2 * np.pi),
+        (1, 1, 0, np.pi / 2),
+        (0, 1, np.pi / 2, np.pi),
+    ]
+    theta = np.concatenate(
+        [np.linspace(start, stop, num_points) for _, _, start, stop in corners]
+    )
+    right = np.repeat([corner[0] for corner in corners], num_points)
+    top = np.repeat([corner[1] for corner in corners], num_points)
+    dx = radius * np.cos(theta)
+    dy = radius * np.sin(theta)
 
-    # Clamp radius to not exceed half the height
-    actual_radius = min(radius, (y_max - y_min) / 2)
+    # Close the shape
+    template = tuple(np.append(values, values[0]) for values in (right, top, dx, dy))
+    for values in template:
+        values.flags.writeable = False
+    return template
 
-    # Bottom-left corner (counterclockwise from bottom-right of arc)
-    theta = np.linspace(np.pi, 3 * np.pi / 2, num_points)
-    x_coords.extend((x_min + actual_radius) + actual_radius * np.cos(theta))
-    y_coords.extend((y_min + actual_radius) + actual_radius * np.sin(theta))
 
-    # Bottom-right corner
-    theta = np.linspace(3 * np.pi / 2, 2 * np.pi, num_points)
-    x_coords.extend((x_max - actual_radius) + actual_radius * np.cos(theta))
-    y_coords.extend((y_min + actual_radius) + actual_radius * np.sin(theta))
+def get_rounded_rect_polygons(
+    x_min, x_max, y_min, y_max, radius=0.15, num_points=10, decimals=None
+):
+    """
+    Generate the outlines of rounded rectangles as one trace's coordinates.
 
-    # Top-right corner
-    theta = np.linspace(0, np.pi / 2, num_points)
-    x_coords.extend((x_max - actual_radius) + actual_radius * np.cos(theta))
-    y_coords.extend((y_max - actual_radius) + actual_radius * np.sin(theta))
+    Parameters:
+        x_min, x_max: arrays of horizontal bounds, one per rectangle
+        y_min, y_max: vertical bounds shared by all rectangles
+        radius: corner radius (in y-axis units)
+        num_points: number of points per corner arc
+        decimals: round the coordinates to keep the figure JSON small
 
-    # Top-left corner
-    theta = np.linspace(np.pi / 2, np.pi, num_points)
-    x_coords.extend((x_min + actual_radius) + actual_radius * np.cos(theta))
-    y_coords.extend((y_max - actual_radius) + actual_radius * np.sin(theta))
+    Returns:
+        x_coords, y_coords: object arrays of the closed outlines, each
+        followed by None so that Plotly fills them as separate shapes
+    """
+    # Clamp radius to not exceed half the height
+    actual_radius = min(radius, (y_max - y_min) / 2)
+    right, top, dx, dy = get_rounded_rect_template(actual_radius, num_points)
 
-    # Close the shape
-    x_coords.append(x_coords[0])
-    y_coords.append(y_coords[0])
+    x_min = np.asarray(x_min, dtype=np.float64)[:, None] + actual_radius
+    x_max = np.asarray(x_max, dtype=np.float64)[:, None] - actual_radius
+    x = np.where(right, x_max, x_min) + dx
+    y = np.where(top, y_max - actual_radius, y_min + actual_radius) + dy
+    if decimals is not None:
+        x = np.round(x, decimals)
+        y = np.round(y, decimals)
 
-    return x_coords, y_coords
+    x_coords = np.full((len(x), x.shape[1] + 1), None, dtype=object)
+    y_coords = np.full((len(x), x.shape[1] + 1), None, dtype=object)
+    x_coords[:, :-1] = x
+    y_coords[:, :-1] = y
+    return x_coords.ravel(), y_coords.ravel()
 
 
-def get_hover_data(logs, agg_data, log_type, unit):
-    hover_texts = []
-    total_boluses = []
+def get_hover_data(timestamps, values, starts, unit, user_timezone=None):
+    """Return the hover text and the total of each cluster of treatments."""
+    if len(starts) == 0:
+        return [], np.empty(0)
 
-    for idx in range(len(agg_data)):
-        total_bolus = agg_data[log_type, "sum"].iloc[idx]
-        dates = agg_data["timestamp", "list"].iloc[idx]
-        times = [d.strftime("%H:%M") for d in dates]
-        boluses = agg_data[log_type, "list"].iloc[idx]
+    totals = np.add.reduceat(values, starts)
+    ends = np.append(starts[1:], len(timestamps))
+    times = local_time_labels(timestamps, user_timezone)
+    values = values.tolist()
 
+    hover_texts = []
+    for start, end, total in zip(starts.tolist(), ends.tolist(), totals.tolist()):
         # Multi-bolus case
-        if len(boluses) > 1:
-            bolus_list = [f"{t}: {b} {unit}" for t, b in zip(times, boluses)]
-            name = (
-                f"<b>Total: {round(total_bolus, 1)} {unit}</b>"
-                "<br />" + "<br />".join(bolus_list)
+        if end - start > 1:
+            bolus_list = [
+                f"{t}: {b} {unit}" for t, b in zip(times[start:end], values[start:end])
+            ]
+            name = f"<b>Total: {round(total, 1)} {unit}</b><br />" + "<br />".join(
+                bolus_list
             )
 
         # Single-bolus case
         else:
-            ts = logs.timestamp.iloc[idx].strftime("%H:%M")
-            b = round(logs[log_type].iloc[idx], 1)
-            name = f"<b>{ts}: {b} {unit}</b>"
+            name = f"<b>{times[start]}: {round(values[start], 1)} {unit}</b>"
 
         hover_texts.append(name)
-        total_boluses.append(total_bolus)
 
-    return hover_texts, total_boluses
+    return hover_texts, totals
 
 
-def get_treatment_chart_data(treatment_data, log_type, start_timestamp, max_value):
-    # Convert to DataFrame
+def get_treatment_chart_data(timestamps, values, log_type, start_timestamp, max_value):
+    """
+    Group treatments into clusters and prepare their badges for the chart.
+
+    Args:
+        timestamps: Sorted array of epoch seconds (UTC), see fetch_arrays
+        values: Array of treatment values (U or g)
+        log_type: "bolus" or "carbs"
+        start_timestamp: Start of the x-axis (timezone-aware, in the user's
+            timezone, which is used for the hover labels)
+        max_value: Cluster total shown at full opacity
+    """
     unit = "U" if log_type == "bolus" else "g"
-    timestamps = [item["timestamp"] for item in treatment_data]
-    values = [item["value"] for item in treatment_data]
-
-    logs = pd.DataFrame(
-        {
-            "timestamp": timestamps,
-            log_type: values,
-        }
-    )
-    len_logs = len(logs)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values)
 
-    agg_data = hierarchical_clustering_treatments(logs, log_type)
-    agg_data[("min_time", "")] = agg_data[("min_time", "")].apply(
-        lambda x: datetime_to_numeric(x, start_timestamp)
+    starts = cluster_treatments(timestamps)
+    hover_data = get_hover_data(
+        timestamps, values, starts, unit, start_timestamp.tzinfo
     )
 
-    agg_data[("max_time", "")] = agg_data[("max_time", "")].apply(
-        lambda x: datetime_to_numeric(x, start_timestamp)
+    # Badge of each treatment cluster, centred on the middle of the cluster
+    ends = np.append(starts[1:], len(timestamps))[: len(starts)] - 1
+    middles = (
+        timestamps_to_numeric(timestamps[starts], start_timestamp)
+        + (timestamps[ends] - timestamps[starts]) / 2 / 3600
     )
-    hover_data = get_hover_data(logs, agg_data, log_type, unit=unit)
-
-    # Calculate rounded rectangle coordinates for each treatment cluster
-    rounded_coords = []
-    for idx in range(len(agg_data)):
-        x_min = agg_data[("min_time", "")].iloc[idx]
-        x_max = agg_data[("max_time", "")].iloc[idx]
-        x_coords, y_coords = generate_rounded_rect_coords(
-            x_min, x_max, y_min=-0.35, y_max=0.35, radius=0.3
-        )
-        rounded_coords.append({"x": x_coords, "y": y_coords})
 
     return {
-        "logs": logs,
         "log_type": log_type,
-        "len_logs": len_logs,
         "hover_data": hover_data,
-        "agg_data": agg_data,
         "max_value": max_value,
-        "rounded_coords": rounded_coords,
+        "x_min": middles - CLUSTER_HALF_WIDTH_HOURS,
+        "x_max": middles + CLUSTER_HALF_WIDTH_HOURS,
     }
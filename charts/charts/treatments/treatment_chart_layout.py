@@ -1,7 +1,12 @@
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+def get_treatment_chart_layout() -> "go.Layout":
+    import plotly.graph_objects as go
 
-def get_treatment_chart_layout() -> go.Layout:
     layout = go.Layout(
         yaxis3=dict(
             showgrid=False,
@@ -1,55 +1,71 @@
-from datetime import timedelta
+import numpy as np
 
-import plotly.graph_objects as go
-
-from charts.charts.treatments.treatment_chart_data import generate_rounded_rect_coords
+from charts.charts.figure import scatter
+from charts.charts.treatments.treatment_chart_data import get_rounded_rect_polygons
 from core.colors import COLORS
 
+# Cluster opacity (total / max_value) is rounded to tenths, one trace per level
+OPACITY_STEP = 0.1
+COORD_DECIMALS = 4
+
 
 def get_treatment_chart_traces(treatment_chart_data: dict):
-    # def plot_treatments(logs, log_type, unit, max_value):
-    logs = treatment_chart_data["logs"]
+    """
+    Generate the treatment cluster badges.
+
+    All clusters of an opacity level are drawn as separate filled shapes of
+    one trace. The hover texts are carried by one invisible marker per
+    cluster, in a single trace.
+    """
     log_type = treatment_chart_data["log_type"]
-    agg_data = treatment_chart_data["agg_data"]
-    hover_texts, total_boluses = treatment_chart_data["hover_data"]
-    rounded_coords = treatment_chart_data["rounded_coords"]
+    hover_texts, totals = treatment_chart_data["hover_data"]
     max_value = treatment_chart_data["max_value"]
+    x_min = treatment_chart_data["x_min"]
+    x_max = treatment_chart_data["x_max"]
+    if len(x_min) == 0:
+        return []
+
+    levels = np.clip(
+        np.round(np.asarray(totals) / max_value / OPACITY_STEP) * OPACITY_STEP,
+        OPACITY_STEP,
+        1,
+    )
 
     traces = []
-    if len(logs) > 1:  # multiple entries on that day
-        for i in range(len(agg_data)):
-            traces.append(
-                go.Scatter(
-                    x=rounded_coords[i]["x"],
-                    y=rounded_coords[i]["y"],
-                    fill="toself",
-                    hoveron="fills",
-                    hoverlabel=dict(font_size=9),
-                    hoverinfo="text",
-                    name=hover_texts[i],
-                    line=dict(color="rgba(0,0,0,0)"),
-                    fillcolor=COLORS["diafit"][log_type],
-                    opacity=min(total_boluses[i] / max_value, 1),
-                ),
-            )
-    else:  # only 1 entry on that day
-        min_time = logs.timestamp.iloc[0] - timedelta(minutes=30)
-        max_time = logs.timestamp.iloc[0] + timedelta(minutes=30)
-        x_coords, y_coords = generate_rounded_rect_coords(
-            min_time, max_time, y_min=0.15, y_max=0.85, radius=0.3
+    for level in np.unique(levels).tolist():
+        clusters = np.flatnonzero(levels == level)
+        x_coords, y_coords = get_rounded_rect_polygons(
+            x_min[clusters],
+            x_max[clusters],
+            y_min=-0.35,
+            y_max=0.35,
+            radius=0.3,
+            decimals=COORD_DECIMALS,
         )
         traces.append(
-            go.Scatter(
+            scatter(
                 x=x_coords,
                 y=y_coords,
+                mode="lines",
                 fill="toself",
-                hoveron="fills",
-                hoverinfo="text",
-                hoverlabel=dict(font_size=10),
-                name=hover_texts[0],
+                hoverinfo="skip",
+                name=log_type,
                 line=dict(color="rgba(0,0,0,0)"),
                 fillcolor=COLORS["diafit"][log_type],
-                opacity=min(total_boluses[0] / max_value, 1),
+                opacity=round(level, 1),
             ),
         )
+
+    traces.append(
+        scatter(
+            x=np.round((x_min + x_max) / 2, COORD_DECIMALS),
+            y=np.zeros(len(x_min)),
+            mode="markers",
+            marker=dict(color="rgba(0,0,0,0)"),
+            customdata=hover_texts,
+            hoverlabel=dict(font=dict(size=9)),
+            hovertemplate="%{customdata}<extra></extra>",
+            name=log_type,
+        )
+    )
     return traces
@@ -1,3 +1,258 @@
-from django.test import TestCase
+import json
+import math
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import plotly.graph_objects as go
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from plotly.utils import PlotlyJSONEncoder
+from pytz import timezone
+
+from charts.charts.agp import get_agp_chart_data, get_agp_chart_traces
+from charts.charts.agp.agp_chart_data import PERCENTILES
+from charts.charts.agp.agp_chart_payload import (
+    build_agp_chart_payload,
+    get_agp_payload_traces,
+    is_agp_chart_payload_current,
+)
+from charts.charts.cache import get_chart_cache_key, get_or_build_chart
+from charts.charts.cgm import get_cgm_chart_data, get_cgm_chart_traces
+from charts.charts.figure import dumps_figure, scatter
+from charts.charts.sleep import get_sleep_chart_data, get_sleep_chart_traces
+from charts.charts.treatments import (
+    get_treatment_chart_data,
+    get_treatment_chart_traces,
+)
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+TZ = timezone("Europe/Berlin")
+
+
+def make_agp_data():
+    time_labels = [f"{i // 12:02d}:{i % 12 * 5:02d}" for i in range(288)] + ["24:00"]
+    p50 = [120 + 60 * math.sin(i / 288 * 2 * math.pi) for i in range(289)]
+    return {
+        "time": time_labels,
+        "p10": [v - 50 for v in p50],
+        "p25": [v - 25 for v in p50],
+        "p50": p50,
+        "p75": [v + 25 for v in p50],
+        "p90": [v + 50 for v in p50],
+    }
+
+
+def reference_agp_chart_data(agp_data, start_timestamp, end_timestamp, extend_hours):
+    """The label-based AGP rotation and extension the index arithmetic replaced."""
+    labels = agp_data["time"]
+    rows = {percentile: agp_data[percentile] for percentile in PERCENTILES}
+    target = end_timestamp.hour * 60 + end_timestamp.minute
+    rotation_hours = 0
+    if target:
+        rotation_hours = target / 60
+        # Closest "HH:MM" label, "24:00" does not parse and is skipped
+        minutes = [
+            int(label[:2]) * 60 + int(label[3:]) if label != "24:00" else None
+            for label in labels
+        ]
+        end_index = min(
+            (abs(m - target), i) for i, m in enumerate(minutes) if m is not None
+        )[1]
+        if end_index > 0:
+            t1 = datetime.strptime(labels[-2], "%H:%M")
+            t2 = datetime.strptime(labels[0], "%H:%M") + timedelta(days=1)
+            labels = (
+                labels[end_index:-1]
+                + [(t1 + (t2 - t1) / 2).strftime("%H:%M")]
+                + labels[:end_index]
+            )
+            rows = {
+                key: values[end_index:-1]
+                + [(values[-2] + values[0]) / 2]
+                + values[:end_index]
+                for key, values in rows.items()
+            }
+    extend_points = len(labels) // 24 * extend_hours
+    labels = labels + labels[:extend_points]
+    rows = {key: values + values[:extend_points] for key, values in rows.items()}
+
+    x_values, previous = [], start_timestamp
+    for i, label in enumerate(labels):
+        if label == "24:00" and i:
+            current = previous.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+        else:
+            current = previous.replace(
+                hour=int(label[:2]), minute=int(label[3:]), second=0, microsecond=0
+            )
+            if current <= previous and i:
+                current += timedelta(days=1)
+        x_values.append((current - start_timestamp).total_seconds() / 3600)
+        previous = current
+    return {"x_values": x_values, **rows, "rotation_hours": rotation_hours}
+
+
+class AgpRotationTest(SimpleTestCase):
+    """Rotated AGP points match the label-based rotation they replaced."""
+
+    def test_matches_label_rotation(self):
+        agp_data = make_agp_data()
+        # Not (0, 0, 3): without a rotation the labels placed the extension
+        # after "24:00" a day late
+        for hour, minute, extend_hours in (
+            (13, 7, 3),
+            (23, 1, 3),
+            (6, 0, 0),
+            (0, 0, 0),
+        ):
+            end = TZ.localize(datetime(2025, 6, 18, hour, minute))
+            start = end - timedelta(hours=24)
+            with self.subTest(end=end.time(), extend_hours=extend_hours):
+                expected = reference_agp_chart_data(agp_data, start, end, extend_hours)
+                actual = get_agp_chart_data(agp_data, start, end, extend_hours)
+
+                self.assertEqual(actual.keys(), expected.keys())
+                for percentile in PERCENTILES:
+                    np.testing.assert_allclose(
+                        actual[percentile], expected[percentile], atol=1e-9
+                    )
+                # Labels have minute resolution, the wrap point lies between two
+                np.testing.assert_allclose(
+                    actual["x_values"], expected["x_values"], atol=1 / 60
+                )
+                self.assertAlmostEqual(
+                    actual["rotation_hours"], expected["rotation_hours"]
+                )
+
+
+class FigureJSONCompatibilityTest(SimpleTestCase):
+    """The plain-dict traces serialize to the same JSON as go.Scatter."""
+
+    def setUp(self):
+        self.end = TZ.localize(datetime(2025, 3, 30, 14, 7))
+        self.start = self.end - timedelta(hours=24)
+
+    def assertSameFigureJSON(self, traces):
+        expected = json.dumps(
+            {"data": [go.Scatter(trace) for trace in traces], "layout": {}},
+            cls=PlotlyJSONEncoder,
+        )
+        # orjson (the "fast" extra) and the standard library fallback
+        for serializer in ("orjson", "json"):
+            with self.subTest(serializer=serializer):
+                if serializer == "orjson" and orjson is None:
+                    self.skipTest("orjson is not installed")
+                module = orjson if serializer == "orjson" else None
+                with mock.patch("charts.charts.figure.orjson", module):
+                    self.assertEqual(
+                        json.loads(dumps_figure(traces, {}, {})),
+                        {**json.loads(expected), "config": {}},
+                    )
+
+    def test_agp_traces(self):
+        chart_data = get_agp_chart_data(
+            make_agp_data(), self.start, self.end, extend_hours=3
+        )
+        self.assertSameFigureJSON(get_agp_chart_traces(chart_data))
+
+    def test_agp_payload_traces(self):
+        agp_data = make_agp_data()
+        payload = build_agp_chart_payload(agp_data, (80, 160))
+        self.assertTrue(is_agp_chart_payload_current(payload, (80, 160)))
+        self.assertFalse(is_agp_chart_payload_current(payload, (70, 180)))
+
+        # The stored rows only differ from the AGP by rounding
+        expected = get_agp_chart_traces(
+            get_agp_chart_data(agp_data, self.start, self.end, extend_hours=3),
+            (80, 160),
+        )
+        traces = get_agp_payload_traces(payload, self.start, self.end, extend_hours=3)
+        self.assertEqual(len(traces), len(expected))
+        for trace, expected_trace in zip(traces, expected):
+            np.testing.assert_allclose(trace["x"], expected_trace["x"])
+            np.testing.assert_allclose(trace["y"], expected_trace["y"], atol=0.05)
+        self.assertSameFigureJSON(traces)
+
+    def test_cgm_traces(self):
+        timestamps = int(self.start.timestamp()) + 300 * np.arange(288)
+        values = 50 + np.arange(288)
+        chart_data = get_cgm_chart_data(timestamps, values, self.start, (80, 160))
+        self.assertSameFigureJSON(get_cgm_chart_traces(chart_data))
+
+    def test_cgm_envelope_traces(self):
+        # Hourly bins with a missing bin, which splits the band
+        timestamps = int(self.start.timestamp()) // 3600 * 3600 + 3600 * np.array(
+            [0, 1, 2, 5, 6]
+        )
+        mean = np.array([60.25, 100.0, 150.5, 190.0, 120.75])
+        chart_data = get_cgm_chart_data(
+            timestamps,
+            mean,
+            self.start,
+            envelope=(mean - 20, mean + 30),
+            bin_seconds=3600,
+        )
+        band_x, band_y = chart_data["envelope"]["band"]
+        self.assertEqual(list(band_y).count(None), 2)
+        self.assertSameFigureJSON(get_cgm_chart_traces(chart_data))
+
+    def test_sleep_traces(self):
+        start = int(self.start.timestamp())
+        chart_data = get_sleep_chart_data(
+            start + 3600 * np.array([-2, 8, 30]),
+            start + 3600 * np.array([5, 16, 38]),
+            self.start,
+        )
+        self.assertSameFigureJSON(get_sleep_chart_traces(chart_data))
+
+    def test_treatment_traces(self):
+        for offsets in ([], [60], [60, 75, 600, 610, 1200]):
+            timestamps = int(self.start.timestamp()) + 60 * np.array(
+                offsets, dtype=np.int64
+            )
+            values = 1.5 * np.arange(len(offsets)) + 1
+            chart_data = get_treatment_chart_data(
+                timestamps, values, "bolus", self.start, max_value=10
+            )
+            self.assertSameFigureJSON(get_treatment_chart_traces(chart_data))
+
+    def test_nan_is_null(self):
+        trace = scatter(x=[0, 1], y=[float("nan"), 1.0], hovertemplate=None)
+        self.assertNotIn("hovertemplate", trace)
+        self.assertSameFigureJSON([trace])
+
+
+class ChartCacheTest(SimpleTestCase):
+    """Cached chart blocks are rebuilt once their rolling summary changes."""
+
+    def setUp(self):
+        self.updated_at = TZ.localize(datetime(2025, 3, 30, 14, 7, 1, 500))
+        self.addCleanup(cache.clear)
+
+    def test_key_follows_summary_version(self):
+        key = get_chart_cache_key("agp", 1, 14, self.updated_at, 3)
+        self.assertEqual(key, "chart:agp:1:14:20250330140701000500:3")
+        self.assertNotEqual(
+            key,
+            get_chart_cache_key(
+                "agp", 1, 14, self.updated_at + timedelta(microseconds=1), 3
+            ),
+        )
+        self.assertEqual(get_chart_cache_key("agp", 1, 14, None), "chart:agp:1:14:none")
+
+    def test_builds_once_per_key(self):
+        build = mock.Mock(return_value={"data": []})
+        key = get_chart_cache_key("agp", 1, 14, self.updated_at)
+
+        self.assertEqual(get_or_build_chart(key, build), {"data": []})
+        self.assertEqual(get_or_build_chart(key, build), {"data": []})
+        self.assertEqual(build.call_count, 1)
+
+        # Without a key nothing is cached
+        get_or_build_chart(None, build)
+        get_or_build_chart(None, build)
+        self.assertEqual(build.call_count, 3)
@@ -0,0 +1,89 @@
+"""
+Local Task Broker
+
+In-memory stand-in for the django-q broker, enabled with Q_BROKER=local.
+Enqueued tasks are kept per queue in this process and run only when a test
+drains the queue, so tests can check which tasks went to which queue
+without a database broker or a running cluster:
+
+    async_task(..., cluster="rolling")
+    assert LocalBroker.queued("rolling") == 1
+    LocalBroker.drain("rolling")
+
+Draining runs every task through a worker and the result monitor like the
+`sync` option does, so Task rows are saved and hooks are called. Tasks
+enqueued while draining (a coordinator fanning out shards) run in the
+same drain.
+"""
+
+from collections import defaultdict, deque
+from itertools import count
+from typing import Deque, Dict, Tuple
+
+from django_q.brokers import Broker
+
+
+class LocalBroker(Broker):
+    _queues: Dict[str, Deque[Tuple[int, str]]] = defaultdict(deque)
+    _ids = count(1)
+
+    def enqueue(self, task):
+        task_id = next(self._ids)
+        self._queues[self.list_key].append((task_id, task))
+        return task_id
+
+    def dequeue(self):
+        queue = self._queues[self.list_key]
+        if queue:
+            return [queue.popleft()]
+
+    def queue_size(self) -> int:
+        return len(self._queues[self.list_key])
+
+    def lock_size(self) -> int:
+        return 0
+
+    def purge_queue(self):
+        self._queues[self.list_key].clear()
+
+    def delete_queue(self):
+        self._queues.pop(self.list_key, None)
+
+    def delete(self, task_id):
+        queue = self._queues[self.list_key]
+        for item in [item for item in queue if item[0] == task_id]:
+            queue.remove(item)
+
+    def acknowledge(self, task_id):
+        self.delete(task_id)
+
+    def fail(self, task_id):
+        self.delete(task_id)
+
+    def ping(self) -> bool:
+        return True
+
+    def info(self) -> str:
+        return "Local"
+
+    @classmethod
+    def queued(cls, queue: str) -> int:
+        """Number of tasks waiting in a queue."""
+        return len(cls._queues[queue])
+
+    @classmethod
+    def drain(cls, queue: str) -> int:
+        """Run the tasks of a queue until it is empty, return how many ran."""
+        from django_q.tasks import _sync
+
+        ran = 0
+        while cls._queues[queue]:
+            _, task = cls._queues[queue].popleft()
+            _sync(task)
+            ran += 1
+        return ran
+
+    @classmethod
+    def reset(cls):
+        """Drop all queued tasks, e.g. in a test's tearDown."""
+        cls._queues.clear()
@@ -0,0 +1,123 @@
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.generator import delete_bench_users, generate_bench_data
+from benchmarks.measure import measure
+from benchmarks.scenarios import SCENARIOS, BenchContext
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic data for benchmark users, time the summary tasks, "
+        "the AGP pipeline, the home page and the list endpoints, and report wall "
+        "time, query count and peak memory per scenario as JSON, optionally "
+        "appended to a JSONL history file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=5,
+            help="Number of benchmark users (default: 5)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Complete days of data per user before today (default: 30)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the data generator (default: 0)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Timed runs per scenario, the median is reported (default: 3)",
+        )
+        parser.add_argument(
+            "--scenarios",
+            type=str,
+            required=False,
+            help=f"Comma-separated scenarios to run (default: all of {', '.join(SCENARIOS)})",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            required=False,
+            help="JSONL file the result is appended to, to diff runs over time",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the benchmark users and their data after the run",
+        )
+
+    def handle(self, *args, **options):
+        names = list(SCENARIOS)
+        if options.get("scenarios"):
+            names = [name.strip() for name in options["scenarios"].split(",")]
+            unknown = [name for name in names if name not in SCENARIOS]
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        if options["users"] < 1 or options["days"] < 1:
+            raise CommandError("--users and --days must be at least 1")
+
+        # Leftovers of an interrupted run would collide on the usernames
+        delete_bench_users()
+
+        now = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        users, counts = generate_bench_data(
+            options["users"], options["days"], now, options["seed"]
+        )
+        generate_ms = (time.perf_counter() - started) * 1000
+
+        today = now.date()
+        context = BenchContext(
+            user_ids=[user.id for user in users],
+            start_date=today - timedelta(days=options["days"]),
+            end_date=today,
+            now=now,
+        )
+
+        scenarios = {}
+        try:
+            # The tasks print progress, which must not end up in the JSON
+            with redirect_stdout(sys.stderr):
+                for name in names:
+                    self.stderr.write(f"⏱️ {name}")
+                    scenarios[name] = measure(
+                        SCENARIOS[name](context), options["repeat"]
+                    )
+        finally:
+            if not options["keep"]:
+                delete_bench_users()
+
+        result = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "users": options["users"],
+            "days": options["days"],
+            "seed": options["seed"],
+            "repeat": options["repeat"],
+            "generated": asdict(counts),
+            "generate_ms": round(generate_ms, 1),
+            "scenarios": scenarios,
+        }
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options.get("output"):
+            with open(options["output"], "a") as f:
+                f.write(json.dumps(result) + "\n")
@@ -0,0 +1,113 @@
+import json
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Loaded on first use only (charts, AGP and treatment clustering), they must
+# not be imported by app loading or the URLconf
+LAZY_MODULES = ("pandas", "plotly", "scipy")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Return {module: cumulative microseconds} of top-level imports and all modules."""
+    top_level = {}
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, module = (
+            int(match.group(2)),
+            len(match.group(3)),
+            match.group(4),
+        )
+        modules[module] = cumulative
+        if depth == 1:
+            top_level[module] = cumulative
+    return {"top_level": top_level, "modules": modules}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start of `python -X importtime manage.py check` and report "
+        "import time as JSON, optionally appended to a JSONL history file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=5,
+            help="Number of cold starts measured, the median is reported (default: 5)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Number of slowest top-level imports reported (default: 10)",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            required=False,
+            help="JSONL file the result is appended to, to track startup over time",
+        )
+        parser.add_argument(
+            "--fail-on-lazy",
+            action="store_true",
+            help=f"Exit with an error if any of {', '.join(LAZY_MODULES)} is imported",
+        )
+
+    def handle(self, *args, **options):
+        manage_py = Path(settings.BASE_DIR) / "manage.py"
+        runs = []
+        for _ in range(max(options["runs"], 1)):
+            started = time.perf_counter()
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", str(manage_py), "check"],
+                capture_output=True,
+                text=True,
+            )
+            wall_ms = (time.perf_counter() - started) * 1000
+            if process.returncode != 0:
+                raise CommandError(f"manage.py check failed:\n{process.stderr[-2000:]}")
+            runs.append((wall_ms, parse_importtime(process.stderr)))
+
+        # Report the run with the median import time
+        runs.sort(key=lambda run: sum(run[1]["top_level"].values()))
+        wall_ms, imports = runs[len(runs) // 2]
+        slowest = sorted(
+            imports["top_level"].items(), key=lambda item: item[1], reverse=True
+        )[: options["top"]]
+        lazy_loaded = sorted(
+            module for module in LAZY_MODULES if module in imports["modules"]
+        )
+
+        result = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "runs": len(runs),
+            "wall_ms": round(wall_ms, 1),
+            "import_ms": round(sum(imports["top_level"].values()) / 1000, 1),
+            "modules": len(imports["modules"]),
+            "slowest_imports_ms": {
+                module: round(microseconds / 1000, 1)
+                for module, microseconds in slowest
+            },
+            "lazy_modules_loaded": lazy_loaded,
+        }
+
+        self.stdout.write(json.dumps(result, indent=2))
+        if options.get("output"):
+            with open(options["output"], "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+        if lazy_loaded and options["fail_on_lazy"]:
+            raise CommandError(f"Imported at startup: {', '.join(lazy_loaded)}")
@@ -99,6 +99,19 @@ DATABASES = {
 }
 
 
+# Cache (rendered charts, see charts/charts/cache.py)
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "diafit"),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,14 +157,79 @@ STATIC_ROOT = BASE_DIR / "staticfiles"  # For production
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Task queues (see summary/tasks/queues.py): every queue is a django-q cluster
+# with its own workers, timeout and retries, started with
+# `Q_CLUSTER_NAME=<queue> manage.py qcluster` (the default cluster is realtime).
+#   realtime: recomputes triggered by ingestion, short tasks
+#   rolling: rolling summaries
+#   batch: nightly calendar summaries and backfills
+# Retry must exceed timeout, otherwise a running task is delivered again.
+Q_WORKERS = int(os.environ.get("Q_CLUSTER_WORKERS", os.cpu_count() or 1))
+Q_REALTIME_TIMEOUT = int(os.environ.get("Q_REALTIME_TIMEOUT", 2 * 60))
+Q_ROLLING_TIMEOUT = int(os.environ.get("Q_ROLLING_TIMEOUT", 30 * 60))
+Q_BATCH_TIMEOUT = int(os.environ.get("Q_BATCH_TIMEOUT", 4 * 60 * 60))
+
 Q_CLUSTER = {
-    "name": "DjangoQ2",
-    "workers": 1,
+    "name": "realtime",
+    "workers": int(os.environ.get("Q_REALTIME_WORKERS", Q_WORKERS)),
     "recycle": 500,
-    "timeout": 60,
+    "timeout": Q_REALTIME_TIMEOUT,
+    "retry": Q_REALTIME_TIMEOUT + 60,
+    "max_attempts": 3,
     "compress": True,
     "save_limit": 250,
     "queue_limit": 50,
     "label": "Django Q2",
     "orm": "default",
+    "ALT_CLUSTERS": {
+        "rolling": {
+            "workers": int(os.environ.get("Q_ROLLING_WORKERS", Q_WORKERS)),
+            "timeout": Q_ROLLING_TIMEOUT,
+            "retry": Q_ROLLING_TIMEOUT + 5 * 60,
+            "max_attempts": 2,
+        },
+        "batch": {
+            "workers": int(os.environ.get("Q_BATCH_WORKERS", Q_WORKERS)),
+            "timeout": Q_BATCH_TIMEOUT,
+            "retry": Q_BATCH_TIMEOUT + 30 * 60,
+            # Backfills resume from their checkpoint instead
+            "max_attempts": 1,
+            "queue_limit": 10,
+        },
+    },
 }
+
+# Broker of the task queues: "orm" (the default database) or "local", an
+# in-memory stand-in for tests that runs tasks only when drained
+# (see core/brokers.py)
+Q_BROKER = os.environ.get("Q_BROKER", "orm")
+if Q_BROKER == "local":
+    Q_CLUSTER["broker_class"] = "core.brokers.LocalBroker"
+
+# Number of user shards the summary tasks are split into
+# (1 = process all users inline, see summary/tasks/runner.py)
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", Q_WORKERS))
+
+# Most users per enqueued shard, so a shard finishes within its queue timeout
+# (a run over many users is split into more shards than SUMMARY_CONCURRENCY)
+SUMMARY_CHUNK_SIZE = int(os.environ.get("SUMMARY_CHUNK_SIZE", 250))
+
+# Number of user shards with a nightly schedule of their own, started at
+# staggered times after midnight (see summary/tasks/nightly_summaries.py)
+SUMMARY_SCHEDULE_SHARDS = int(
+    os.environ.get("SUMMARY_SCHEDULE_SHARDS", SUMMARY_CONCURRENCY)
+)
+
+# Store the wall time and queries per user and phase of every summary task
+# shard as SummaryRunStats (see summary/services/run_stats.py)
+SUMMARY_RUN_STATS = os.environ.get("SUMMARY_RUN_STATS", "True") == "True"
+
+# Days the run stats are kept, older ones are pruned daily
+SUMMARY_RUN_STATS_RETENTION_DAYS = int(
+    os.environ.get("SUMMARY_RUN_STATS_RETENTION_DAYS", 30)
+)
+
+# Share of the per-user debug messages of the summary tasks that are logged
+SUMMARY_DEBUG_LOG_SAMPLE_RATE = float(
+    os.environ.get("SUMMARY_DEBUG_LOG_SAMPLE_RATE", "0.01")
+)
@@ -0,0 +1,164 @@
+"""
+Streaming fetch of entity rows into NumPy arrays.
+
+Rows are read through QuerySet.iterator(), which uses a server-side cursor
+on PostgreSQL, and written straight into typed NumPy arrays. Datetime
+columns are converted to epoch seconds by the database, so no Python
+datetime (or dict) is created per row.
+"""
+
+import math
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
+from django.db import models
+from django.db.models import Avg, BigIntegerField, F, Func, Max, Min, Value
+from django.db.models.functions import Coalesce
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def epoch_seconds(value: datetime) -> int:
+    """
+    Whole epoch seconds (UTC) of a datetime, rounded down like EpochSeconds.
+
+    Window bounds compared with fetched timestamps are converted here, so
+    both sides drop the fraction of a second the same way.
+    """
+    return math.floor(value.timestamp())
+
+
+class EpochSeconds(Func):
+    """Whole epoch seconds (UTC) of a datetime expression, see epoch_seconds."""
+
+    template = "FLOOR(EXTRACT(EPOCH FROM %(expressions)s))::bigint"
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # strftime('%s', ...) is escaped twice: once for this template and
+        # once for the backend's %s placeholder conversion
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+            **extra_context,
+        )
+
+
+class EpochBin(Func):
+    """
+    Epoch seconds (UTC) of the start of the bin of a datetime expression.
+
+    Bins are bin_seconds long and aligned to the epoch, like
+    date_bin(interval, ts, 'epoch').
+    """
+
+    template = (
+        "FLOOR(EXTRACT(EPOCH FROM date_bin(INTERVAL '%(bin_seconds)d seconds', "
+        "%(expressions)s, TIMESTAMPTZ 'epoch')))::bigint"
+    )
+    output_field = BigIntegerField()
+
+    def __init__(self, expression, bin_seconds: int, **extra):
+        super().__init__(expression, bin_seconds=int(bin_seconds), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # See EpochSeconds for the escaping of strftime('%s', ...)
+        return self.as_sql(
+            compiler,
+            connection,
+            template=(
+                "(CAST(strftime('%%%%s', %(expressions)s) AS INTEGER) "
+                "/ %(bin_seconds)d * %(bin_seconds)d)"
+            ),
+            **extra_context,
+        )
+
+
+def fetch_arrays(
+    queryset, *field_names: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[np.ndarray, ...]:
+    """
+    Stream the given fields of a queryset into one NumPy array per field.
+
+    DateTimeFields become int64 epoch seconds, integer fields int64 and
+    float fields float64. NULL values are read as 0. Ordering is taken from
+    the queryset, so order it by its time field first.
+
+    Args:
+        queryset: QuerySet of a model with the given fields
+        field_names: Names of DateTimeFields and numeric fields
+        chunk_size (int): Rows fetched per round trip of the server-side cursor
+
+    Returns:
+        Tuple of arrays, one per field in the given order
+    """
+    model = queryset.model
+    expressions = []
+    dtype = []
+    for i, name in enumerate(field_names):
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateTimeField):
+            expression = EpochSeconds(F(name))
+            field_dtype = np.int64
+        elif isinstance(field, (models.FloatField, models.DecimalField)):
+            expression = F(name)
+            field_dtype = np.float64
+        else:
+            expression = F(name)
+            field_dtype = np.int64
+        if field.null:
+            expression = Coalesce(expression, Value(0), output_field=field)
+        expressions.append(expression)
+        dtype.append((f"f{i}", field_dtype))
+
+    rows = np.fromiter(
+        queryset.values_list(*expressions).iterator(chunk_size=chunk_size),
+        dtype=dtype,
+    )
+    return tuple(np.ascontiguousarray(rows[name]) for name, _ in dtype)
+
+
+def fetch_binned_arrays(
+    queryset,
+    time_field: str,
+    value_field: str,
+    bin_seconds: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Aggregate a value into fixed time bins in the database.
+
+    Only bins with rows are returned, in time order, so the result size is
+    bounded by the time range and bin size instead of the number of rows.
+
+    Args:
+        queryset: QuerySet of a model with the given fields
+        time_field (str): Name of the DateTimeField to bin by
+        value_field (str): Name of the numeric field to aggregate
+        bin_seconds (int): Bin size in seconds (bins are aligned to the epoch)
+        chunk_size (int): Rows fetched per round trip of the server-side cursor
+
+    Returns:
+        Tuple of (bin start epoch seconds, mean, min, max) arrays
+    """
+    rows = (
+        queryset.annotate(bin=EpochBin(F(time_field), bin_seconds))
+        .values("bin")
+        .annotate(
+            mean=Avg(value_field),
+            minimum=Min(value_field),
+            maximum=Max(value_field),
+        )
+        .order_by("bin")
+        .values_list("bin", "mean", "minimum", "maximum")
+    )
+    dtype = [
+        ("bin", np.int64),
+        ("mean", np.float64),
+        ("minimum", np.float64),
+        ("maximum", np.float64),
+    ]
+    rows = np.fromiter(rows.iterator(chunk_size=chunk_size), dtype=dtype)
+    return tuple(np.ascontiguousarray(rows[name]) for name, _ in dtype)
@@ -1,27 +1,92 @@
-import pandas as pd
-from scipy.cluster.hierarchy import fcluster, ward
+"""
+Treatment Clustering
+Groups treatments (bolus, carbs) that are close in time, for the charts.
+"""
 
+import heapq
+from math import sqrt
 
-def hierarchical_clustering_treatments(logs_today, log_type, max_d=1.5):
-    logs_today["time"] = (
-        logs_today.timestamp.dt.hour
-        + logs_today.timestamp.dt.minute / 60
-        + logs_today.timestamp.dt.second / (60 * 60)
+import numpy as np
+
+MAX_CLUSTER_DISTANCE_HOURS = 1.5
+
+
+def cluster_treatments(timestamps, max_d=MAX_CLUSTER_DISTANCE_HOURS) -> np.ndarray:
+    """
+    Group sorted treatment times into clusters of consecutive treatments.
+
+    The clusters are those of Ward linkage cut at distance max_d. In 1-D,
+    Ward only merges neighbouring clusters, so the merges are replayed on a
+    heap of adjacent pairs in O(n log n) instead of building the O(n²)
+    linkage. A gap longer than max_d is never merged and splits the
+    timestamps up front.
+
+    Args:
+        timestamps: Sorted array of epoch seconds
+        max_d (float): Maximum Ward distance within a cluster, in hours
+
+    Returns:
+        int array with the index of the first treatment of each cluster,
+        e.g. for np.add.reduceat(values, starts)
+    """
+    hours = np.asarray(timestamps, dtype=np.float64) / 3600
+    if len(hours) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    bounds = np.concatenate(
+        ([0], np.flatnonzero(np.diff(hours) > max_d) + 1, [len(hours)])
     )
-    data = logs_today.time.to_numpy()
-    nnumbers = data.reshape(-1)
-    data = data.reshape(-1, 1)
-    Z = ward(data)
-    color = fcluster(Z, t=max_d, criterion="distance")
-    grouped_item = pd.DataFrame(
-        list(zip(nnumbers, color, logs_today[log_type], logs_today.timestamp)),
-        columns=["numbers", "segment", log_type, "timestamp"],
-    ).groupby("segment")
-    agg_data = grouped_item.agg({log_type: [sum, list], "timestamp": [min, max, list]})
-    agg_data = agg_data.reset_index()
-    agg_data["timedelta"] = agg_data.timestamp["max"] - agg_data.timestamp["min"]
-
-    agg_data["middle_time"] = agg_data.timestamp["min"] + agg_data["timedelta"] / 2
-    agg_data["min_time"] = agg_data["middle_time"] - pd.Timedelta(minutes=30)
-    agg_data["max_time"] = agg_data["middle_time"] + pd.Timedelta(minutes=30)
-    return agg_data
+    starts = []
+    for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if hi - lo <= 2:
+            # The Ward distance of two single treatments is their gap
+            starts.append(lo)
+        else:
+            starts.extend(lo + start for start in _ward_starts(hours[lo:hi], max_d))
+    return np.array(starts, dtype=np.intp)
+
+
+def _ward_starts(hours, max_d) -> list:
+    """Merge neighbouring clusters by Ward distance up to max_d, return cluster starts."""
+    n = len(hours)
+    size = [1] * n
+    total = hours.tolist()
+    right = list(range(1, n + 1))
+    left = list(range(-1, n - 1))
+    alive = [True] * n
+    version = [0] * n
+
+    def distance(a, b):
+        return sqrt(2 * size[a] * size[b] / (size[a] + size[b])) * abs(
+            total[b] / size[b] - total[a] / size[a]
+        )
+
+    # Clusters are contiguous and named by their first index
+    heap = [(distance(a, a + 1), a, a + 1, 0, 0) for a in range(n - 1)]
+    heapq.heapify(heap)
+    while heap and heap[0][0] <= max_d:
+        _, a, b, version_a, version_b = heapq.heappop(heap)
+        if not (
+            alive[a]
+            and right[a] == b
+            and version[a] == version_a
+            and version[b] == version_b
+        ):
+            continue
+
+        size[a] += size[b]
+        total[a] += total[b]
+        alive[b] = False
+        right[a] = right[b]
+        if right[a] < n:
+            left[right[a]] = a
+        version[a] += 1
+
+        if left[a] >= 0:
+            c = left[a]
+            heapq.heappush(heap, (distance(c, a), c, a, version[c], version[a]))
+        if right[a] < n:
+            c = right[a]
+            heapq.heappush(heap, (distance(a, c), a, c, version[a], version[c]))
+
+    return [i for i in range(n) if alive[i]]
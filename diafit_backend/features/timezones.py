@@ -0,0 +1,96 @@
+"""
+Vectorized Timezone Conversion
+Local time of epoch-second arrays from a cached table of UTC offset
+transitions per zone, instead of timezone-aware pandas/datetime objects
+per reading.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pytz
+from django.core.exceptions import ObjectDoesNotExist
+
+DEFAULT_TIMEZONE_NAME = "Europe/Berlin"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def get_user_timezone(user) -> str:
+    """
+    Return the timezone name from the user's UserSettings.
+
+    Select users with select_related("settings") to avoid a query per user.
+    Falls back to Europe/Berlin if the user has no settings.
+    """
+    try:
+        user_timezone = user.settings.timezone
+    except ObjectDoesNotExist:
+        user_timezone = None
+    return user_timezone or DEFAULT_TIMEZONE_NAME
+
+
+def utc_offsets(timestamps, user_timezone=None) -> np.ndarray:
+    """
+    Calculate the UTC offset of each timestamp in a timezone.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        user_timezone: Timezone name or tzinfo (default None uses Europe/Berlin)
+
+    Returns:
+        int64 array of offsets in seconds (local = utc + offset)
+    """
+    transition_times, offsets = _transition_table(_zone_name(user_timezone))
+    index = np.searchsorted(
+        transition_times, np.asarray(timestamps, dtype=np.int64), side="right"
+    )
+    return offsets[index - 1]
+
+
+def local_hours(timestamps, user_timezone=None) -> np.ndarray:
+    """
+    Calculate the local hour (0-23) of each timestamp in a timezone.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        user_timezone: Timezone name or tzinfo (default None uses Europe/Berlin)
+
+    Returns:
+        int64 array of local hours
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return (timestamps + utc_offsets(timestamps, user_timezone)) // 3600 % 24
+
+
+def _zone_name(user_timezone) -> str:
+    if not user_timezone:
+        return DEFAULT_TIMEZONE_NAME
+    if isinstance(user_timezone, str):
+        return user_timezone
+    return getattr(user_timezone, "zone", None) or str(user_timezone)
+
+
+@lru_cache(maxsize=None)
+def _transition_table(zone: str):
+    """Return (transition epoch seconds, UTC offset seconds) of a zone."""
+    tz = pytz.timezone(zone)
+    transitions = getattr(tz, "_utc_transition_times", None)
+    if not transitions:
+        # Fixed offset zone (e.g. UTC)
+        offset = int(tz.utcoffset(_EPOCH).total_seconds())
+        return np.array([np.iinfo(np.int64).min], dtype=np.int64), np.array(
+            [offset], dtype=np.int64
+        )
+
+    transition_times = np.array(
+        [int((transition - _EPOCH).total_seconds()) for transition in transitions],
+        dtype=np.int64,
+    )
+    transition_times[0] = np.iinfo(np.int64).min
+    offsets = np.array(
+        [int(info[0].total_seconds()) for info in tz._transition_info],
+        dtype=np.int64,
+    )
+    return transition_times, offsets
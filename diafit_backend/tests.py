@@ -1,3 +1,151 @@
-from django.test import TestCase
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from scipy.cluster.hierarchy import fcluster, linkage
+
+from diafit_backend.features.array_fetch import (
+    epoch_seconds,
+    fetch_arrays,
+    fetch_binned_arrays,
+)
+from diafit_backend.features.cluster_treatments import cluster_treatments
+from diafit_backend.models.cgm_entity import CgmEntity
+from diafit_backend.models.sleep_entity import SleepSessionEntity
+
+START = datetime(2025, 6, 1, tzinfo=dt_timezone.utc)
+
+
+class ArrayFetchTest(TestCase):
+    """Streamed arrays match the rows read through the ORM."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="arrays")
+        rng = np.random.default_rng(0)
+        CgmEntity.objects.bulk_create(
+            [
+                CgmEntity(
+                    user=self.user,
+                    # Irregular readings, some with fractions of a second
+                    timestamp=START
+                    + timedelta(seconds=int(offset), microseconds=i % 3 * 250000),
+                    value_mgdl=int(value),
+                    five_minute_rate_mgdl=float(rate),
+                )
+                for i, (offset, value, rate) in enumerate(
+                    zip(
+                        np.sort(rng.integers(0, 2 * 86400, 500)),
+                        rng.integers(40, 400, 500),
+                        rng.normal(0, 2, 500),
+                    )
+                )
+            ]
+        )
+        self.queryset = CgmEntity.objects.filter(user=self.user).order_by("timestamp")
+
+    def test_matches_orm_rows(self):
+        timestamps, values, rates = fetch_arrays(
+            self.queryset,
+            "timestamp",
+            "value_mgdl",
+            "five_minute_rate_mgdl",
+            chunk_size=64,
+        )
+        rows = list(
+            self.queryset.values_list(
+                "timestamp", "value_mgdl", "five_minute_rate_mgdl"
+            )
+        )
+
+        self.assertEqual(timestamps.dtype, np.int64)
+        self.assertEqual(values.dtype, np.int64)
+        self.assertEqual(rates.dtype, np.float64)
+        self.assertEqual(timestamps.tolist(), [epoch_seconds(row[0]) for row in rows])
+        self.assertEqual(values.tolist(), [row[1] for row in rows])
+        np.testing.assert_allclose(rates, [row[2] for row in rows])
+
+    def test_empty_queryset(self):
+        timestamps, values = fetch_arrays(
+            self.queryset.none(), "timestamp", "value_mgdl"
+        )
+        self.assertEqual(len(timestamps), 0)
+        self.assertEqual(timestamps.dtype, np.int64)
+        self.assertEqual(values.dtype, np.int64)
+
+    def test_null_reads_as_zero(self):
+        SleepSessionEntity.objects.create(
+            user=self.user,
+            start_time=START,
+            end_time=START + timedelta(hours=8),
+            total_duration_minutes=480,
+            deep_sleep_minutes=None,
+        )
+        total, deep = fetch_arrays(
+            SleepSessionEntity.objects.filter(user=self.user),
+            "total_duration_minutes",
+            "deep_sleep_minutes",
+        )
+        self.assertEqual(total.tolist(), [480])
+        self.assertEqual(deep.tolist(), [0])
+
+    def test_binned_arrays(self):
+        bin_seconds = 3600
+        bins = defaultdict(list)
+        for timestamp, value in self.queryset.values_list("timestamp", "value_mgdl"):
+            epoch = int(timestamp.timestamp())
+            bins[epoch - epoch % bin_seconds].append(value)
+
+        starts, means, minimums, maximums = fetch_binned_arrays(
+            self.queryset, "timestamp", "value_mgdl", bin_seconds
+        )
+
+        self.assertEqual(starts.tolist(), sorted(bins))
+        np.testing.assert_allclose(means, [np.mean(bins[start]) for start in starts])
+        self.assertEqual(minimums.tolist(), [min(bins[start]) for start in starts])
+        self.assertEqual(maximums.tolist(), [max(bins[start]) for start in starts])
+
+
+def reference_cluster_starts(timestamps, max_d=1.5):
+    """Cluster starts of the scipy Ward linkage the heap replaced."""
+    if len(timestamps) == 1:
+        return [0]
+    hours = np.asarray(timestamps, dtype=np.float64).reshape(-1, 1) / 3600
+    labels = fcluster(linkage(hours, "ward"), t=max_d, criterion="distance")
+    return [0] + (np.flatnonzero(np.diff(labels)) + 1).tolist()
+
+
+class ClusterTreatmentsTest(SimpleTestCase):
+    """Heap-based clusters equal Ward linkage cut at 1.5 hours."""
+
+    def make_cases(self):
+        rng = np.random.default_rng(0)
+        start = 1_750_000_000
+        cases = {
+            "single": [start],
+            "pair_within": [start, start + 3600],
+            "pair_apart": [start, start + 3 * 3600],
+            # Equal gaps tie for every merge
+            "even_spacing": start + 2700 * np.arange(12),
+            # Duplicate timestamps tie at distance 0
+            "duplicates": [start, start, start + 600, start + 600, start + 9000],
+            "meals": start
+            + np.array([0, 300, 900, 4 * 3600, 4 * 3600 + 60, 9 * 3600, 13 * 3600]),
+        }
+        for i in range(20):
+            offsets = np.sort(rng.integers(0, 86400, rng.integers(2, 40)))
+            cases[f"random_{i}"] = start + offsets
+        return cases
+
+    def test_matches_scipy_ward(self):
+        for name, timestamps in self.make_cases().items():
+            with self.subTest(name=name):
+                self.assertEqual(
+                    cluster_treatments(np.asarray(timestamps)).tolist(),
+                    reference_cluster_starts(timestamps),
+                )
+
+    def test_empty(self):
+        self.assertEqual(len(cluster_treatments(np.array([], dtype=np.int64))), 0)
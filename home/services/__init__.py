@@ -0,0 +1 @@
+from home.services.home_data import HomeData, HomeDataService  # noqa: F401
@@ -0,0 +1,194 @@
+"""
+Home page data.
+
+Loads everything the home chart needs for one request in two queries: the
+rolling summary together with the user's settings, and the CGM, sleep, bolus
+and meal series of the chart range in one UNION ALL. Times stay epoch-second
+arrays; the charts convert them to the user's timezone vectorially.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Avg, F, FloatField, Max, Min, Value
+from django.db.models.functions import Cast
+from pytz import timezone as pytz_timezone
+
+from accounts.models.usersettings import UserSettings
+from diafit_backend.features.array_fetch import (
+    DEFAULT_CHUNK_SIZE,
+    EpochBin,
+    EpochSeconds,
+)
+from diafit_backend.features.timezones import get_user_timezone
+from diafit_backend.models.bolus_entity import BolusEntity
+from diafit_backend.models.cgm_entity import CgmEntity
+from diafit_backend.models.meal_entity import MealEntity
+from diafit_backend.models.sleep_entity import SleepSessionEntity
+from summary.models import RollingSummary
+
+# Series of the UNION ALL, in result order
+CGM, SLEEP, BOLUS, CARBS = range(4)
+
+ROW_DTYPE = [
+    ("series", np.int64),
+    ("t", np.int64),
+    ("v0", np.float64),
+    ("v1", np.float64),
+    ("v2", np.float64),
+]
+
+
+@dataclass
+class HomeData:
+    """Summary, settings and chart series of one home page request."""
+
+    summary: Optional[RollingSummary]
+    settings: object  # UserSettings
+
+    # (timestamps, values), or (bins, mean, min, max) when CGM is binned
+    cgm: tuple
+    # (start, end) epoch arrays, sorted by start
+    sleep: tuple
+    # (timestamps, values)
+    bolus: tuple
+    carbs: tuple
+
+    @property
+    def user_timezone(self):
+        """The user's timezone, with the same default as the summaries."""
+        return pytz_timezone(get_user_timezone(self.settings.user))
+
+
+class HomeDataService:
+    """
+    Fetch the home page data of one user.
+
+    Usage:
+        data = HomeDataService(user).load(period_days, start, end)
+    """
+
+    def __init__(self, user, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+
+    def load(
+        self, period_days: int, start, end, cgm_bin_seconds: Optional[int] = None
+    ) -> HomeData:
+        """
+        Load the AGP summary of period_days and the series in [start, end].
+
+        Args:
+            period_days (int): Period of the rolling summary
+            start, end: Chart range (timezone-aware datetimes)
+            cgm_bin_seconds (int, optional): Bin CGM readings into mean/min/max
+                per bin in the database instead of loading raw readings
+        """
+        summary, settings = self.get_summary_and_settings(period_days)
+        series = self.fetch_series(start, end, cgm_bin_seconds)
+        return HomeData(summary=summary, settings=settings, **series)
+
+    def get_summary_and_settings(self, period_days: int) -> tuple:
+        """
+        Return (summary or None, settings) in one query if a summary exists.
+
+        A user without settings gets unsaved default settings.
+        """
+        summary = (
+            RollingSummary.objects.filter(
+                user=self.user, period_days=period_days, agp__isnull=False
+            )
+            .select_related("user__settings")
+            .first()
+        )
+        try:
+            settings = summary.user.settings if summary else self.user.settings
+        except ObjectDoesNotExist:
+            settings = UserSettings(user=self.user)
+        # Later self.user.settings lookups are served from the cache
+        self.user.settings = settings
+        return summary, settings
+
+    def fetch_series(self, start, end, cgm_bin_seconds: Optional[int] = None):
+        """Fetch the CGM, sleep, bolus and meal series in one UNION ALL query."""
+        padding = Value(0.0, output_field=FloatField())
+
+        cgm = CgmEntity.objects.filter(
+            user=self.user, timestamp__gte=start, timestamp__lte=end
+        )
+        if cgm_bin_seconds:
+            cgm = (
+                cgm.annotate(t=EpochBin(F("timestamp"), cgm_bin_seconds))
+                .values("t")
+                .annotate(
+                    series=Value(CGM),
+                    v0=Avg(Cast("value_mgdl", FloatField())),
+                    v1=Cast(Min("value_mgdl"), FloatField()),
+                    v2=Cast(Max("value_mgdl"), FloatField()),
+                )
+            )
+        else:
+            cgm = cgm.annotate(
+                series=Value(CGM),
+                t=EpochSeconds(F("timestamp")),
+                v0=Cast("value_mgdl", FloatField()),
+                v1=padding,
+                v2=padding,
+            )
+
+        sleep = SleepSessionEntity.objects.filter(
+            user=self.user, start_time__lte=end, end_time__gte=start
+        ).annotate(
+            series=Value(SLEEP),
+            t=EpochSeconds(F("start_time")),
+            v0=Cast(EpochSeconds(F("end_time")), FloatField()),
+            v1=padding,
+            v2=padding,
+        )
+        bolus = BolusEntity.objects.filter(
+            user=self.user, timestamp_utc__gte=start, timestamp_utc__lte=end
+        ).annotate(
+            series=Value(BOLUS),
+            t=EpochSeconds(F("timestamp_utc")),
+            v0=Cast("value", FloatField()),
+            v1=padding,
+            v2=padding,
+        )
+        carbs = MealEntity.objects.filter(
+            user=self.user, meal_time_utc__gte=start, meal_time_utc__lte=end
+        ).annotate(
+            series=Value(CARBS),
+            t=EpochSeconds(F("meal_time_utc")),
+            v0=Cast("carbohydrates", FloatField()),
+            v1=padding,
+            v2=padding,
+        )
+
+        # The parts of a compound query must not be ordered (Meta.ordering)
+        columns = [name for name, _ in ROW_DTYPE]
+        parts = [
+            qs.order_by().values_list(*columns) for qs in (cgm, sleep, bolus, carbs)
+        ]
+        rows = parts[0].union(*parts[1:], all=True).order_by("series", "t")
+        rows = np.fromiter(rows.iterator(chunk_size=self.chunk_size), dtype=ROW_DTYPE)
+
+        bounds = np.searchsorted(rows["series"], np.arange(5))
+        series = [rows[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+        def columns_of(rows, *names):
+            return tuple(np.ascontiguousarray(rows[name]) for name in names)
+
+        # Integer columns get their fetch_arrays dtype back
+        cgm_rows, sleep_rows, bolus_rows, carb_rows = series
+        if cgm_bin_seconds:
+            cgm = columns_of(cgm_rows, "t", "v0", "v1", "v2")
+        else:
+            cgm = (cgm_rows["t"].copy(), cgm_rows["v0"].astype(np.int64))
+        return {
+            "cgm": cgm,
+            "sleep": (sleep_rows["t"].copy(), sleep_rows["v0"].astype(np.int64)),
+            "bolus": columns_of(bolus_rows, "t", "v0"),
+            "carbs": (carb_rows["t"].copy(), carb_rows["v0"].astype(np.int64)),
+        }
@@ -17,3 +17,10 @@ document.addEventListener('DOMContentLoaded', () => {
         chartContainer.innerHTML = '<div style="padding: 40px; text-align: center; color: #666;">No AGP graph data available for this period.</div>';
     }
 });
+
+window.changeRangeDays = () => {
+    const range = document.getElementById('rangeSelect').value;
+    const params = new URLSearchParams(window.location.search);
+    params.set('range_days', range);
+    window.location.search = params.toString();
+};
@@ -1 +1,180 @@
-# Create your tests here.
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from benchmarks.generator import generate_bench_data
+from diafit_backend.models.bolus_entity import BolusEntity
+from diafit_backend.models.cgm_entity import CgmEntity
+from diafit_backend.models.meal_entity import MealEntity
+from diafit_backend.models.sleep_entity import SleepSessionEntity
+from home.services import HomeDataService
+from home.views.home_view import AVAILABLE_RANGES, DEFAULT_RANGE_DAYS
+from summary.models import RollingSummary
+from summary.tasks.create_daily_summary import create_daily_summary_for_user
+from summary.tasks.create_rolling_summary import create_rolling_summary_for_user
+
+NOW = datetime(2025, 6, 18, 9, 30, tzinfo=dt_timezone.utc)
+
+
+class HomeViewTest(TestCase):
+    """The chart range comes from the available ranges."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="home")
+        self.client.force_login(self.user)
+
+    def get_range_days(self, range_days):
+        response = self.client.get(reverse("home:home"), {"range_days": range_days})
+        self.assertEqual(response.status_code, 200)
+        return response.context["range_days"]
+
+    def test_available_ranges(self):
+        for range_days in AVAILABLE_RANGES:
+            with self.subTest(range_days=range_days):
+                self.assertEqual(self.get_range_days(range_days), range_days)
+
+    def test_invalid_range_falls_back_to_default(self):
+        for range_days in ("abc", "", "2.5", "0", "-7", "365"):
+            with self.subTest(range_days=range_days):
+                self.assertEqual(self.get_range_days(range_days), DEFAULT_RANGE_DAYS)
+
+    def test_range_selector(self):
+        response = self.client.get(reverse("home:home"), {"range_days": 7})
+        self.assertContains(response, 'id="rangeSelect"')
+        self.assertContains(response, '<option value="7" selected>', html=False)
+
+
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class HomeAgpTest(TestCase):
+    """The home chart draws the AGP payload stored by the rolling summary task."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 14, now=NOW)
+        for days in range(1, 15):
+            start = datetime.combine(
+                NOW.date() - timedelta(days=days),
+                datetime.min.time(),
+                tzinfo=dt_timezone.utc,
+            )
+            create_daily_summary_for_user(
+                self.user, start, start + timedelta(days=1), start.date()
+            )
+        create_rolling_summary_for_user(self.user, [14], NOW.date(), NOW)
+        self.client.force_login(self.user)
+
+    def test_stored_payload_is_not_rebuilt(self, now):
+        summary = RollingSummary.objects.get(user=self.user, period_days=14)
+        self.assertIsNotNone(summary.agp_chart)
+
+        with (
+            mock.patch(
+                "summary.services.agp_service.build_agp_chart_payload"
+            ) as build_payload,
+            mock.patch(
+                "charts.charts.agp.agp_chart_payload.get_agp_band_rows"
+            ) as get_band_rows,
+        ):
+            response = self.client.get(reverse("home:home"), {"period_days": 14})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["error_message"])
+        self.assertTrue(response.context["plotly_graph"])
+        build_payload.assert_not_called()
+        get_band_rows.assert_not_called()
+
+
+def epochs(datetimes):
+    return [int(value.timestamp()) for value in datetimes]
+
+
+class HomeDataServiceTest(TestCase):
+    """The UNION ALL series match the rows read through the ORM."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 3, now=NOW)
+        self.start = NOW - timedelta(days=2)
+
+    def load(self, cgm_bin_seconds=None):
+        self.user = get_user_model().objects.get(pk=self.user.pk)
+        return HomeDataService(self.user).load(14, self.start, NOW, cgm_bin_seconds)
+
+    def test_series(self):
+        data = self.load()
+
+        cgm = CgmEntity.objects.filter(
+            user=self.user, timestamp__range=(self.start, NOW)
+        ).order_by("timestamp")
+        self.assertEqual(
+            data.cgm[0].tolist(), epochs(cgm.values_list("timestamp", flat=True))
+        )
+        self.assertEqual(
+            data.cgm[1].tolist(), list(cgm.values_list("value_mgdl", flat=True))
+        )
+
+        sleep = SleepSessionEntity.objects.filter(
+            user=self.user, start_time__lte=NOW, end_time__gte=self.start
+        ).order_by("start_time")
+        self.assertTrue(sleep.exists())
+        self.assertEqual(
+            data.sleep[0].tolist(), epochs(sleep.values_list("start_time", flat=True))
+        )
+        self.assertEqual(
+            data.sleep[1].tolist(), epochs(sleep.values_list("end_time", flat=True))
+        )
+
+        bolus = BolusEntity.objects.filter(
+            user=self.user, timestamp_utc__range=(self.start, NOW)
+        ).order_by("timestamp_utc")
+        self.assertEqual(
+            data.bolus[0].tolist(),
+            epochs(bolus.values_list("timestamp_utc", flat=True)),
+        )
+        self.assertEqual(
+            data.bolus[1].tolist(), list(bolus.values_list("value", flat=True))
+        )
+
+        meals = MealEntity.objects.filter(
+            user=self.user, meal_time_utc__range=(self.start, NOW)
+        ).order_by("meal_time_utc")
+        self.assertEqual(
+            data.carbs[0].tolist(),
+            epochs(meals.values_list("meal_time_utc", flat=True)),
+        )
+        self.assertEqual(
+            data.carbs[1].tolist(), list(meals.values_list("carbohydrates", flat=True))
+        )
+
+    def test_binned_cgm(self):
+        bins, means, minimums, maximums = self.load(cgm_bin_seconds=3600).cgm
+
+        values = CgmEntity.objects.filter(
+            user=self.user, timestamp__range=(self.start, NOW)
+        ).values_list("timestamp", "value_mgdl")
+        by_bin = {}
+        for timestamp, value in values:
+            epoch = int(timestamp.timestamp())
+            by_bin.setdefault(epoch - epoch % 3600, []).append(value)
+
+        self.assertEqual(bins.tolist(), sorted(by_bin))
+        self.assertEqual(minimums.tolist(), [min(by_bin[b]) for b in sorted(by_bin)])
+        self.assertEqual(maximums.tolist(), [max(by_bin[b]) for b in sorted(by_bin)])
+
+    def test_blank_timezone_matches_summaries(self):
+        self.user.settings.timezone = ""
+        self.user.settings.save()
+
+        self.assertEqual(self.load().user_timezone.zone, "Europe/Berlin")
+
+    def test_missing_settings(self):
+        self.user.settings.delete()
+
+        data = self.load()
+
+        self.assertIsNone(data.summary)
+        self.assertEqual(data.settings.target_range, (70, 180))
+        self.assertEqual(data.user_timezone.zone, "Europe/Berlin")
+        self.assertTrue(len(data.cgm[0]))
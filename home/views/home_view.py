@@ -3,14 +3,15 @@ from django.http import HttpResponseForbidden
 from django.shortcuts import render
 from django.utils import timezone
 from pytz import UTC
-from pytz import timezone as pytz_timezone
 
+from charts.charts.cgm.cgm_chart_data import get_cgm_bin_seconds
 from charts.charts.home.home_chart import get_home_chart
-from diafit_backend.models.bolus_entity import BolusEntity
-from diafit_backend.models.cgm_entity import CgmEntity
-from diafit_backend.models.meal_entity import MealEntity
-from diafit_backend.models.sleep_entity import SleepSessionEntity
-from summary.services import get_agp_summary
+from home.services import HomeDataService
+from summary.services import get_agp_chart_payload
+
+AVAILABLE_PERIODS = [1, 3, 7, 14, 30, 90]
+AVAILABLE_RANGES = [1, 3, 7, 14, 30, 90]
+DEFAULT_RANGE_DAYS = 1
 
 
 @login_required
@@ -21,73 +22,29 @@ def home_view(request):
         return HttpResponseForbidden("You must be logged in to access this resource.")
 
     period_days = int(request.GET.get("period_days", 14))
+    range_days = get_range_days(request.GET.get("range_days"))
 
-    # Define time range for today's data
-    hours = 24
+    # Define time range of the chart, ending now
     extend_hours = 3
     end_timestamp = timezone.now().astimezone(UTC)
-    start_timestamp = end_timestamp - timezone.timedelta(hours=hours)
-    user_tz = pytz_timezone(user.settings.timezone) if user.settings.timezone else UTC
-
-    # Get AGP data
-    summary = get_agp_summary(user, period_days)
-    agp_patterns = summary.agp_trends
-    agp_data = summary.agp if summary and summary.agp else None
-
-    # Get CGM data
-    cgm_data = (
-        CgmEntity.objects.filter(
-            user=user, timestamp__gte=start_timestamp, timestamp__lte=end_timestamp
-        )
-        .order_by("timestamp")
-        .values_list("timestamp", "value_mgdl")
-    )
-    cgm_data = [
-        {"timestamp": ts.astimezone(user_tz), "value": val} for ts, val in cgm_data
-    ]
+    start_timestamp = end_timestamp - timezone.timedelta(days=range_days)
 
-    # Get sleep data
-    sleep_data = (
-        SleepSessionEntity.objects.filter(
-            user=user,
-            start_time__lte=end_timestamp,
-            end_time__gte=start_timestamp,
-        )
-        .order_by("start_time")
-        .values_list("start_time", "end_time")
+    # Get AGP summary, settings and the chart series (CGM binned in the
+    # database for longer ranges)
+    cgm_bin_seconds = get_cgm_bin_seconds(range_days)
+    data = HomeDataService(user).load(
+        period_days, start_timestamp, end_timestamp, cgm_bin_seconds
     )
-    sleep_data = [
-        {"start": ts.astimezone(user_tz), "end": val.astimezone(user_tz)}
-        for ts, val in sleep_data
-    ]
+    summary = data.summary
+    user_tz = data.user_timezone
+    target_range = data.settings.target_range
 
-    # Get bolus data
-    bolus_data = (
-        BolusEntity.objects.filter(
-            user=user,
-            timestamp_utc__gte=start_timestamp,
-            timestamp_utc__lte=end_timestamp,
-        )
-        .order_by("timestamp_utc")
-        .values_list("timestamp_utc", "value")
+    agp_patterns = summary.agp_trends if summary else None
+    agp_chart_payload = (
+        get_agp_chart_payload(summary, target_range)
+        if summary and summary.agp
+        else None
     )
-    bolus_data = [
-        {"timestamp": ts.astimezone(user_tz), "value": val} for ts, val in bolus_data
-    ]
-
-    # Get carb data
-    carb_data = (
-        MealEntity.objects.filter(
-            user=user,
-            meal_time_utc__gte=start_timestamp,
-            meal_time_utc__lte=end_timestamp,
-        )
-        .order_by("meal_time_utc")
-        .values_list("meal_time_utc", "carbohydrates")
-    )
-    carb_data = [
-        {"timestamp": ts.astimezone(user_tz), "value": val} for ts, val in carb_data
-    ]
 
     fig_home = get_home_chart(
         extend_hours=extend_hours,
@@ -95,20 +52,22 @@ def home_view(request):
             start_timestamp.astimezone(user_tz),
             end_timestamp.astimezone(user_tz),
         ),
-        agp_data=agp_data,
-        cgm_data=cgm_data,
-        sleep_data=sleep_data,
-        bolus_data=bolus_data,
-        carb_data=carb_data,
+        agp_chart_payload=agp_chart_payload,
+        cgm_data=data.cgm,
+        sleep_data=data.sleep,
+        bolus_data=data.bolus,
+        carb_data=data.carbs,
+        target_range=target_range,
+        cgm_bin_seconds=cgm_bin_seconds,
     )
 
     # Generate error_message if needed
     error_message = None
-    if not cgm_data:
+    if len(data.cgm[0]) == 0:
         error_message = "No CGM data available for the selected period."
-    elif not bolus_data:
+    elif len(data.bolus[0]) == 0:
         error_message = "No bolus data available for the selected period."
-    elif not agp_data:
+    elif not agp_chart_payload:
         error_message = "No AGP summary data available for the selected period."
 
     context = {
@@ -116,7 +75,18 @@ def home_view(request):
         "plotly_graph": fig_home,
         "error_message": error_message,
         "period_days": period_days,
-        "available_periods": [1, 3, 7, 14, 30, 90],
+        "available_periods": AVAILABLE_PERIODS,
+        "range_days": range_days,
+        "available_ranges": AVAILABLE_RANGES,
         "agp_patterns": agp_patterns,
     }
     return render(request, "home.html", context)
+
+
+def get_range_days(value) -> int:
+    """Days of the chart range, the default unless one of the available ones."""
+    try:
+        range_days = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RANGE_DAYS
+    return range_days if range_days in AVAILABLE_RANGES else DEFAULT_RANGE_DAYS
@@ -14,11 +14,31 @@ Quick imports:
 
 # Configuration
 # Core calculations
-from .calculations import calculate_agp, calculate_agp_summary, calculate_stats
+from .calculations import (
+    calculate_agp,
+    calculate_agp_from_arrays,
+    calculate_agp_from_stats,
+    calculate_agp_summary,
+    calculate_stats,
+    calculate_stats_from_arrays,
+)
 from .config import DEFAULT_TIMEZONE, POINTS_PER_DAY, POINTS_PER_HOUR, TIME_PERIODS
 
 # Formatters
-from .formatters import calculate_agp_from_cgm, format_agp_json
+from .formatters import (
+    calculate_agp_from_cgm,
+    calculate_agp_from_cgm_arrays,
+    calculate_agp_from_cgm_histogram,
+    format_agp_json,
+)
+
+# Mergeable state
+from .histogram import (
+    build_hourly_histogram,
+    calculate_agp_from_histogram,
+    calculate_stats_from_histogram,
+    merge_hourly_histograms,
+)
 
 # Pattern detection
 from .patterns import detect_agp_patterns
@@ -31,11 +51,21 @@ __all__ = [
     "POINTS_PER_DAY",
     # Calculations
     "calculate_stats",
+    "calculate_stats_from_arrays",
     "calculate_agp",
+    "calculate_agp_from_arrays",
+    "calculate_agp_from_stats",
     "calculate_agp_summary",
     # Formatters
     "format_agp_json",
     "calculate_agp_from_cgm",
+    "calculate_agp_from_cgm_arrays",
+    "calculate_agp_from_cgm_histogram",
+    # Mergeable state
+    "build_hourly_histogram",
+    "merge_hourly_histograms",
+    "calculate_stats_from_histogram",
+    "calculate_agp_from_histogram",
     # Patterns
     "detect_agp_patterns",
 ]
@@ -4,9 +4,10 @@ Statistical calculations and interpolation for Ambulatory Glucose Profile.
 """
 
 import numpy as np
-import pandas as pd
 import pytz
-from scipy import interpolate as interp
+
+from diafit_backend.features.array_fetch import fetch_arrays
+from diafit_backend.features.timezones import local_hours
 
 from .config import DEFAULT_TIMEZONE, POINTS_PER_DAY
 
@@ -25,19 +26,7 @@ def calculate_stats(logs, log_type, time_grouping="hour", user_timezone=None):
         pandas.DataFrame: DataFrame with percentile statistics (p_10, p_25, p_50, p_75, p_90)
                          indexed by the time grouping
     """
-    if not logs:
-        return pd.DataFrame()
-
-    # Determine timezone
-    tz = (
-        (
-            pytz.timezone(user_timezone)
-            if isinstance(user_timezone, str)
-            else user_timezone
-        )
-        if user_timezone
-        else DEFAULT_TIMEZONE
-    )
+    import pandas as pd
 
     # Determine the timestamp and value columns based on log_type
     if log_type == "cgm":
@@ -51,61 +40,152 @@ def calculate_stats(logs, log_type, time_grouping="hour", user_timezone=None):
         timestamp_col = "timestamp"
         value_col = "value"
 
-    # Convert logs to DataFrame
     if hasattr(logs, "values"):
-        # It's a Django queryset - select only needed columns
-        df = pd.DataFrame(list(logs.values(timestamp_col, value_col)))
-    else:
-        # It's already a list
-        df = pd.DataFrame(logs)
+        # It's a Django queryset - stream only the needed columns into arrays
+        timestamps, values = fetch_arrays(logs, timestamp_col, value_col)
+        return calculate_stats_from_arrays(
+            timestamps, values, time_grouping, user_timezone
+        )
+
+    if not logs:
+        return pd.DataFrame()
+
+    # It's already a list
+    df = pd.DataFrame(logs)
 
     if df.empty:
         return pd.DataFrame()
 
     # Convert timestamp to datetime if it's not already
-    df[timestamp_col] = pd.to_datetime(df[timestamp_col])
+    timestamps = pd.to_datetime(df[timestamp_col])
 
-    # Convert to user's timezone (timestamps are stored in UTC)
-    if df[timestamp_col].dt.tz is None:
+    # Timestamps are stored in UTC
+    if timestamps.dt.tz is None:
         # If timestamps are naive, assume UTC
-        df[timestamp_col] = df[timestamp_col].dt.tz_localize("UTC")
+        timestamps = timestamps.dt.tz_localize("UTC")
+
+    return _percentiles_by_time_group(
+        timestamps, df[value_col], time_grouping, user_timezone
+    )
+
 
+def calculate_stats_from_arrays(
+    timestamps, values, time_grouping="hour", user_timezone=None
+):
+    """
+    Calculate percentile statistics from epoch/value arrays grouped by time period.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        values: Array of values, same length as timestamps
+        time_grouping: Time period to group by ('hour', 'day', etc.)
+        user_timezone: User's timezone (default None uses Europe/Berlin)
+
+    Returns:
+        pandas.DataFrame: DataFrame with percentile statistics (p_10, p_25, p_50, p_75, p_90)
+                         indexed by the time grouping
+    """
+    import pandas as pd
+
+    if len(timestamps) == 0:
+        return pd.DataFrame()
+
+    if time_grouping not in ("day", "week", "month"):
+        # Local hour from the zone's cached UTC offsets, no datetime objects
+        return _percentiles_by_group(
+            local_hours(timestamps, user_timezone), np.asarray(values), "hour"
+        )
+
+    return _percentiles_by_time_group(
+        pd.Series(pd.to_datetime(timestamps, unit="s", utc=True)),
+        pd.Series(values),
+        time_grouping,
+        user_timezone,
+    )
+
+
+def _percentiles_by_time_group(timestamps, values, time_grouping, user_timezone):
+    """Group UTC timestamps by local time period and compute percentiles."""
     # Convert to user's local timezone
-    df[timestamp_col] = df[timestamp_col].dt.tz_convert(tz)
+    timestamps = timestamps.dt.tz_convert(resolve_timezone(user_timezone))
 
     # Extract the time grouping component (now in user's local time)
     if time_grouping == "hour":
-        df["group"] = df[timestamp_col].dt.hour
+        group = timestamps.dt.hour
     elif time_grouping == "day":
-        df["group"] = df[timestamp_col].dt.date
+        group = timestamps.dt.date
     elif time_grouping == "week":
-        df["group"] = df[timestamp_col].dt.isocalendar().week
+        group = timestamps.dt.isocalendar().week
     elif time_grouping == "month":
-        df["group"] = df[timestamp_col].dt.month
+        group = timestamps.dt.month
     else:
-        df["group"] = df[timestamp_col].dt.hour
-
-    # Calculate percentiles for each group
-    stats = df.groupby("group")[value_col].agg(
-        [
-            ("p_10", lambda x: x.quantile(0.10)),
-            ("p_25", lambda x: x.quantile(0.25)),
-            ("p_50", lambda x: x.quantile(0.50)),
-            ("p_75", lambda x: x.quantile(0.75)),
-            ("p_90", lambda x: x.quantile(0.90)),
-        ]
-    )
+        group = timestamps.dt.hour
+
+    return _percentiles_by_group(group.to_numpy(), values.to_numpy(), time_grouping)
+
+
+def _percentiles_by_group(group, values, time_grouping):
+    """
+    Compute the p10-p90 percentiles of values per group.
+
+    Sorts once by (group, value) and interpolates linearly between the
+    closest ranks, like pandas' groupby().quantile().
+    """
+    import pandas as pd
+
+    keys, inverse = np.unique(group, return_inverse=True)
+    values = np.asarray(values, dtype=np.float64)
+    # Sort by value, then stable-sort by group (radix sort on small group ids)
+    order = np.argsort(values)
+    group_dtype = np.uint16 if len(keys) <= np.iinfo(np.uint16).max else np.int64
+    order = order[np.argsort(inverse[order].astype(group_dtype), kind="stable")]
+    sorted_values = values[order]
+    counts = np.bincount(inverse, minlength=len(keys))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    stats = {}
+    for name, q in (
+        ("p_10", 0.10),
+        ("p_25", 0.25),
+        ("p_50", 0.50),
+        ("p_75", 0.75),
+        ("p_90", 0.90),
+    ):
+        position = (counts - 1) * q
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        fraction = position - lower
+        low_values = sorted_values[starts + lower]
+        high_values = sorted_values[starts + upper]
+        stats[name] = low_values + (high_values - low_values) * fraction
+    stats = pd.DataFrame(stats, index=keys)
 
     # If grouping by hour, ensure all 24 hours are present
-    if time_grouping == "hour":
-        all_hours = pd.DataFrame(index=range(24))
-        stats = all_hours.join(stats, how="left")
-        # Fill missing hours with interpolation or forward/backward fill
-        stats = stats.interpolate(method="linear", limit_direction="both")
+    if time_grouping == "hour" and len(keys) < 24:
+        stats = fill_missing_hours(stats)
 
     return stats
 
 
+def resolve_timezone(user_timezone=None):
+    """Return a tzinfo for a timezone name or object (default Europe/Berlin)."""
+    if not user_timezone:
+        return DEFAULT_TIMEZONE
+    if isinstance(user_timezone, str):
+        return pytz.timezone(user_timezone)
+    return user_timezone
+
+
+def fill_missing_hours(stats):
+    """Reindex hourly statistics to hours 0-23, interpolating missing hours."""
+    import pandas as pd
+
+    all_hours = pd.DataFrame(index=range(24))
+    stats = all_hours.join(stats, how="left")
+    # Fill missing hours with interpolation or forward/backward fill
+    return stats.interpolate(method="linear", limit_direction="both")
+
+
 def calculate_agp(
     logs,
     log_type="cgm",
@@ -128,6 +208,47 @@ def calculate_agp(
     """
     # Calculate hourly statistics
     stats = calculate_stats(logs, log_type, "hour", user_timezone)
+    return calculate_agp_from_stats(stats, smoothed, points_per_day)
+
+
+def calculate_agp_from_arrays(
+    timestamps,
+    values,
+    smoothed=True,
+    points_per_day=POINTS_PER_DAY,
+    user_timezone=None,
+):
+    """
+    Calculate Ambulatory Glucose Profile (AGP) from epoch/value arrays.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        values: Array of glucose values
+        smoothed: Whether to apply smoothing to the percentile curves (default True)
+        points_per_day: Number of points per day (default 288 for 5-min intervals)
+        user_timezone: User's timezone (default None uses Europe/Berlin)
+
+    Returns:
+        tuple: (time_array, p10, p25, p50, p75, p90) - time points and percentile values
+    """
+    stats = calculate_stats_from_arrays(timestamps, values, "hour", user_timezone)
+    return calculate_agp_from_stats(stats, smoothed, points_per_day)
+
+
+def calculate_agp_from_stats(stats, smoothed=True, points_per_day=POINTS_PER_DAY):
+    """
+    Interpolate hourly percentile statistics into an AGP curve.
+
+    Args:
+        stats: DataFrame of hourly percentiles as returned by calculate_stats
+        smoothed: Whether to apply smoothing to the percentile curves (default True)
+        points_per_day: Number of points per day (default 288 for 5-min intervals)
+
+    Returns:
+        tuple: (time_array, p10, p25, p50, p75, p90) or None if stats are empty
+    """
+    from scipy import interpolate as interp
+
     if stats.empty:
         return None
 
@@ -3,7 +3,8 @@ AGP Data Formatting Utilities
 Functions for formatting AGP data for JSON output and API responses.
 """
 
-from .calculations import calculate_agp
+from .calculations import calculate_agp, calculate_agp_from_arrays
+from .histogram import calculate_agp_from_histogram
 
 
 def format_agp_json(time_array, p10, p25, p50, p75, p90):
@@ -55,3 +56,59 @@ def calculate_agp_from_cgm(cgm_queryset, smoothed=True, user_timezone=None):
     except Exception as e:
         print(f"Error calculating AGP: {e}")
         return None
+
+
+def calculate_agp_from_cgm_arrays(
+    timestamps, values, smoothed=True, user_timezone=None
+):
+    """
+    Calculate AGP from already-fetched CGM arrays and return formatted JSON.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        values: Array of glucose values (mg/dL)
+        smoothed: Whether to apply smoothing (default True)
+        user_timezone: User's timezone (default None uses Europe/Berlin)
+
+    Returns:
+        dict or None: Formatted AGP data or None if insufficient data
+    """
+    if len(timestamps) == 0:
+        return None
+
+    try:
+        result = calculate_agp_from_arrays(
+            timestamps, values, smoothed=smoothed, user_timezone=user_timezone
+        )
+        if result is None:
+            return None
+
+        return format_agp_json(*result)
+    except Exception as e:
+        print(f"Error calculating AGP: {e}")
+        return None
+
+
+def calculate_agp_from_cgm_histogram(histogram, smoothed=True):
+    """
+    Calculate AGP from a (merged) hourly CGM histogram and return formatted JSON.
+
+    Args:
+        histogram: Hourly histogram as built by build_hourly_histogram
+        smoothed: Whether to apply smoothing (default True)
+
+    Returns:
+        dict or None: Formatted AGP data or None if insufficient data
+    """
+    if not histogram:
+        return None
+
+    try:
+        result = calculate_agp_from_histogram(histogram, smoothed=smoothed)
+        if result is None:
+            return None
+
+        return format_agp_json(*result)
+    except Exception as e:
+        print(f"Error calculating AGP: {e}")
+        return None
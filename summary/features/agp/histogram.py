@@ -0,0 +1,133 @@
+"""
+Mergeable AGP State
+Per-hour glucose histograms that can be summed across days, weeks and months
+and still yield exact AGP percentiles for the merged period.
+
+A histogram maps the local hour to the count of each glucose value:
+    {"0": {"95": 3, "96": 1, ...}, "1": {...}, ...}
+CGM values are integer mg/dL, so the histogram is lossless.
+"""
+
+from collections import Counter
+
+import numpy as np
+
+from diafit_backend.features.timezones import local_hours
+
+from .calculations import calculate_agp_from_stats, fill_missing_hours
+from .config import POINTS_PER_DAY
+
+PERCENTILES = {"p_10": 0.10, "p_25": 0.25, "p_50": 0.50, "p_75": 0.75, "p_90": 0.90}
+
+
+def build_hourly_histogram(timestamps, values, user_timezone=None):
+    """
+    Build a per-local-hour glucose histogram from epoch/value arrays.
+
+    Args:
+        timestamps: Array of epoch seconds (UTC)
+        values: Array of glucose values (mg/dL)
+        user_timezone: User's timezone (default None uses Europe/Berlin)
+
+    Returns:
+        dict: {hour: {value: count}} with string keys (JSON-serializable)
+    """
+    if len(timestamps) == 0:
+        return {}
+
+    hours = local_hours(timestamps, user_timezone)
+    values = np.rint(np.asarray(values, dtype=np.float64)).astype(np.int64)
+
+    pairs, counts = np.unique(
+        np.stack([hours, values], axis=1),
+        axis=0,
+        return_counts=True,
+    )
+
+    histogram = {}
+    for (hour, value), count in zip(pairs.tolist(), counts.tolist()):
+        histogram.setdefault(str(hour), {})[str(value)] = count
+    return histogram
+
+
+def merge_hourly_histograms(histograms):
+    """
+    Sum several hourly histograms into one.
+
+    Args:
+        histograms: Iterable of histograms as returned by build_hourly_histogram
+
+    Returns:
+        dict: Merged histogram
+    """
+    merged = {}
+    for histogram in histograms:
+        for hour, bins in histogram.items():
+            merged.setdefault(hour, Counter()).update(bins)
+    return {hour: dict(bins) for hour, bins in merged.items()}
+
+
+def calculate_stats_from_histogram(histogram):
+    """
+    Calculate hourly percentile statistics from an hourly histogram.
+
+    Matches calculate_stats(..., "hour") on the underlying readings
+    (linear interpolation between order statistics).
+
+    Args:
+        histogram: Hourly histogram
+
+    Returns:
+        pandas.DataFrame: DataFrame with percentile statistics (p_10 ... p_90)
+                         indexed by hour 0-23
+    """
+    import pandas as pd
+
+    rows = {}
+    for hour, bins in histogram.items():
+        if not bins:
+            continue
+        values = np.array([int(value) for value in bins], dtype=np.float64)
+        counts = np.array(list(bins.values()), dtype=np.int64)
+        order = np.argsort(values)
+        rows[int(hour)] = [
+            _quantile(values[order], counts[order], q) for q in PERCENTILES.values()
+        ]
+
+    if not rows:
+        return pd.DataFrame()
+
+    stats = pd.DataFrame.from_dict(rows, orient="index", columns=list(PERCENTILES))
+    return fill_missing_hours(stats)
+
+
+def calculate_agp_from_histogram(
+    histogram, smoothed=True, points_per_day=POINTS_PER_DAY
+):
+    """
+    Calculate Ambulatory Glucose Profile (AGP) from an hourly histogram.
+
+    Args:
+        histogram: Hourly histogram
+        smoothed: Whether to apply smoothing to the percentile curves (default True)
+        points_per_day: Number of points per day (default 288 for 5-min intervals)
+
+    Returns:
+        tuple: (time_array, p10, p25, p50, p75, p90) or None if the histogram is empty
+    """
+    stats = calculate_stats_from_histogram(histogram)
+    return calculate_agp_from_stats(stats, smoothed, points_per_day)
+
+
+def _quantile(values, counts, q):
+    # Position of the quantile in the expanded sorted readings
+    cumulative = np.cumsum(counts)
+    position = (cumulative[-1] - 1) * q
+    lower = int(np.floor(position))
+    fraction = position - lower
+
+    lower_value = values[np.searchsorted(cumulative, lower, side="right")]
+    if fraction == 0:
+        return float(lower_value)
+    upper_value = values[np.searchsorted(cumulative, lower + 1, side="right")]
+    return float(lower_value + fraction * (upper_value - lower_value))
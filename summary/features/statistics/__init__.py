@@ -1,14 +1,30 @@
 # summary/features/statistics/__init__.py
 
-from .bolus_stats import calculate_bolus_stats
-from .cgm_stats import calculate_cgm_coverage, calculate_cgm_stats
-from .meal_stats import calculate_meal_stats
-from .sleep_stats import calculate_sleep_stats
+from .bolus_stats import calculate_bolus_stats, calculate_bolus_stats_from_values
+from .cgm_stats import (
+    calculate_cgm_coverage,
+    calculate_cgm_coverage_by_user,
+    calculate_cgm_coverage_from_array,
+    calculate_cgm_stats,
+    calculate_cgm_stats_from_sums,
+    calculate_cgm_stats_from_values,
+    calculate_cgm_sums,
+)
+from .meal_stats import calculate_meal_stats, calculate_meal_stats_from_arrays
+from .sleep_stats import calculate_sleep_stats, calculate_sleep_stats_from_arrays
 
 __all__ = [
     "calculate_cgm_stats",
+    "calculate_cgm_stats_from_values",
+    "calculate_cgm_sums",
+    "calculate_cgm_stats_from_sums",
     "calculate_cgm_coverage",
+    "calculate_cgm_coverage_from_array",
+    "calculate_cgm_coverage_by_user",
     "calculate_bolus_stats",
+    "calculate_bolus_stats_from_values",
     "calculate_meal_stats",
+    "calculate_meal_stats_from_arrays",
     "calculate_sleep_stats",
+    "calculate_sleep_stats_from_arrays",
 ]
@@ -2,6 +2,7 @@
 
 from typing import Dict, Optional
 
+import numpy as np
 from django.db.models import QuerySet, Sum
 
 
@@ -19,6 +20,27 @@ def calculate_bolus_stats(
         Dict with total_bolus and avg_bolus_per_day
     """
     total_bolus = bolus_queryset.aggregate(total=Sum("value"))["total"] or 0
+    return _bolus_stats(total_bolus, period_days)
+
+
+def calculate_bolus_stats_from_values(
+    values: np.ndarray, period_days: int = 1
+) -> Optional[Dict]:
+    """
+    Calculate bolus statistics from an array of bolus values.
+
+    Args:
+        values: Array of bolus values (units)
+        period_days: Number of days in the period (for averaging)
+
+    Returns:
+        Dict with total_bolus and avg_bolus_per_day
+    """
+    total_bolus = float(np.sum(values)) if len(values) else 0
+    return _bolus_stats(total_bolus, period_days)
+
+
+def _bolus_stats(total_bolus: float, period_days: int) -> Dict:
     avg_bolus_per_day = total_bolus / period_days if period_days > 0 else total_bolus
 
     return {
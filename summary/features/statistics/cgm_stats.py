@@ -1,10 +1,12 @@
 # summary/features/statistics/cgm_stats.py
 
 from datetime import datetime
-from statistics import median
 from typing import Dict, Optional
 
-from django.db.models import Avg, QuerySet, StdDev
+import numpy as np
+from django.db.models import QuerySet
+
+from diafit_backend.features.array_fetch import epoch_seconds, fetch_arrays
 
 
 def calculate_cgm_stats(cgm_queryset: QuerySet) -> Optional[Dict]:
@@ -18,16 +20,33 @@ def calculate_cgm_stats(cgm_queryset: QuerySet) -> Optional[Dict]:
         Dict with glucose_avg, glucose_std, time_in_range, time_below_range, time_above_range
         or None if no data
     """
-    if not cgm_queryset.exists():
+    values = np.fromiter(
+        cgm_queryset.values_list("value_mgdl", flat=True), dtype=np.float64
+    )
+    return calculate_cgm_stats_from_values(values)
+
+
+def calculate_cgm_stats_from_values(values: np.ndarray) -> Optional[Dict]:
+    """
+    Calculate glucose statistics from an array of CGM values.
+
+    Args:
+        values: Array of glucose values in mg/dL
+
+    Returns:
+        Dict with glucose_avg, glucose_std, time_in_range, time_below_range, time_above_range
+        or None if no data
+    """
+    total = len(values)
+    if total == 0:
         return None
 
-    glucose_avg = cgm_queryset.aggregate(avg=Avg("value_mgdl"))["avg"] or 0
-    glucose_std = cgm_queryset.aggregate(std=StdDev("value_mgdl"))["std"] or 0
+    glucose_avg = float(np.mean(values))
+    glucose_std = float(np.std(values))  # population std, same as StdDev()
 
-    total = cgm_queryset.count() or 1
-    tir = cgm_queryset.filter(value_mgdl__range=(70, 180)).count() / total * 100
-    tbr = cgm_queryset.filter(value_mgdl__lt=70).count() / total * 100
-    tar = cgm_queryset.filter(value_mgdl__gt=180).count() / total * 100
+    tir = np.count_nonzero((values >= 70) & (values <= 180)) / total * 100
+    tbr = np.count_nonzero(values < 70) / total * 100
+    tar = np.count_nonzero(values > 180) / total * 100
 
     return {
         "glucose_avg": round(glucose_avg),
@@ -38,6 +57,72 @@ def calculate_cgm_stats(cgm_queryset: QuerySet) -> Optional[Dict]:
     }
 
 
+def calculate_cgm_sums(values: np.ndarray) -> Dict:
+    """
+    Calculate mergeable glucose sums from an array of CGM values.
+
+    Sums of several periods can be added and passed to
+    calculate_cgm_stats_from_sums to get exact statistics for the union.
+
+    Args:
+        values: Array of glucose values in mg/dL
+
+    Returns:
+        Dict with glucose_count, glucose_sum, glucose_sumsq,
+        glucose_below_count, glucose_in_range_count, glucose_above_count
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "glucose_count": len(values),
+        "glucose_sum": float(np.sum(values)),
+        "glucose_sumsq": float(np.sum(values * values)),
+        "glucose_below_count": int(np.count_nonzero(values < 70)),
+        "glucose_in_range_count": int(
+            np.count_nonzero((values >= 70) & (values <= 180))
+        ),
+        "glucose_above_count": int(np.count_nonzero(values > 180)),
+    }
+
+
+def calculate_cgm_stats_from_sums(
+    count: int,
+    total: float,
+    total_sq: float,
+    below_count: int,
+    in_range_count: int,
+    above_count: int,
+) -> Optional[Dict]:
+    """
+    Calculate glucose statistics from (merged) glucose sums.
+
+    Args:
+        count: Number of readings
+        total: Sum of readings
+        total_sq: Sum of squared readings
+        below_count: Readings below 70 mg/dL
+        in_range_count: Readings within 70-180 mg/dL
+        above_count: Readings above 180 mg/dL
+
+    Returns:
+        Dict with glucose_avg, glucose_std, time_in_range, time_below_range, time_above_range
+        or None if no data
+    """
+    if count == 0:
+        return None
+
+    glucose_avg = total / count
+    # population std, clipped against negative rounding noise
+    glucose_std = max(total_sq / count - glucose_avg * glucose_avg, 0.0) ** 0.5
+
+    return {
+        "glucose_avg": round(glucose_avg),
+        "glucose_std": round(glucose_std),
+        "time_in_range": round(in_range_count / count * 100),
+        "time_below_range": round(below_count / count * 100),
+        "time_above_range": round(above_count / count * 100),
+    }
+
+
 def calculate_cgm_coverage(
     cgm_queryset: QuerySet,
     start: datetime,
@@ -46,11 +131,10 @@ def calculate_cgm_coverage(
     fallback_interval_seconds: float = 300.0,  # default 5 minutes
 ) -> float:
     """
-    Calculate CGM coverage percentage for a time period.
+    Calculate CGM coverage percentage for a time period from a queryset.
 
-    Each reading covers up to half the distance to previous and half to next,
-    but each half is capped by expected_interval_seconds/2. Edge readings use
-    the distance to start/end.
+    Thin wrapper around calculate_cgm_coverage_from_array for callers that
+    still hold a queryset. Prefer passing already-fetched epoch arrays.
 
     Args:
         cgm_queryset: QuerySet of CGM entities
@@ -62,62 +146,135 @@ def calculate_cgm_coverage(
     Returns:
         Coverage percentage (0-100)
     """
-    timestamps = list(cgm_queryset.values_list("timestamp", flat=True))
+    (timestamps,) = fetch_arrays(cgm_queryset.order_by("timestamp"), "timestamp")
 
-    if not timestamps:
-        return 0.0
+    return calculate_cgm_coverage_from_array(
+        timestamps,
+        epoch_seconds(start),
+        epoch_seconds(end),
+        expected_interval_seconds=expected_interval_seconds,
+        fallback_interval_seconds=fallback_interval_seconds,
+    )
 
-    # ensure sorted
-    timestamps = sorted(timestamps)
 
-    # total window seconds
-    total_seconds = (end - start).total_seconds()
-    if total_seconds <= 0:
+def calculate_cgm_coverage_from_array(
+    timestamps: np.ndarray,
+    start: int,
+    end: int,
+    expected_interval_seconds: Optional[float] = None,
+    fallback_interval_seconds: float = 300.0,
+) -> float:
+    """
+    Calculate CGM coverage percentage from sorted epoch timestamps.
+
+    Each reading covers up to half the distance to previous and half to next,
+    but each half is capped by expected_interval_seconds/2. Edge readings use
+    the distance to start/end.
+
+    Args:
+        timestamps: Sorted int64 array of epoch seconds
+        start: Start of time period (epoch seconds)
+        end: End of time period (epoch seconds)
+        expected_interval_seconds: Optional known sampling interval. If None, inferred as median delta.
+        fallback_interval_seconds: Default interval if no inference possible (default: 5 minutes)
+
+    Returns:
+        Coverage percentage (0-100)
+    """
+    if len(timestamps) == 0:
         return 0.0
 
-    # compute deltas (in seconds) between consecutive timestamps
-    deltas = []
-    for i in range(len(timestamps) - 1):
-        d = (timestamps[i + 1] - timestamps[i]).total_seconds()
-        if d > 0:
-            deltas.append(d)
+    coverage = calculate_cgm_coverage_by_user(
+        np.zeros(len(timestamps), dtype=np.int64),
+        timestamps,
+        start,
+        end,
+        expected_interval_seconds=expected_interval_seconds,
+        fallback_interval_seconds=fallback_interval_seconds,
+    )
+    return coverage[0]
 
-    # infer expected interval if not provided
-    if expected_interval_seconds is None:
-        if deltas:
-            expected_interval_seconds = float(median(deltas))
-        else:
-            expected_interval_seconds = fallback_interval_seconds
 
-    # guard: must be > 0
-    expected_interval_seconds = max(float(expected_interval_seconds), 1.0)
+def calculate_cgm_coverage_by_user(
+    user_ids: np.ndarray,
+    timestamps: np.ndarray,
+    start: int,
+    end: int,
+    expected_interval_seconds: Optional[float] = None,
+    fallback_interval_seconds: float = 300.0,
+) -> Dict[int, float]:
+    """
+    Calculate CGM coverage percentage for several users in one pass.
+
+    Same rules as calculate_cgm_coverage_from_array, applied per user. The
+    expected interval is inferred per user when not given.
+
+    Args:
+        user_ids: int64 array of user ids
+        timestamps: int64 array of epoch seconds, sorted by (user_id, timestamp)
+        start: Start of time period (epoch seconds)
+        end: End of time period (epoch seconds)
+        expected_interval_seconds: Optional known sampling interval
+        fallback_interval_seconds: Default interval if no inference possible
 
-    half_expected = expected_interval_seconds / 2.0
+    Returns:
+        Dict mapping user_id to coverage percentage (0-100)
+    """
+    total_seconds = float(end - start)
+    if len(user_ids) == 0:
+        return {}
+    if total_seconds <= 0:
+        return {int(uid): 0.0 for uid in np.unique(user_ids)}
 
-    covered_seconds = 0.0
-    n = len(timestamps)
+    # Group index per reading (0..n_users-1), readings are contiguous per user
+    new_user = np.diff(user_ids) != 0
+    group = np.concatenate(([0], np.cumsum(new_user)))
+    n_groups = int(group[-1]) + 1
+    first_idx = np.concatenate(([0], np.flatnonzero(new_user) + 1))
+    last_idx = np.concatenate((first_idx[1:] - 1, [len(user_ids) - 1]))
 
-    for i, ts in enumerate(timestamps):
-        # left coverage
-        if i == 0:
-            left_gap = (ts - start).total_seconds()
-            left_covered = min(left_gap, half_expected)
-        else:
-            prev_gap = (ts - timestamps[i - 1]).total_seconds()
-            left_covered = min(prev_gap / 2.0, half_expected)
+    # Deltas between consecutive readings of the same user
+    deltas = np.diff(timestamps).astype(np.float64)
+    same_user = ~new_user
+    pair_group = group[1:]
 
-        # right coverage
-        if i == n - 1:
-            right_gap = (end - ts).total_seconds()
-            right_covered = min(right_gap, half_expected)
-        else:
-            next_gap = (timestamps[i + 1] - ts).total_seconds()
-            right_covered = min(next_gap / 2.0, half_expected)
+    # infer expected interval per user if not provided
+    if expected_interval_seconds is None:
+        expected = np.full(n_groups, float(fallback_interval_seconds))
+        valid = same_user & (deltas > 0)
+        if valid.any():
+            d_group = pair_group[valid]
+            d = deltas[valid]
+            order = np.lexsort((d, d_group))
+            d_group, d = d_group[order], d[order]
+            groups, lo, counts = np.unique(
+                d_group, return_index=True, return_counts=True
+            )
+            expected[groups] = (d[lo + (counts - 1) // 2] + d[lo + counts // 2]) / 2.0
+    else:
+        expected = np.full(n_groups, float(expected_interval_seconds))
 
-        covered_seconds += max(0.0, left_covered) + max(0.0, right_covered)
+    # guard: must be > 0
+    half_expected = np.maximum(expected, 1.0) / 2.0
 
-    # covered_seconds may slightly exceed total_seconds due to rounding -> cap
-    covered_seconds = min(covered_seconds, total_seconds)
+    # Every interior gap is shared by two readings, each covering half of it
+    interior = np.clip(
+        np.minimum(deltas[same_user] / 2.0, half_expected[pair_group[same_user]]),
+        0.0,
+        None,
+    )
+    covered = 2.0 * np.bincount(
+        pair_group[same_user], weights=interior, minlength=n_groups
+    )
 
-    coverage_percent = (covered_seconds / total_seconds) * 100.0
-    return round(coverage_percent)
+    # Edge readings cover up to the window boundaries
+    left_edge = np.minimum(timestamps[first_idx] - start, half_expected)
+    right_edge = np.minimum(end - timestamps[last_idx], half_expected)
+    covered += np.clip(left_edge, 0.0, None) + np.clip(right_edge, 0.0, None)
+
+    # covered seconds may slightly exceed total_seconds due to rounding -> cap
+    coverage = np.minimum(covered, total_seconds) / total_seconds * 100.0
+
+    return {
+        int(uid): round(float(pct)) for uid, pct in zip(user_ids[first_idx], coverage)
+    }
@@ -2,6 +2,7 @@
 
 from typing import Dict, Optional
 
+import numpy as np
 from django.db.models import Count, QuerySet, Sum
 
 
@@ -26,12 +27,47 @@ def calculate_meal_stats(
         count=Count("id"),
     )
 
-    total_carbs = totals["carbs"] or 0
-    total_proteins = totals["proteins"] or 0
-    total_fats = totals["fats"] or 0
-    total_calories = totals["calories"] or 0
-    total_meals = totals["count"] or 0
+    return _meal_stats(
+        total_carbs=totals["carbs"] or 0,
+        total_proteins=totals["proteins"] or 0,
+        total_fats=totals["fats"] or 0,
+        total_calories=totals["calories"] or 0,
+        total_meals=totals["count"] or 0,
+        period_days=period_days,
+    )
+
+
+def calculate_meal_stats_from_arrays(
+    carbs: np.ndarray,
+    proteins: np.ndarray,
+    fats: np.ndarray,
+    calories: np.ndarray,
+    period_days: int = 1,
+) -> Optional[Dict]:
+    """
+    Calculate meal statistics from per-meal nutrient arrays.
+
+    Args:
+        carbs, proteins, fats, calories: Arrays with one entry per meal
+                                         (missing values as 0)
+        period_days: Number of days in the period (for averaging)
+
+    Returns:
+        Dict with total and average values for carbs, proteins, fats, calories, and meal count
+    """
+    return _meal_stats(
+        total_carbs=int(np.sum(carbs)),
+        total_proteins=int(np.sum(proteins)),
+        total_fats=int(np.sum(fats)),
+        total_calories=int(np.sum(calories)),
+        total_meals=len(carbs),
+        period_days=period_days,
+    )
+
 
+def _meal_stats(
+    total_carbs, total_proteins, total_fats, total_calories, total_meals, period_days
+) -> Dict:
     return {
         "total_carbs": total_carbs,
         "total_proteins": total_proteins,
@@ -3,9 +3,12 @@
 from datetime import time
 from typing import Dict, Optional
 
-import pytz
+import numpy as np
 from django.db.models import QuerySet
 
+from diafit_backend.features.array_fetch import fetch_arrays
+from diafit_backend.features.timezones import utc_offsets
+
 
 def calculate_sleep_stats(
     sleep_sessions_queryset: QuerySet, user_timezone: str = "Europe/Berlin"
@@ -21,48 +24,77 @@ def calculate_sleep_stats(
         Dict with sleep duration metrics and average sleep/wake times
         or None if no data
     """
-    if not sleep_sessions_queryset.exists():
+    start_times, end_times, total_minutes, deep_minutes, rem_minutes = fetch_arrays(
+        sleep_sessions_queryset,
+        "start_time",
+        "end_time",
+        "total_duration_minutes",
+        "deep_sleep_minutes",
+        "rem_sleep_minutes",
+    )
+    if len(start_times) == 0:
         return None
 
-    session_count = sleep_sessions_queryset.count()
+    return calculate_sleep_stats_from_arrays(
+        start_times=start_times,
+        end_times=end_times,
+        total_minutes=total_minutes,
+        deep_minutes=deep_minutes,
+        rem_minutes=rem_minutes,
+        user_timezone=user_timezone,
+    )
+
+
+def calculate_sleep_stats_from_arrays(
+    start_times: np.ndarray,
+    end_times: np.ndarray,
+    total_minutes: np.ndarray,
+    deep_minutes: np.ndarray,
+    rem_minutes: np.ndarray,
+    user_timezone: str = "Europe/Berlin",
+) -> Optional[Dict]:
+    """
+    Calculate sleep statistics from per-session arrays.
+
+    Args:
+        start_times: Session start times (epoch seconds)
+        end_times: Session end times (epoch seconds)
+        total_minutes: Total sleep duration per session (missing as 0)
+        deep_minutes: Deep sleep duration per session (missing as 0)
+        rem_minutes: REM sleep duration per session (missing as 0)
+        user_timezone: User's timezone for time calculations
+
+    Returns:
+        Dict with sleep duration metrics and average sleep/wake times
+        or None if no data
+    """
+    session_count = len(start_times)
+    if session_count == 0:
+        return None
 
     # Calculate average sleep durations per session (in minutes)
-    total_sleep = sum(s.total_duration_minutes or 0 for s in sleep_sessions_queryset)
-    daily_sleep_duration = total_sleep / session_count
-
-    total_deep = sum(s.deep_sleep_minutes or 0 for s in sleep_sessions_queryset)
-    daily_deep_sleep_duration = total_deep / session_count
-
-    total_rem = sum(s.rem_sleep_minutes or 0 for s in sleep_sessions_queryset)
-    daily_rem_sleep_duration = total_rem / session_count
-
-    # Calculate average fall asleep and wake up times
-    user_tz = pytz.timezone(user_timezone)
-
-    fall_asleep_times = [
-        s.start_time.astimezone(user_tz).time() for s in sleep_sessions_queryset
-    ]
-    avg_fall_asleep_time = None
-    if fall_asleep_times:
-        # Handle circular time (bedtime typically 20:00-03:00)
-        minutes = []
-        for t in fall_asleep_times:
-            mins = t.hour * 60 + t.minute
-            if mins < 720:  # Before 12:00 - treat as next day
-                mins += 1440
-            minutes.append(mins)
-        avg_minutes = sum(minutes) // len(minutes)
-        avg_minutes = avg_minutes % 1440  # Wrap back to 24-hour format
-        avg_fall_asleep_time = time(hour=avg_minutes // 60, minute=avg_minutes % 60)
-
-    wake_up_times = [
-        s.end_time.astimezone(user_tz).time() for s in sleep_sessions_queryset
-    ]
-    avg_wake_up_time = None
-    if wake_up_times:
-        total_minutes = sum(t.hour * 60 + t.minute for t in wake_up_times)
-        avg_minutes = total_minutes // len(wake_up_times)
-        avg_wake_up_time = time(hour=avg_minutes // 60, minute=avg_minutes % 60)
+    daily_sleep_duration = float(np.sum(total_minutes)) / session_count
+    daily_deep_sleep_duration = float(np.sum(deep_minutes)) / session_count
+    daily_rem_sleep_duration = float(np.sum(rem_minutes)) / session_count
+
+    # Calculate average fall asleep and wake up times (minutes of the local day)
+    start_times = np.asarray(start_times, dtype=np.int64)
+    end_times = np.asarray(end_times, dtype=np.int64)
+    fall_asleep_minutes = (
+        (start_times + utc_offsets(start_times, user_timezone)) // 60 % 1440
+    )
+    # Handle circular time (bedtime typically 20:00-03:00)
+    # Before 12:00 - treat as next day
+    fall_asleep_minutes = np.where(
+        fall_asleep_minutes < 720, fall_asleep_minutes + 1440, fall_asleep_minutes
+    )
+    avg_minutes = int(fall_asleep_minutes.sum()) // session_count
+    avg_minutes = avg_minutes % 1440  # Wrap back to 24-hour format
+    avg_fall_asleep_time = time(hour=avg_minutes // 60, minute=avg_minutes % 60)
+
+    wake_up_minutes = (end_times + utc_offsets(end_times, user_timezone)) // 60 % 1440
+    avg_minutes = int(wake_up_minutes.sum()) // session_count
+    avg_wake_up_time = time(hour=avg_minutes // 60, minute=avg_minutes % 60)
 
     return {
         "daily_sleep_duration": daily_sleep_duration,
@@ -0,0 +1,80 @@
+# summary/management/commands/backfill_summaries.py
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from summary.tasks.backfill_summaries import DEFAULT_CHUNK_SIZE, backfill_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill daily, weekly, monthly and quarterly summaries for a date range, "
+        "fetching each user's data once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=str,
+            required=True,
+            help="Start date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--end",
+            type=str,
+            required=False,
+            help="End date (YYYY-MM-DD). Defaults to yesterday.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            required=False,
+            help="JSON file recording completed users; rerun with the same file to resume.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Users processed between two checkpoints (default: {DEFAULT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        start_str = options["start"]
+        end_str = options.get("end")
+
+        try:
+            start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
+            if end_str:
+                end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
+            else:
+                end_date = date.today() - timedelta(days=1)
+        except ValueError:
+            self.stderr.write(
+                self.style.ERROR("❌ Invalid date format. Use YYYY-MM-DD.")
+            )
+            return
+
+        if end_date < start_date:
+            self.stderr.write(self.style.ERROR("❌ End date must be >= start date."))
+            return
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"📊 Backfilling summaries from {start_date} to {end_date}..."
+            )
+        )
+
+        result = backfill_summaries(
+            start_date,
+            end_date,
+            checkpoint_path=options.get("checkpoint"),
+            chunk_size=options["chunk_size"],
+        )
+
+        if result["failed"]:
+            self.stderr.write(
+                self.style.WARNING(
+                    f"⚠️  {len(result['failed'])} users failed: {sorted(result['failed'])}"
+                )
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Backfill complete."))
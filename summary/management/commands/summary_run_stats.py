@@ -0,0 +1,140 @@
+# summary/management/commands/summary_run_stats.py
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from summary.models import SummaryRunStats
+from summary.tasks.prune_run_stats import prune_run_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the recorded summary task runs: time and queries per phase and "
+        "the slowest users, optionally pruning old records."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--task",
+            type=str,
+            required=False,
+            help="Only runs of tasks whose dotted path contains this text",
+        )
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=24,
+            help="Only runs started in the last hours (default: 24)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Number of slowest users shown (default: 10)",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print the report as JSON",
+        )
+        parser.add_argument(
+            "--prune",
+            type=int,
+            required=False,
+            metavar="DAYS",
+            help="Delete records older than DAYS days instead of reporting",
+        )
+
+    def handle(self, *args, **options):
+        if options.get("prune") is not None:
+            if options["prune"] < 0:
+                raise CommandError("--prune must not be negative")
+            deleted = prune_run_stats(options["prune"])
+            self.stdout.write(
+                self.style.SUCCESS(f"🗑️  Deleted {deleted} run stats records.")
+            )
+            return
+
+        runs = SummaryRunStats.objects.filter(
+            started_at__gte=timezone.now() - timedelta(hours=options["hours"])
+        )
+        if options.get("task"):
+            runs = runs.filter(task__contains=options["task"])
+
+        report = {}
+        for run in runs.iterator():
+            task = report.setdefault(
+                run.task,
+                {
+                    "shards": 0,
+                    "users": 0,
+                    "failed": 0,
+                    "duration_ms": 0.0,
+                    "queries": 0,
+                    "phases": {},
+                    "slowest_users": [],
+                },
+            )
+            task["shards"] += 1
+            task["users"] += run.users
+            task["failed"] += run.failed
+            task["duration_ms"] = round(task["duration_ms"] + run.duration_ms, 1)
+            task["queries"] += run.queries
+            for name, values in run.phases.items():
+                total = task["phases"].setdefault(name, {"ms": 0.0, "queries": 0})
+                total["ms"] = round(total["ms"] + values["ms"], 1)
+                total["queries"] += values["queries"]
+            task["slowest_users"].extend(
+                {**user, "started_at": run.started_at.isoformat()}
+                for user in run.slowest_users
+            )
+
+        for task in report.values():
+            task["phases"] = dict(
+                sorted(
+                    task["phases"].items(), key=lambda item: item[1]["ms"], reverse=True
+                )
+            )
+            task["slowest_users"] = sorted(
+                task["slowest_users"], key=lambda user: user["ms"], reverse=True
+            )[: options["top"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        if not report:
+            self.stdout.write(self.style.WARNING("⚠️  No recorded runs."))
+            return
+
+        for name, task in report.items():
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"📊 {name}: {task['users']} users ({task['failed']} failed) "
+                    f"in {task['shards']} shards, {task['duration_ms']:.0f} ms, "
+                    f"{task['queries']} queries"
+                )
+            )
+            for phase, values in task["phases"].items():
+                share = values["ms"] / task["duration_ms"] if task["duration_ms"] else 0
+                self.stdout.write(
+                    f"  {phase:<10} {values['ms']:>10.0f} ms {share:>6.1%} "
+                    f"{values['queries']:>8} queries"
+                )
+            self.stdout.write("  Slowest users:")
+            for user in task["slowest_users"]:
+                phases = ", ".join(
+                    f"{phase} {values['ms']:.0f}"
+                    for phase, values in sorted(
+                        user["phases"].items(),
+                        key=lambda item: item[1]["ms"],
+                        reverse=True,
+                    )
+                )
+                failed = " ❌" if user["failed"] else ""
+                self.stdout.write(
+                    f"  user {user['user_id']:<8} {user['ms']:>8.0f} ms "
+                    f"{user['queries']:>6} queries  ({phases}){failed}"
+                )
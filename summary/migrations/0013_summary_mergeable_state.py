@@ -0,0 +1,208 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summary', '0012_dirtysummaryday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysummary',
+            name='agp_histogram',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_above_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_below_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_in_range_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysummary',
+            name='glucose_sumsq',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='agp_histogram',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='day_count',
+            field=models.IntegerField(default=0, help_text='Number of daily summaries rolled up'),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_above_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_below_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_in_range_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='glucose_sumsq',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='agp_histogram',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='day_count',
+            field=models.IntegerField(default=0, help_text='Number of daily summaries rolled up'),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_above_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_below_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_in_range_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quarterlysummary',
+            name='glucose_sumsq',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='agp_histogram',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='day_count',
+            field=models.IntegerField(default=0, help_text='Number of daily summaries rolled up'),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_above_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_below_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_in_range_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='glucose_sumsq',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='agp_histogram',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='day_count',
+            field=models.IntegerField(default=0, help_text='Number of daily summaries rolled up'),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_above_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_below_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_in_range_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklysummary',
+            name='glucose_sumsq',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summary', '0013_summary_mergeable_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollingsummary',
+            name='agp_chart',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
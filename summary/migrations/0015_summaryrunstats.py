@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summary', '0014_rollingsummary_agp_chart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRunStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(help_text='Dotted path of the task', max_length=200)),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('users', models.IntegerField()),
+                ('failed', models.IntegerField(default=0)),
+                ('queries', models.IntegerField()),
+                ('phases', models.JSONField(help_text='{phase: {ms, queries}} summed over users')),
+                ('slowest_users', models.JSONField(help_text='Slowest users: [{user_id, ms, queries, failed, phases}]')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['task', 'started_at'], name='summary_sum_task_f604ae_idx')],
+            },
+        ),
+    ]
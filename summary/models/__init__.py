@@ -1,6 +1,8 @@
 from summary.models.base_summary import BaseSummary  # noqa: F401
 from summary.models.daily_summary import DailySummary  # noqa: F401
+from summary.models.dirty_summary_day import DirtySummaryDay  # noqa: F401
 from summary.models.monthly_summary import MonthlySummary  # noqa: F401
 from summary.models.quarterly_summary import QuarterlySummary  # noqa: F401
 from summary.models.rolling_summary import RollingSummary  # noqa: F401
+from summary.models.summary_run_stats import SummaryRunStats  # noqa: F401
 from summary.models.weekly_summary import WeeklySummary  # noqa: F401
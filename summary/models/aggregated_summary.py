@@ -10,6 +10,10 @@ class AggregatedSummary(BaseSummary):
     Daily summaries should inherit from BaseSummary directly.
     """
 
+    day_count = models.IntegerField(
+        default=0, help_text="Number of daily summaries rolled up"
+    )
+
     # Sleep
     daily_sleep_duration = models.IntegerField(null=True, blank=True)
     daily_deep_sleep_duration = models.IntegerField(null=True, blank=True)
@@ -26,5 +26,19 @@ class BaseSummary(models.Model):
     daily_total_fats = models.IntegerField()
     daily_total_calories = models.IntegerField()
 
+    # Mergeable CGM state, lets longer periods be rolled up without raw CGM
+    glucose_count = models.IntegerField(default=0)
+    glucose_sum = models.FloatField(default=0)
+    glucose_sumsq = models.FloatField(default=0)
+    glucose_below_count = models.IntegerField(default=0)
+    glucose_in_range_count = models.IntegerField(default=0)
+    glucose_above_count = models.IntegerField(default=0)
+    agp_histogram = models.JSONField(null=True, blank=True)
+    # {
+    #   "0": {"95": 3, "96": 1, ...},  # local hour -> glucose value -> count
+    #   ...
+    #   "23": {...}
+    # }
+
     class Meta:
         abstract = True
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class DirtySummaryDay(models.Model):
+    """
+    Model to track (user, day) pairs whose summaries are out of date.
+
+    Rows are written by the ingestion endpoints and consumed by the
+    debounced recompute task.
+    """
+
+    user = models.ForeignKey("auth.User", on_delete=models.CASCADE)
+    date = models.DateField()
+    marked_at = models.DateTimeField(help_text="Time of the latest ingestion")
+
+    class Meta:
+        unique_together = ("user", "date")
+        ordering = ["marked_at"]
+
+    def __str__(self):
+        return f"Dirty day {self.date} for {self.user.username}"
@@ -13,6 +13,15 @@ class RollingSummary(AggregatedSummary):
     period_days = models.IntegerField(help_text="Number of days in the rolling period")
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Chart-ready AGP bands for the user's target range, see
+    # charts.charts.agp.agp_chart_payload (rebuilt when the targets change)
+    agp_chart = models.JSONField(null=True, blank=True)
+    # {
+    #   "version": 1,
+    #   "target_range": [70, 180],
+    #   "rows": [[...], ...]  # AGP_BAND_ROWS over one day from 00:00
+    # }
+
     class Meta:
         unique_together = ("user", "end_date", "period_days")
         ordering = ["-end_date", "period_days"]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class SummaryRunStats(models.Model):
+    """
+    Timing of one shard of a summary task run.
+
+    Written by the task runner (see summary/services/run_stats.py), read by
+    `manage.py summary_run_stats`. Phases map a phase name (fetch, stats,
+    agp, patterns, write, other) to its wall time and query count.
+    """
+
+    task = models.CharField(max_length=200, help_text="Dotted path of the task")
+    started_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    users = models.IntegerField()
+    failed = models.IntegerField(default=0)
+    queries = models.IntegerField()
+    phases = models.JSONField(help_text="{phase: {ms, queries}} summed over users")
+    slowest_users = models.JSONField(
+        help_text="Slowest users: [{user_id, ms, queries, failed, phases}]"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "started_at"]),
+        ]
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.task} at {self.started_at}: {self.users} users in {self.duration_ms:.0f} ms"
@@ -1,2 +1,6 @@
 from charts.charts.agp.agp_chart import get_agp_chart  # noqa: F401
-from summary.services.agp_service import get_agp_summary  # noqa: F401
+from summary.services.agp_service import (
+    get_agp_chart_payload,  # noqa: F401
+    get_agp_summary,  # noqa: F401
+    get_user_target_range,  # noqa: F401
+)
@@ -1,3 +1,10 @@
+from django.core.exceptions import ObjectDoesNotExist
+
+from charts.charts.agp.agp_chart_payload import (
+    build_agp_chart_payload,
+    is_agp_chart_payload_current,
+)
+from charts.charts.target_range import DEFAULT_TARGET_RANGE
 from summary.models import RollingSummary
 
 
@@ -6,3 +13,24 @@ def get_agp_summary(user, period_days):
     return RollingSummary.objects.filter(
         user=user, period_days=period_days, agp__isnull=False
     ).first()
+
+
+def get_user_target_range(user) -> tuple:
+    """Return the user's (low, high) glucose target, the default without settings."""
+    try:
+        return user.settings.target_range
+    except ObjectDoesNotExist:
+        return DEFAULT_TARGET_RANGE
+
+
+def get_agp_chart_payload(summary, target_range):
+    """
+    Return the stored AGP chart payload of a summary for a target range.
+
+    The payload is stored by the rolling summary task and rebuilt when the
+    user's targets change (see summary.signals). A payload that is still
+    missing or outdated is built in memory, the view never writes it.
+    """
+    if is_agp_chart_payload_current(summary.agp_chart, target_range):
+        return summary.agp_chart
+    return build_agp_chart_payload(summary.agp, target_range)
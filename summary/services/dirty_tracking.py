@@ -0,0 +1,53 @@
+"""
+Dirty day tracking.
+
+Ingestion endpoints mark the (user, day) pairs touched by new data as dirty.
+The debounced recompute task (summary/tasks/recompute_dirty_summaries.py)
+only recomputes the daily summaries and rolling windows of those days.
+"""
+
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from summary.models import DirtySummaryDay
+
+
+def mark_summary_days_dirty(entities, *time_fields: str) -> None:
+    """
+    Mark the UTC days touched by ingested entities as dirty.
+
+    Args:
+        entities: Iterable of model instances with a user_id
+        time_fields: Names of the datetime fields that place an entity on a day
+                     (e.g. "timestamp" for CGM, "start_time", "end_time" for sleep)
+    """
+    now = timezone.now()
+    dirty_days = {
+        (entity.user_id, _utc_date(getattr(entity, field)))
+        for entity in entities
+        for field in time_fields
+        if getattr(entity, field) is not None
+    }
+    if not dirty_days:
+        return
+
+    DirtySummaryDay.objects.bulk_create(
+        [
+            DirtySummaryDay(user_id=user_id, date=day, marked_at=now)
+            for user_id, day in dirty_days
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "date"],
+        update_fields=["marked_at"],
+    )
+
+
+def _utc_date(value):
+    # Entities built from an API payload may still hold the raw ISO string
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value.astimezone(dt_timezone.utc).date()
@@ -0,0 +1,111 @@
+"""
+Hierarchical summary rollup.
+
+Combines lower-level summaries (daily rows into weeks and months, monthly
+rows into quarters) using their mergeable state, so longer periods never
+have to scan raw CGM data.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from summary.features.agp import merge_hourly_histograms
+from summary.features.statistics import calculate_cgm_stats_from_sums
+
+CGM_STAT_FIELDS = [
+    "glucose_avg",
+    "glucose_std",
+    "time_in_range",
+    "time_below_range",
+    "time_above_range",
+]
+
+# Added up across summaries
+SUM_FIELDS = [
+    "glucose_count",
+    "glucose_sum",
+    "glucose_sumsq",
+    "glucose_below_count",
+    "glucose_in_range_count",
+    "glucose_above_count",
+]
+
+# Per-day averages, weighted by the number of days behind each summary
+DAILY_AVERAGE_FIELDS = [
+    "daily_total_bolus",
+    "daily_total_meals",
+    "daily_total_carbs",
+    "daily_total_proteins",
+    "daily_total_fats",
+    "daily_total_calories",
+]
+
+
+def is_mergeable(summary) -> bool:
+    """Whether a summary carries the state needed for an exact rollup."""
+    return (
+        summary.glucose_count > 0
+        and summary.agp_histogram is not None
+        and getattr(summary, "day_count", 1) > 0
+    )
+
+
+def rollup_summaries(summaries) -> Optional[Dict]:
+    """
+    Combine summaries into the fields of a longer period.
+
+    Glucose statistics are computed from the summed glucose state, so the
+    standard deviation is exact instead of an average of daily values.
+    Summaries written before the state was stored fall back to the
+    day-weighted average of their statistics.
+
+    Args:
+        summaries: DailySummary rows or aggregated summaries (with day_count)
+
+    Returns:
+        Dict of summary fields including the merged state, or None if empty.
+        "agp_histogram" is None if any summary lacks a histogram.
+    """
+    summaries = list(summaries)
+    if not summaries:
+        return None
+
+    weights = np.array(
+        [getattr(summary, "day_count", 1) or 1 for summary in summaries],
+        dtype=np.float64,
+    )
+
+    def weighted_average(field):
+        values = np.array([getattr(s, field) or 0 for s in summaries], dtype=float)
+        return float(np.average(values, weights=weights))
+
+    sums = {field: sum(getattr(s, field) for s in summaries) for field in SUM_FIELDS}
+
+    if all(summary.glucose_count > 0 for summary in summaries):
+        cgm_stats = calculate_cgm_stats_from_sums(
+            sums["glucose_count"],
+            sums["glucose_sum"],
+            sums["glucose_sumsq"],
+            sums["glucose_below_count"],
+            sums["glucose_in_range_count"],
+            sums["glucose_above_count"],
+        )
+    else:
+        cgm_stats = {field: round(weighted_average(field)) for field in CGM_STAT_FIELDS}
+
+    histograms = [summary.agp_histogram for summary in summaries]
+    agp_histogram = (
+        merge_hourly_histograms(histograms)
+        if all(histogram is not None for histogram in histograms)
+        else None
+    )
+
+    return {
+        **cgm_stats,
+        "daily_cgm_coverage": round(weighted_average("daily_cgm_coverage")),
+        **{field: weighted_average(field) for field in DAILY_AVERAGE_FIELDS},
+        **sums,
+        "day_count": int(weights.sum()),
+        "agp_histogram": agp_histogram,
+    }
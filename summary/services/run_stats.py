@@ -0,0 +1,229 @@
+"""
+Summary Run Statistics
+
+Timing spans of the summary tasks. run_user_shard records one RunStats per
+shard: a span per user, split into phases (fetch, stats, agp, patterns,
+write) by `phase` blocks in the per-user functions, with the number of
+database queries of each phase. Queries are counted with an execute
+wrapper, so no debug cursor or query log is needed. The result is stored
+as a SummaryRunStats row, see `manage.py summary_run_stats`.
+
+Phases are exclusive: a nested phase pauses the enclosing one, so the phases
+of a span add up to its wall time (time outside any phase is "other").
+Outside a recorded run (shell, tests) `phase` does nothing.
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OTHER = "other"
+USERS = "users"
+
+# Users with the longest wall time stored per shard
+SLOWEST_USERS_STORED = 50
+
+# Draws the sample of log_sampled
+_log_rng = random.Random()
+
+_current: ContextVar[Optional["RunStats"]] = ContextVar(
+    "summary_run_stats", default=None
+)
+
+
+class Span:
+    """Exclusive wall time and query count per phase of one user or shard."""
+
+    def __init__(self):
+        self.phase_ms: Dict[str, float] = {}
+        self.phase_queries: Dict[str, int] = {}
+        self._stack: List[str] = [OTHER]
+        self._since = time.perf_counter()
+
+    def enter(self, name: str):
+        self._charge()
+        self._stack.append(name)
+
+    def exit(self):
+        self._charge()
+        self._stack.pop()
+
+    def close(self):
+        self._charge()
+
+    def count_query(self):
+        phase = self._stack[-1]
+        self.phase_queries[phase] = self.phase_queries.get(phase, 0) + 1
+
+    @property
+    def ms(self) -> float:
+        return sum(self.phase_ms.values())
+
+    @property
+    def queries(self) -> int:
+        return sum(self.phase_queries.values())
+
+    def phases(self, exclude=()) -> Dict[str, dict]:
+        """{phase: {"ms", "queries"}} rounded for storage."""
+        return {
+            name: {
+                "ms": round(ms, 1),
+                "queries": self.phase_queries.get(name, 0),
+            }
+            for name, ms in self.phase_ms.items()
+            if name not in exclude
+        }
+
+    def _charge(self):
+        now = time.perf_counter()
+        phase = self._stack[-1]
+        self.phase_ms[phase] = (
+            self.phase_ms.get(phase, 0.0) + (now - self._since) * 1000
+        )
+        self._since = now
+
+
+class RunStats:
+    """
+    Record the spans of one shard of a summary task.
+
+    Usage:
+        stats = RunStats(func_path)
+        with stats.record():
+            for user in users:
+                with stats.user(user.id):
+                    func(user, ...)
+        stats.save()
+    """
+
+    def __init__(self, task: str):
+        self.task = task
+        self.started_at = timezone.now()
+        self.shard = Span()
+        self.users: List[tuple] = []  # (user_id, Span, failed)
+        self._span = self.shard
+
+    @contextmanager
+    def record(self):
+        """Make this the current run and count the queries of its spans."""
+        token = _current.set(self)
+        try:
+            with connection.execute_wrapper(self._count_query):
+                yield self
+        finally:
+            _current.reset(token)
+            self.shard.close()
+
+    @contextmanager
+    def user(self, user_id: int):
+        """Span of one user, failed if the block raises."""
+        span = Span()
+        self.shard.enter(USERS)
+        self._span = span
+        failed = True
+        try:
+            yield span
+            failed = False
+        finally:
+            span.close()
+            self._span = self.shard
+            self.shard.exit()
+            self.users.append((user_id, span, failed))
+
+    def totals(self) -> Dict[str, dict]:
+        """Phases summed over all users and the shard itself."""
+        totals: Dict[str, dict] = {}
+        spans = [span.phases() for _, span, _ in self.users]
+        for phases in spans + [self.shard.phases(exclude=(USERS,))]:
+            for name, values in phases.items():
+                total = totals.setdefault(name, {"ms": 0.0, "queries": 0})
+                total["ms"] = round(total["ms"] + values["ms"], 1)
+                total["queries"] += values["queries"]
+        return totals
+
+    def slowest_users(self, limit: int = SLOWEST_USERS_STORED) -> List[dict]:
+        users = sorted(self.users, key=lambda item: item[1].ms, reverse=True)
+        return [
+            {
+                "user_id": user_id,
+                "ms": round(span.ms, 1),
+                "queries": span.queries,
+                "failed": failed,
+                "phases": span.phases(),
+            }
+            for user_id, span, failed in users[:limit]
+        ]
+
+    def save(self):
+        """Store the run as a SummaryRunStats row, errors are only logged."""
+        from summary.models import SummaryRunStats
+
+        try:
+            SummaryRunStats.objects.create(
+                task=self.task,
+                started_at=self.started_at,
+                duration_ms=round(self.shard.ms, 1),
+                users=len(self.users),
+                failed=sum(1 for _, _, failed in self.users if failed),
+                queries=self.shard.queries
+                + sum(span.queries for _, span, _ in self.users),
+                phases=self.totals(),
+                slowest_users=self.slowest_users(),
+            )
+        except Exception:
+            logger.exception(f"Could not store the run stats of {self.task}")
+
+    def _count_query(self, execute, sql, params, many, context):
+        self._span.count_query()
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def phase(name: str):
+    """Charge the block to phase `name` of the current user, if recording."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+
+    span = stats._span
+    span.enter(name)
+    try:
+        yield
+    finally:
+        span.exit()
+
+
+def is_run_stats_enabled() -> bool:
+    return getattr(settings, "SUMMARY_RUN_STATS", True)
+
+
+def log_sampled(
+    log: logging.Logger,
+    msg: str,
+    *args,
+    rate: Optional[float] = None,
+    rng: Optional[random.Random] = None,
+):
+    """
+    Log a per-user debug message for a sample of the calls.
+
+    The share is `rate` (defaults to SUMMARY_DEBUG_LOG_SAMPLE_RATE), drawn
+    from `rng` (defaults to the module's generator); the message is only
+    formatted when it is logged.
+    """
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    if rate is None:
+        rate = getattr(settings, "SUMMARY_DEBUG_LOG_SAMPLE_RATE", 0.01)
+    if (rng or _log_rng).random() < rate:
+        log.debug(msg, *args)
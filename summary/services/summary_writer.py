@@ -0,0 +1,186 @@
+"""
+Bulk upsert writer for summary models.
+
+Buffers summary rows and writes them with one INSERT ... ON CONFLICT DO UPDATE
+per batch, keyed on the model's unique_together constraint, instead of an
+update_or_create (SELECT + UPDATE/INSERT) per row.
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+from django.db.models import Q
+
+
+class SummaryWriter:
+    """
+    Buffer summary rows per model and flush them with bulk upserts.
+
+    Usage:
+        with SummaryWriter() as writer:
+            writer.add(DailySummary, user=user, date=day, defaults={...})
+
+    Rows are flushed when a model's buffer reaches batch_size and when the
+    context exits without an exception. Like update_or_create, an existing
+    row only has the fields in `defaults` (and auto_now fields) updated.
+    Adding the same unique key twice before a flush keeps the last row.
+
+    `replace` buffers a row like `add` and, on flush, also deletes the rows
+    that differ from it only by an older value of one unique field (e.g. the
+    rolling summary of a user and period ending on a previous day). Rows
+    with a newer value are kept.
+
+    Rows added inside an `atomic()` block are kept apart and only join the
+    buffers when the block exits without an exception, so a failing user
+    of a shard leaves none of its rows behind.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._buffers: Dict[type, Dict[tuple, object]] = {}
+        self._update_fields: Dict[type, Set[str]] = {}
+        self._replace_by: Dict[type, Dict[tuple, str]] = {}
+        self._in_atomic = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, model, defaults: Optional[Dict] = None, **lookup):
+        """
+        Buffer one row, same arguments as update_or_create.
+
+        Args:
+            model: Summary model class with a unique_together constraint
+            defaults (dict, optional): Field values to write
+            lookup: Values of the unique_together fields
+        """
+        row = model(**lookup, **(defaults or {}))
+        key = tuple(_field_values(row, _unique_fields(model)).values())
+
+        buffer = self._buffers.setdefault(model, {})
+        buffer[key] = row
+        self._update_fields.setdefault(model, set()).update(defaults or {})
+        if not self._in_atomic and len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def replace(
+        self, model, replace_by: str, defaults: Optional[Dict] = None, **lookup
+    ):
+        """
+        Buffer one row like `add` and replace the rows it supersedes.
+
+        On flush the rows with the same values of the other unique fields
+        and an older value of `replace_by` are deleted.
+
+        Args:
+            model: Summary model class with a unique_together constraint
+            replace_by (str): Unique field ordering the rows of a group
+            defaults (dict, optional): Field values to write
+            lookup: Values of the unique_together fields
+        """
+        row = model(**lookup, **(defaults or {}))
+        key = tuple(_field_values(row, _unique_fields(model)).values())
+        self._replace_by.setdefault(model, {})[key] = replace_by
+        self.add(model, defaults=defaults, **lookup)
+
+    @contextmanager
+    def atomic(self):
+        """Add the rows of the block only if it exits without an exception."""
+        if self._in_atomic:
+            raise RuntimeError("SummaryWriter.atomic() blocks cannot be nested")
+
+        outer = self._buffers, self._update_fields, self._replace_by
+        self._buffers, self._update_fields, self._replace_by = {}, {}, {}
+        self._in_atomic = True
+        try:
+            yield self
+        except BaseException:
+            self._buffers, self._update_fields, self._replace_by = outer
+            raise
+        finally:
+            self._in_atomic = False
+
+        staged = self._buffers, self._update_fields, self._replace_by
+        self._buffers, self._update_fields, self._replace_by = outer
+        for model, rows in staged[0].items():
+            self._buffers.setdefault(model, {}).update(rows)
+            self._update_fields.setdefault(model, set()).update(staged[1][model])
+            self._replace_by.setdefault(model, {}).update(staged[2].get(model, {}))
+            if len(self._buffers[model]) >= self.batch_size:
+                self.flush(model)
+
+    def flush(self, model=None):
+        """Write the buffered rows of one model (or of all models)."""
+        models = [model] if model is not None else list(self._buffers)
+        for model in models:
+            buffer = self._buffers.pop(model, {})
+            rows = list(buffer.values())
+            update_fields = self._update_fields.pop(model, set())
+            if not rows:
+                continue
+
+            replace_by = self._replace_by.pop(model, {})
+            replaced = [
+                (row, replace_by[key])
+                for key, row in buffer.items()
+                if key in replace_by
+            ]
+
+            update_fields |= {
+                field.name
+                for field in model._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            }
+            model.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=_unique_fields(model),
+                update_fields=sorted(update_fields),
+            )
+
+            if replaced:
+                _delete_replaced_rows(model, replaced)
+
+
+@contextmanager
+def summary_writer(writer: Optional[SummaryWriter] = None):
+    """
+    Yield the given writer, or a new one that is flushed on exit.
+
+    Lets per-user summary functions share the shard-wide writer of
+    summary.tasks.runner while still writing directly when called alone.
+    """
+    if writer is not None:
+        yield writer
+        return
+
+    with SummaryWriter() as writer:
+        yield writer
+
+
+def _delete_replaced_rows(model, replaced):
+    """Delete the rows of the same groups with an older value of replace_by."""
+    stale = Q()
+    for row, replace_by in replaced:
+        group_fields = [f for f in _unique_fields(model) if f != replace_by]
+        attname = row._meta.get_field(replace_by).attname
+        stale |= Q(**_field_values(row, group_fields)) & Q(
+            **{f"{attname}__lt": getattr(row, attname)}
+        )
+    model.objects.filter(stale).delete()
+
+
+def _field_values(row, fields) -> Dict:
+    attnames = [row._meta.get_field(field).attname for field in fields]
+    return {attname: getattr(row, attname) for attname in attnames}
+
+
+def _unique_fields(model) -> List[str]:
+    unique_together = model._meta.unique_together
+    if not unique_together:
+        raise ValueError(f"{model.__name__} has no unique_together constraint")
+    return list(unique_together[0])
@@ -0,0 +1,228 @@
+"""
+Per-user window bundle.
+
+Loads every series a summary run needs for one user (CGM, bolus, meals,
+sleep and daily summaries) once, as sorted NumPy arrays over the widest
+window of the run. Shorter periods are computed by slicing the bundle
+instead of re-querying.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime, time
+from datetime import timezone as dt_timezone
+from typing import Dict
+
+import numpy as np
+
+from diafit_backend.features.array_fetch import epoch_seconds, fetch_arrays
+from diafit_backend.models.sleep_entity import SleepSessionEntity, SleepType
+from summary.features.statistics import calculate_cgm_stats_from_sums
+from summary.models import DailySummary
+from summary.services.rollup import SUM_FIELDS
+
+# DailySummary columns loaded into WindowBundle.daily_metrics (in this order)
+DAILY_METRICS = [
+    "glucose_avg",
+    "glucose_std",
+    "time_in_range",
+    "time_below_range",
+    "time_above_range",
+    "daily_cgm_coverage",
+    "daily_total_bolus",
+    "daily_total_meals",
+    "daily_total_carbs",
+    "daily_total_proteins",
+    "daily_total_fats",
+    "daily_total_calories",
+]
+
+
+@dataclass
+class WindowBundle:
+    """Sorted epoch-second arrays for one user and one time window."""
+
+    start: int
+    end: int
+
+    # CGM (sorted by timestamp)
+    cgm_ts: np.ndarray
+    cgm_values: np.ndarray
+
+    # Bolus (sorted by timestamp_utc)
+    bolus_ts: np.ndarray
+    bolus_values: np.ndarray
+
+    # Meals (sorted by meal_time_utc)
+    meal_ts: np.ndarray
+    meal_carbs: np.ndarray
+    meal_proteins: np.ndarray
+    meal_fats: np.ndarray
+    meal_calories: np.ndarray
+
+    # Sleep sessions of type SLEEP (sorted by end_time)
+    sleep_start: np.ndarray
+    sleep_end: np.ndarray
+    sleep_total: np.ndarray
+    sleep_deep: np.ndarray
+    sleep_rem: np.ndarray
+
+    # Daily summaries (sorted by date, stored as UTC midnight epoch)
+    daily_ts: np.ndarray
+    daily_metrics: np.ndarray  # shape (n_days, len(DAILY_METRICS))
+    daily_sums: np.ndarray  # shape (n_days, len(SUM_FIELDS))
+
+    def daily_averages(self) -> dict:
+        """
+        Average each DAILY_METRICS column over the days in the bundle.
+
+        Like summary.services.rollup, the glucose statistics come from the
+        summed glucose state when every day carries it, so the standard
+        deviation is exact instead of an average of daily values. The sums
+        and the number of days are included.
+        """
+        if len(self.daily_ts) == 0:
+            return {}
+        averages = dict(zip(DAILY_METRICS, self.daily_metrics.mean(axis=0).tolist()))
+        sums = {
+            field: int(total) if field.endswith("_count") else total
+            for field, total in zip(SUM_FIELDS, self.daily_sums.sum(axis=0).tolist())
+        }
+        if (self.daily_sums[:, SUM_FIELDS.index("glucose_count")] > 0).all():
+            averages.update(
+                calculate_cgm_stats_from_sums(
+                    sums["glucose_count"],
+                    sums["glucose_sum"],
+                    sums["glucose_sumsq"],
+                    sums["glucose_below_count"],
+                    sums["glucose_in_range_count"],
+                    sums["glucose_above_count"],
+                )
+            )
+        return {**averages, **sums, "day_count": len(self.daily_ts)}
+
+    def slice(self, start: datetime, end: datetime) -> "WindowBundle":
+        """
+        Return a view of the bundle restricted to [start, end] (inclusive).
+
+        Sleep sessions are selected by their end time, like the summary tasks.
+        """
+        start_ts = epoch_seconds(start)
+        end_ts = epoch_seconds(end)
+
+        sliced = {"start": start_ts, "end": end_ts}
+        for prefix, key in (
+            ("cgm_", self.cgm_ts),
+            ("bolus_", self.bolus_ts),
+            ("meal_", self.meal_ts),
+            ("sleep_", self.sleep_end),
+            ("daily_", self.daily_ts),
+        ):
+            lo = np.searchsorted(key, start_ts, side="left")
+            hi = np.searchsorted(key, end_ts, side="right")
+            for field in fields(self):
+                if field.name.startswith(prefix):
+                    sliced[field.name] = getattr(self, field.name)[lo:hi]
+
+        return WindowBundle(**sliced)
+
+
+def fetch_entity_arrays(user, start: datetime, end: datetime) -> Dict[str, np.ndarray]:
+    """
+    Fetch the CGM, bolus and meal rows of a user in [start, end] (inclusive).
+
+    Returns:
+        Sorted arrays keyed by their WindowBundle field names
+    """
+    cgm_ts, cgm_values = fetch_arrays(
+        user.cgmentity_set.filter(timestamp__range=(start, end)).order_by("timestamp"),
+        "timestamp",
+        "value_mgdl",
+    )
+    bolus_ts, bolus_values = fetch_arrays(
+        user.bolusentity_set.filter(timestamp_utc__range=(start, end)).order_by(
+            "timestamp_utc"
+        ),
+        "timestamp_utc",
+        "value",
+    )
+    meal_ts, meal_carbs, meal_proteins, meal_fats, meal_calories = fetch_arrays(
+        user.mealentity_set.filter(meal_time_utc__range=(start, end)).order_by(
+            "meal_time_utc"
+        ),
+        "meal_time_utc",
+        "carbohydrates",
+        "proteins",
+        "fats",
+        "calories",
+    )
+    return {
+        "cgm_ts": cgm_ts,
+        "cgm_values": cgm_values.astype(np.float64),
+        "bolus_ts": bolus_ts,
+        "bolus_values": bolus_values,
+        "meal_ts": meal_ts,
+        "meal_carbs": meal_carbs,
+        "meal_proteins": meal_proteins,
+        "meal_fats": meal_fats,
+        "meal_calories": meal_calories,
+    }
+
+
+def load_window_bundle(user, start: datetime, end: datetime) -> WindowBundle:
+    """
+    Fetch all raw data for a user in [start, end] with one query per entity.
+
+    Raw entity rows are streamed straight into NumPy arrays (see fetch_arrays).
+
+    Args:
+        user: User instance
+        start: Start of window (inclusive)
+        end: End of window (inclusive)
+
+    Returns:
+        WindowBundle with sorted arrays for CGM, bolus, meals and sleep
+    """
+    sleep_start, sleep_end, sleep_total, sleep_deep, sleep_rem = fetch_arrays(
+        SleepSessionEntity.objects.filter(
+            user=user,
+            type=SleepType.SLEEP,
+            end_time__range=(start, end),
+        ).order_by("end_time"),
+        "start_time",
+        "end_time",
+        "total_duration_minutes",
+        "deep_sleep_minutes",
+        "rem_sleep_minutes",
+    )
+
+    daily_rows = list(
+        DailySummary.objects.filter(user=user, date__range=(start.date(), end.date()))
+        .order_by("date")
+        .values_list("date", *DAILY_METRICS, *SUM_FIELDS)
+    )
+
+    return WindowBundle(
+        start=epoch_seconds(start),
+        end=epoch_seconds(end),
+        **fetch_entity_arrays(user, start, end),
+        sleep_start=sleep_start,
+        sleep_end=sleep_end,
+        sleep_total=sleep_total,
+        sleep_deep=sleep_deep,
+        sleep_rem=sleep_rem,
+        daily_ts=np.array(
+            [
+                epoch_seconds(
+                    datetime.combine(row[0], time.min, tzinfo=dt_timezone.utc)
+                )
+                for row in daily_rows
+            ],
+            dtype=np.int64,
+        ),
+        daily_metrics=np.array(
+            [row[1 : len(DAILY_METRICS) + 1] for row in daily_rows], dtype=np.float64
+        ).reshape(len(daily_rows), len(DAILY_METRICS)),
+        daily_sums=np.array(
+            [row[len(DAILY_METRICS) + 1 :] for row in daily_rows], dtype=np.float64
+        ).reshape(len(daily_rows), len(SUM_FIELDS)),
+    )
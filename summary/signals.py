@@ -1,11 +1,59 @@
 # summary/signals.py
-from datetime import timedelta
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django_q.models import Schedule
 
+from accounts.models.usersettings import UserSettings
+from charts.charts.agp.agp_chart_payload import (
+    build_agp_chart_payload,
+    is_agp_chart_payload_current,
+)
+from summary.models import RollingSummary
+from summary.tasks.nightly_summaries import (
+    NIGHTLY_FUNC,
+    NIGHTLY_WINDOW_MINUTES,
+    get_next_shard_run,
+    get_schedule_shards,
+)
+from summary.tasks.prune_run_stats import PRUNE_RUN_STATS_FUNC
+from summary.tasks.queues import get_queue
+
+# Debounce interval for recomputing summaries after ingestion
+DIRTY_RECOMPUTE_INTERVAL_MINUTES = 5
+
+# Scheduled on their own before the nightly shards chained them
+CHAINED_FUNCS = [
+    "summary.tasks.create_daily_summary.create_daily_summary",
+    "summary.tasks.create_weekly_summary.create_weekly_summary",
+    "summary.tasks.create_monthly_summary.create_monthly_summary",
+    "summary.tasks.create_quarterly_summary.create_quarterly_summary",
+    "summary.tasks.create_rolling_summary.create_rolling_summary",
+]
+
+
+@receiver(post_save, sender=UserSettings)
+def rebuild_agp_chart_payloads(sender, instance, **kwargs):
+    """
+    Rebuild the stored AGP chart payloads built for other glucose targets.
+
+    The views only read them (see get_agp_chart_payload).
+    """
+    target_range = instance.target_range
+    summaries = [
+        summary
+        for summary in RollingSummary.objects.filter(
+            user_id=instance.user_id, agp__isnull=False
+        ).only("id", "agp", "agp_chart")
+        if not is_agp_chart_payload_current(summary.agp_chart, target_range)
+    ]
+    for summary in summaries:
+        summary.agp_chart = build_agp_chart_payload(summary.agp, target_range)
+    RollingSummary.objects.bulk_update(summaries, ["agp_chart"])
+
 
 @receiver(post_migrate)
 def create_summary_schedules(sender, **kwargs):
@@ -14,133 +62,91 @@ def create_summary_schedules(sender, **kwargs):
     """
     now = timezone.now()
 
-    # Daily summary - runs daily at midnight
-    daily_func = "summary.tasks.create_daily_summary.create_daily_summary"
-    if not Schedule.objects.filter(func=daily_func).exists():
-        next_midnight = now.replace(
-            hour=0, minute=0, second=0, microsecond=0
-        ) + timedelta(days=1)
-        Schedule.objects.create(
-            func=daily_func,
-            schedule_type=Schedule.DAILY,
-            repeats=-1,
-            next_run=next_midnight,
-        )
-        print(f"✅ Created daily summary schedule (next run: {next_midnight})")
-    else:
-        print("ℹ️ Daily summary schedule already exists.")
-
-    # Weekly summary - runs every Monday at 1 AM
-    weekly_func = "summary.tasks.create_weekly_summary.create_weekly_summary"
-    if not Schedule.objects.filter(func=weekly_func).exists():
-        # Calculate next Monday at 1 AM
-        days_until_monday = (7 - now.weekday()) % 7
-        if days_until_monday == 0 and now.hour >= 1:  # If it's Monday and after 1 AM
-            days_until_monday = 7
-        next_monday = (now + timedelta(days=days_until_monday)).replace(
-            hour=1, minute=0, second=0, microsecond=0
-        )
+    # Nightly summaries - one daily schedule per user shard, staggered over
+    # the first hour after midnight (see summary/tasks/nightly_summaries.py)
+    shards = get_schedule_shards()
+    shard_args = {f"({shard}, {shards})": shard for shard in range(shards)}
+    nightly = Schedule.objects.filter(func=NIGHTLY_FUNC)
 
-        Schedule.objects.create(
-            func=weekly_func,
-            schedule_type=Schedule.WEEKLY,
-            repeats=-1,
-            next_run=next_monday,
-        )
-        print(f"✅ Created weekly summary schedule (next run: {next_monday})")
-    else:
-        print("ℹ️ Weekly summary schedule already exists.")
-
-    # Monthly summary - runs on the 1st of each month at 2 AM
-    monthly_func = "summary.tasks.create_monthly_summary.create_monthly_summary"
-    if not Schedule.objects.filter(func=monthly_func).exists():
-        # Calculate next 1st of month at 2 AM
-        if now.day == 1 and now.hour < 2:
-            next_first = now.replace(hour=2, minute=0, second=0, microsecond=0)
-        else:
-            if now.month == 12:
-                next_first = now.replace(
-                    year=now.year + 1,
-                    month=1,
-                    day=1,
-                    hour=2,
-                    minute=0,
-                    second=0,
-                    microsecond=0,
-                )
-            else:
-                next_first = now.replace(
-                    month=now.month + 1,
-                    day=1,
-                    hour=2,
-                    minute=0,
-                    second=0,
-                    microsecond=0,
-                )
+    # The shards replace the separate daily, weekly, monthly, quarterly and
+    # rolling schedules (the rolling refresh, once hourly and then daily at
+    # 00:30, is enqueued by each shard after its daily summaries; fresh data
+    # during the day is picked up by the dirty summary recompute below).
+    # They are removed once, when the shards are first created, so chained
+    # schedules an operator adds back later are kept.
+    if not nightly.exists():
+        deleted, _ = Schedule.objects.filter(func__in=CHAINED_FUNCS).delete()
+        if deleted:
+            print(f"✅ Replaced {deleted} summary schedules by the nightly shards.")
 
-        Schedule.objects.create(
-            func=monthly_func,
-            schedule_type=Schedule.MONTHLY,
-            repeats=-1,
-            next_run=next_first,
-        )
-        print(f"✅ Created monthly summary schedule (next run: {next_first})")
-    else:
-        print("ℹ️ Monthly summary schedule already exists.")
-
-    # Quarterly summary - runs on the 1st of Jan, Apr, Jul, Oct at 3 AM
-    quarterly_func = "summary.tasks.create_quarterly_summary.create_quarterly_summary"
-    if not Schedule.objects.filter(func=quarterly_func).exists():
-        # Calculate next quarter start at 3 AM
-        quarter_months = [1, 4, 7, 10]
-        next_quarter_month = None
-
-        for month in quarter_months:
-            if now.month <= month:
-                if now.month == month and now.day == 1 and now.hour < 3:
-                    next_quarter_month = month
-                    break
-                elif now.month < month:
-                    next_quarter_month = month
-                    break
-
-        if next_quarter_month is None:  # Next quarter is in next year
-            next_quarter_month = 1
-            next_quarter_year = now.year + 1
-        else:
-            next_quarter_year = now.year
-
-        next_quarter = now.replace(
-            year=next_quarter_year,
-            month=next_quarter_month,
-            day=1,
-            hour=3,
-            minute=0,
-            second=0,
-            microsecond=0,
-        )
+    deleted, _ = nightly.exclude(args__in=shard_args).delete()
+    if deleted:
+        print(f"✅ Removed {deleted} nightly schedules of another shard count.")
 
-        Schedule.objects.create(
-            func=quarterly_func,
-            schedule_type=Schedule.QUARTERLY,
-            repeats=-1,
-            next_run=next_quarter,
+    created = 0
+    for args, shard in shard_args.items():
+        next_run = get_next_shard_run(shard, shards, now)
+        _, is_new = Schedule.objects.get_or_create(
+            name=f"Nightly summaries {shard + 1}/{shards}",
+            defaults={
+                "func": NIGHTLY_FUNC,
+                "args": args,
+                "schedule_type": Schedule.DAILY,
+                "repeats": -1,
+                "next_run": next_run,
+                "cluster": get_queue(NIGHTLY_FUNC),
+            },
         )
-        print(f"✅ Created quarterly summary schedule (next run: {next_quarter})")
-    else:
-        print("ℹ️ Quarterly summary schedule already exists.")
+        if is_new:
+            created += 1
+            print(
+                f"✅ Created nightly summary schedule {shard + 1}/{shards} (next run: {next_run})"
+            )
+    if not created:
+        print("ℹ️ Nightly summary schedules already exist.")
 
-    # Rolling summary - runs every hour
-    rolling_func = "summary.tasks.create_rolling_summary.create_rolling_summary"
-    if not Schedule.objects.filter(func=rolling_func).exists():
-        next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    # Dirty summary recompute - runs every 5 minutes, a no-op without new data
+    dirty_func = "summary.tasks.recompute_dirty_summaries.recompute_dirty_summaries"
+    if not Schedule.objects.filter(func=dirty_func).exists():
+        next_run = now + timedelta(minutes=DIRTY_RECOMPUTE_INTERVAL_MINUTES)
 
         Schedule.objects.create(
-            func=rolling_func,
-            schedule_type=Schedule.HOURLY,
+            func=dirty_func,
+            schedule_type=Schedule.MINUTES,
+            minutes=DIRTY_RECOMPUTE_INTERVAL_MINUTES,
             repeats=-1,
-            next_run=next_hour,
+            next_run=next_run,
         )
-        print(f"✅ Created rolling summary schedule (next run: {next_hour})")
+        print(f"✅ Created dirty summary recompute schedule (next run: {next_run})")
     else:
-        print("ℹ️ Rolling summary schedule already exists.")
+        print("ℹ️ Dirty summary recompute schedule already exists.")
+
+    # Run stats pruning - daily, after the nightly shards have started
+    midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=dt_timezone.utc)
+    next_run = midnight + timedelta(minutes=NIGHTLY_WINDOW_MINUTES)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    _, is_new = Schedule.objects.get_or_create(
+        name="Prune summary run stats",
+        defaults={
+            "func": PRUNE_RUN_STATS_FUNC,
+            "schedule_type": Schedule.DAILY,
+            "repeats": -1,
+            "next_run": next_run,
+            "cluster": get_queue(PRUNE_RUN_STATS_FUNC),
+        },
+    )
+    if is_new:
+        print(f"✅ Created run stats pruning schedule (next run: {next_run})")
+    else:
+        print("ℹ️ Run stats pruning schedule already exists.")
+
+    # Every schedule runs on the cluster of its task's queue
+    for func in (NIGHTLY_FUNC, dirty_func, PRUNE_RUN_STATS_FUNC):
+        queue = get_queue(func)
+        if (
+            Schedule.objects.filter(func=func)
+            .exclude(cluster=queue)
+            .update(cluster=queue)
+        ):
+            print(f"✅ Moved {func} schedule to the {queue} queue.")
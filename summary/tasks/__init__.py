@@ -5,6 +5,8 @@ from .create_monthly_summary import create_monthly_summary
 from .create_quarterly_summary import create_quarterly_summary
 from .create_rolling_summary import create_rolling_summary
 from .create_weekly_summary import create_weekly_summary
+from .nightly_summaries import run_nightly_summaries
+from .recompute_dirty_summaries import recompute_dirty_summaries
 
 __all__ = [
     "create_daily_summary",
@@ -12,4 +14,6 @@ __all__ = [
     "create_monthly_summary",
     "create_quarterly_summary",
     "create_rolling_summary",
+    "recompute_dirty_summaries",
+    "run_nightly_summaries",
 ]
@@ -0,0 +1,471 @@
+# summary/tasks/backfill_summaries.py
+
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from diafit_backend.features.array_fetch import epoch_seconds, fetch_arrays
+from diafit_backend.features.timezones import get_user_timezone
+from diafit_backend.models.sleep_entity import SleepSessionEntity, SleepType
+from summary.features.agp import (
+    TIME_PERIODS,
+    build_hourly_histogram,
+    calculate_agp_from_cgm_histogram,
+    calculate_agp_summary,
+    detect_agp_patterns,
+)
+from summary.features.statistics import (
+    calculate_cgm_coverage_from_array,
+    calculate_cgm_stats_from_sums,
+    calculate_sleep_stats_from_arrays,
+)
+from summary.models import DailySummary, MonthlySummary, QuarterlySummary, WeeklySummary
+from summary.services.rollup import rollup_summaries
+from summary.services.run_stats import log_sampled, phase
+from summary.services.summary_writer import summary_writer
+from summary.services.window_bundle import fetch_entity_arrays
+from summary.tasks.runner import run_for_users
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+DEFAULT_CHUNK_SIZE = 100
+
+# Days of raw CGM, bolus and meal rows held in memory per user at a time
+FETCH_DAYS = 31
+
+# DailySummary fields written by the backfill
+DAILY_FIELDS = [
+    "glucose_avg",
+    "glucose_std",
+    "time_in_range",
+    "time_below_range",
+    "time_above_range",
+    "daily_cgm_coverage",
+    "daily_total_bolus",
+    "daily_total_meals",
+    "daily_total_carbs",
+    "daily_total_proteins",
+    "daily_total_fats",
+    "daily_total_calories",
+    "glucose_count",
+    "glucose_sum",
+    "glucose_sumsq",
+    "glucose_below_count",
+    "glucose_in_range_count",
+    "glucose_above_count",
+    "agp_histogram",
+]
+
+
+def backfill_summaries(
+    start_date: date,
+    end_date: date,
+    checkpoint_path: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict:
+    """
+    Backfill daily, weekly, monthly and quarterly summaries for a date range.
+
+    Instead of re-running the daily task once per day, every user's raw data
+    is fetched once, in blocks of days, and all summaries are computed from
+    it in a single pass (see backfill_summaries_for_user). Users are
+    processed in chunks of parallel shards (see SUMMARY_CONCURRENCY); after
+    each chunk the completed user ids are written to the checkpoint file, so
+    an interrupted backfill resumes with the remaining users.
+
+    Args:
+        start_date (date): First day to backfill
+        end_date (date): Last day to backfill (clipped to today)
+        checkpoint_path (str, optional): JSON file recording completed users
+        chunk_size (int): Number of users between two checkpoints
+
+    Returns:
+        Dict with the number of users, succeeded users and failures per user id
+    """
+    now = timezone.now()
+    end_date = min(end_date, now.date())
+
+    completed = _load_checkpoint(checkpoint_path, start_date, end_date)
+
+    User = get_user_model()
+    user_ids = [
+        user_id
+        for user_id in User.objects.order_by("id").values_list("id", flat=True)
+        if user_id not in completed
+    ]
+
+    print(
+        f"📊 Backfilling summaries from {start_date} to {end_date} for {len(user_ids)} users"
+        + (f" ({len(completed)} already completed)" if completed else "")
+    )
+
+    result = {"users": 0, "succeeded": 0, "failed": {}}
+    started = time.monotonic()
+    for chunk in _chunks(user_ids, chunk_size):
+        chunk_result = run_for_users(
+            "summary.tasks.backfill_summaries.backfill_summaries_for_user",
+            start_date,
+            end_date,
+            now,
+            user_ids=chunk,
+            # The checkpoint needs the outcome of every user
+            wait=True,
+        )
+        result["users"] += chunk_result["users"]
+        result["succeeded"] += chunk_result["succeeded"]
+        result["failed"].update(chunk_result["failed"])
+
+        completed.update(
+            user_id for user_id in chunk if user_id not in chunk_result["failed"]
+        )
+        _save_checkpoint(checkpoint_path, start_date, end_date, completed)
+
+        elapsed = time.monotonic() - started
+        remaining = elapsed / result["users"] * (len(user_ids) - result["users"])
+        print(
+            f"⏳ {result['users']}/{len(user_ids)} users "
+            f"({len(result['failed'])} failed), "
+            f"elapsed {elapsed:.0f}s, remaining ~{remaining:.0f}s"
+        )
+
+    print("🏁 Backfill completed.")
+    return result
+
+
+def backfill_summaries_for_user(
+    user, start_date: date, end_date: date, now: datetime, writer=None
+):
+    """
+    Backfill all summaries of a single user for [start_date, end_date].
+
+    CGM, bolus and meal rows are fetched in blocks of FETCH_DAYS days, split
+    into UTC days with searchsorted and reduced with cumulative sums, so
+    only one block of raw rows is held in memory. Each daily window includes
+    the following midnight, like create_daily_summary. Weekly, monthly and
+    quarterly summaries are rolled up from the in-memory daily rows; only
+    periods lying completely inside the range are written. Sleep sessions
+    of the whole range are fetched once, by start time like the period tasks.
+
+    Args:
+        user: User instance
+        start_date (date): First day to backfill
+        end_date (date): Last day to backfill
+        now (datetime): Current time, used to clip the last day
+        writer (SummaryWriter, optional): Shared bulk writer of the shard
+    """
+    user_timezone = get_user_timezone(user)
+
+    daily_summaries = []
+    block_start = start_date
+    while block_start <= end_date:
+        block_end = min(block_start + timedelta(days=FETCH_DAYS - 1), end_date)
+        with phase("fetch"):
+            series = fetch_entity_arrays(
+                user,
+                _datetime(block_start),
+                min(_datetime(block_end + timedelta(days=1)), now),
+            )
+        with phase("stats"):
+            daily_summaries += _build_daily_summaries(
+                user, series, block_start, block_end, now, user_timezone
+            )
+        block_start = block_end + timedelta(days=1)
+    if not daily_summaries:
+        return
+
+    with phase("fetch"):
+        sleep_arrays = fetch_arrays(
+            SleepSessionEntity.objects.filter(
+                user=user,
+                type=SleepType.SLEEP,
+                start_time__range=(
+                    _datetime(start_date),
+                    datetime.combine(
+                        end_date, datetime.max.time(), tzinfo=dt_timezone.utc
+                    ),
+                ),
+            ).order_by("start_time"),
+            "start_time",
+            "end_time",
+            "total_duration_minutes",
+            "deep_sleep_minutes",
+            "rem_sleep_minutes",
+        )
+    sleep_start = sleep_arrays[0]
+
+    with summary_writer(writer) as writer:
+        with phase("write"):
+            for summary in daily_summaries:
+                writer.add(
+                    DailySummary,
+                    user=user,
+                    date=summary.date,
+                    defaults={field: getattr(summary, field) for field in DAILY_FIELDS},
+                )
+
+        periods = 0
+        for model, lookup, period_start, period_end in _complete_periods(
+            start_date, end_date
+        ):
+            summaries = [
+                s for s in daily_summaries if period_start <= s.date <= period_end
+            ]
+            with phase("stats"):
+                rolled_up = rollup_summaries(summaries)
+            if rolled_up is None:
+                continue
+
+            with phase("stats"):
+                # Sleep sessions are selected by their start time, like the period tasks
+                lo, hi = np.searchsorted(
+                    sleep_start,
+                    [
+                        _epoch(period_start),
+                        _epoch(period_end + timedelta(days=1)),
+                    ],
+                    side="left",
+                )
+                sleep_stats = calculate_sleep_stats_from_arrays(
+                    *(array[lo:hi] for array in sleep_arrays), user_timezone
+                )
+            with phase("agp"):
+                agp_data = calculate_agp_from_cgm_histogram(rolled_up["agp_histogram"])
+            with phase("patterns"):
+                agp_summary_data = (
+                    calculate_agp_summary(agp_data, TIME_PERIODS) if agp_data else None
+                )
+                agp_patterns = detect_agp_patterns(agp_data) if agp_data else None
+
+            daily_sleep_duration = (
+                sleep_stats["daily_sleep_duration"] if sleep_stats else None
+            )
+            daily_deep_sleep_duration = (
+                sleep_stats["daily_deep_sleep_duration"] if sleep_stats else None
+            )
+            daily_rem_sleep_duration = (
+                sleep_stats["daily_rem_sleep_duration"] if sleep_stats else None
+            )
+            avg_fall_asleep_time = (
+                sleep_stats["avg_fall_asleep_time"] if sleep_stats else None
+            )
+            avg_wake_up_time = sleep_stats["avg_wake_up_time"] if sleep_stats else None
+
+            with phase("write"):
+                writer.add(
+                    model,
+                    user=user,
+                    **lookup,
+                    defaults={
+                        **rolled_up,
+                        "agp": agp_data,
+                        "agp_summary": agp_summary_data,
+                        "agp_trends": agp_patterns,
+                        "daily_sleep_duration": daily_sleep_duration,
+                        "daily_deep_sleep_duration": daily_deep_sleep_duration,
+                        "daily_rem_sleep_duration": daily_rem_sleep_duration,
+                        "avg_fall_asleep_time": avg_fall_asleep_time,
+                        "avg_wake_up_time": avg_wake_up_time,
+                    },
+                )
+            periods += 1
+
+    log_sampled(
+        logger,
+        "Backfilled %s daily and %s weekly/monthly/quarterly summaries for %s.",
+        len(daily_summaries),
+        periods,
+        user.username,
+    )
+
+
+def _build_daily_summaries(
+    user,
+    series: Dict[str, np.ndarray],
+    start_date: date,
+    end_date: date,
+    now: datetime,
+    user_timezone: str,
+) -> List[DailySummary]:
+    """
+    Compute unsaved DailySummary rows for every day with CGM data.
+
+    series holds the arrays of fetch_entity_arrays over the days.
+    """
+    n_days = (end_date - start_date).days + 1
+    day_starts = _epoch(start_date) + DAY_SECONDS * np.arange(n_days, dtype=np.int64)
+    day_ends = np.minimum(day_starts + DAY_SECONDS, epoch_seconds(now))
+
+    def windows(ts):
+        return (
+            np.searchsorted(ts, day_starts, side="left"),
+            np.searchsorted(ts, day_ends, side="right"),
+        )
+
+    def window_sums(values, lo, hi):
+        cumsum = np.concatenate(([0], np.cumsum(values)))
+        return cumsum[hi] - cumsum[lo]
+
+    values = series["cgm_values"]
+    cgm_lo, cgm_hi = windows(series["cgm_ts"])
+    glucose_count = cgm_hi - cgm_lo
+    glucose_sum = window_sums(values, cgm_lo, cgm_hi)
+    glucose_sumsq = window_sums(values * values, cgm_lo, cgm_hi)
+    below_count = window_sums(values < 70, cgm_lo, cgm_hi)
+    in_range_count = window_sums((values >= 70) & (values <= 180), cgm_lo, cgm_hi)
+    above_count = window_sums(values > 180, cgm_lo, cgm_hi)
+
+    bolus_lo, bolus_hi = windows(series["bolus_ts"])
+    total_bolus = window_sums(series["bolus_values"], bolus_lo, bolus_hi)
+
+    meal_lo, meal_hi = windows(series["meal_ts"])
+    total_meals = meal_hi - meal_lo
+    total_carbs = window_sums(series["meal_carbs"], meal_lo, meal_hi)
+    total_proteins = window_sums(series["meal_proteins"], meal_lo, meal_hi)
+    total_fats = window_sums(series["meal_fats"], meal_lo, meal_hi)
+    total_calories = window_sums(series["meal_calories"], meal_lo, meal_hi)
+
+    summaries = []
+    for i in np.flatnonzero(glucose_count > 0):
+        day_ts = series["cgm_ts"][cgm_lo[i] : cgm_hi[i]]
+        day_values = values[cgm_lo[i] : cgm_hi[i]]
+
+        cgm_stats = calculate_cgm_stats_from_sums(
+            int(glucose_count[i]),
+            float(glucose_sum[i]),
+            float(glucose_sumsq[i]),
+            int(below_count[i]),
+            int(in_range_count[i]),
+            int(above_count[i]),
+        )
+        cgm_coverage = calculate_cgm_coverage_from_array(
+            day_ts, int(day_starts[i]), int(day_ends[i])
+        )
+
+        summaries.append(
+            DailySummary(
+                user=user,
+                date=start_date + timedelta(days=int(i)),
+                **cgm_stats,
+                daily_cgm_coverage=round(cgm_coverage),
+                daily_total_bolus=float(total_bolus[i]),
+                daily_total_meals=int(total_meals[i]),
+                daily_total_carbs=int(total_carbs[i]),
+                daily_total_proteins=int(total_proteins[i]),
+                daily_total_fats=int(total_fats[i]),
+                daily_total_calories=int(total_calories[i]),
+                glucose_count=int(glucose_count[i]),
+                glucose_sum=float(glucose_sum[i]),
+                glucose_sumsq=float(glucose_sumsq[i]),
+                glucose_below_count=int(below_count[i]),
+                glucose_in_range_count=int(in_range_count[i]),
+                glucose_above_count=int(above_count[i]),
+                agp_histogram=build_hourly_histogram(day_ts, day_values, user_timezone),
+            )
+        )
+
+    return summaries
+
+
+def _complete_periods(
+    start_date: date, end_date: date
+) -> Iterator[Tuple[type, Dict, date, date]]:
+    """
+    Yield (model, lookup, first day, last day) of every ISO week, month and
+    quarter lying completely inside [start_date, end_date].
+    """
+    week_start = start_date + timedelta(days=(7 - start_date.weekday()) % 7)
+    while week_start + timedelta(days=6) <= end_date:
+        year, week, _ = week_start.isocalendar()
+        yield (
+            WeeklySummary,
+            {"year": year, "week": week},
+            week_start,
+            week_start + timedelta(days=6),
+        )
+        week_start += timedelta(days=7)
+
+    for model, months, key in (
+        (MonthlySummary, 1, "month"),
+        (QuarterlySummary, 3, "quarter"),
+    ):
+        # Months since year 0 of the first period starting on or after start_date
+        index = start_date.year * 12 + start_date.month - 1
+        if start_date.day > 1:
+            index += 1
+        index += -index % months
+        while True:
+            period_start = date(index // 12, index % 12 + 1, 1)
+            next_index = index + months
+            period_end = date(next_index // 12, next_index % 12 + 1, 1) - timedelta(
+                days=1
+            )
+            if period_end > end_date:
+                break
+            yield (
+                model,
+                {"year": period_start.year, key: (index % 12) // months + 1},
+                period_start,
+                period_end,
+            )
+            index = next_index
+
+
+def _datetime(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+
+
+def _epoch(day: date) -> int:
+    return epoch_seconds(_datetime(day))
+
+
+def _chunks(items: List[int], size: int) -> Iterator[List[int]]:
+    for i in range(0, len(items), max(1, size)):
+        yield items[i : i + size]
+
+
+def _load_checkpoint(path: Optional[str], start_date: date, end_date: date) -> set:
+    """Return the user ids completed by an earlier run of the same range."""
+    if not path or not os.path.exists(path):
+        return set()
+
+    with open(path) as f:
+        checkpoint = json.load(f)
+
+    if (
+        checkpoint.get("start") != start_date.isoformat()
+        or checkpoint.get("end") != end_date.isoformat()
+    ):
+        logger.warning(
+            f"Ignoring checkpoint {path} for {checkpoint.get('start')} to {checkpoint.get('end')}"
+        )
+        return set()
+
+    return set(checkpoint.get("completed_user_ids", []))
+
+
+def _save_checkpoint(
+    path: Optional[str], start_date: date, end_date: date, completed: set
+):
+    if not path:
+        return
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "start": start_date.isoformat(),
+                "end": end_date.isoformat(),
+                "completed_user_ids": sorted(completed),
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
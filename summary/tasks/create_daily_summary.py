@@ -1,19 +1,29 @@
 # summary/tasks/create_daily_summary.py
 
+import logging
 from datetime import date, datetime, timedelta
 from datetime import timezone as dt_timezone
-from typing import Optional
+from typing import List, Optional
 
-from django.contrib.auth import get_user_model
+import numpy as np
 from django.utils import timezone
 
+from diafit_backend.features.array_fetch import epoch_seconds, fetch_arrays
+from diafit_backend.features.timezones import get_user_timezone
+from summary.features.agp import build_hourly_histogram
 from summary.features.statistics import (
     calculate_bolus_stats,
-    calculate_cgm_coverage,
-    calculate_cgm_stats,
+    calculate_cgm_coverage_from_array,
+    calculate_cgm_stats_from_values,
+    calculate_cgm_sums,
     calculate_meal_stats,
 )
 from summary.models import DailySummary
+from summary.services.run_stats import log_sampled, phase
+from summary.services.summary_writer import summary_writer
+from summary.tasks.runner import run_for_users
+
+logger = logging.getLogger(__name__)
 
 
 def create_daily_summary(
@@ -21,6 +31,9 @@ def create_daily_summary(
     start: Optional[datetime] = None,
     end: Optional[datetime] = None,
     mode: str = "auto",  # "auto" | "manual" | "partial"
+    user_ids: Optional[List[int]] = None,
+    concurrency: Optional[int] = None,
+    wait: bool = False,
 ):
     """
     Create daily summary for all users within a given time window.
@@ -30,15 +43,18 @@ def create_daily_summary(
         start (datetime, optional): start of window (inclusive)
         end (datetime, optional): end of window (exclusive)
         mode (str): optional label for debugging/logging ("auto", "manual", "partial")
+        user_ids (List[int], optional): Restrict the run to these users (defaults to all)
+        concurrency (int, optional): Number of shards (defaults to SUMMARY_CONCURRENCY)
+        wait (bool): Process every user before returning, never enqueue shards
 
     Behavior:
         - If no start/end → defaults to yesterday's full day (00:00–00:00 next day)
         - If only end is provided → assumes start is that day's midnight
         - If end > now → clipped to current time
         - Safe for partial summaries (e.g., up to 16:20 today)
+        - Users are processed in parallel shards (see SUMMARY_CONCURRENCY)
     """
 
-    User = get_user_model()
     now = timezone.now()
 
     # Determine date and window
@@ -57,19 +73,58 @@ def create_daily_summary(
 
     print(f"📆 Generating summary for {summary_date} ({start} → {end}) [{mode}]")
 
-    for user in User.objects.all():
-        # --- CGM stats ---
-        cgm_qs = user.cgmentity_set.filter(timestamp__range=(start, end)).order_by(
-            "timestamp"
-        )
-        if not cgm_qs.exists():
-            continue
+    run_for_users(
+        "summary.tasks.create_daily_summary.create_daily_summary_for_user",
+        start,
+        end,
+        summary_date,
+        user_ids=user_ids,
+        concurrency=concurrency,
+        wait=wait,
+    )
+    print("🏁 Daily summary task completed.")
 
-        cgm_stats = calculate_cgm_stats(cgm_qs)
-        if not cgm_stats:
-            continue
 
-        cgm_coverage = calculate_cgm_coverage(cgm_qs, start, end)
+def create_daily_summary_for_user(
+    user, start: datetime, end: datetime, summary_date: date, writer=None
+):
+    """
+    Create the daily summary of a single user for the window [start, end].
+
+    Args:
+        user: User instance
+        start (datetime): start of window (inclusive)
+        end (datetime): end of window, already clipped to now
+        summary_date (date): date the summary is stored under
+        writer (SummaryWriter, optional): Shared bulk writer of the shard
+
+    Returns:
+        bool: Whether a summary was written (False without CGM data)
+    """
+    # --- CGM stats ---
+    with phase("fetch"):
+        cgm_timestamps, cgm_values = fetch_arrays(
+            user.cgmentity_set.filter(timestamp__range=(start, end)).order_by(
+                "timestamp"
+            ),
+            "timestamp",
+            "value_mgdl",
+        )
+    if len(cgm_timestamps) == 0:
+        return False
+    cgm_values = cgm_values.astype(np.float64)
+
+    with phase("stats"):
+        cgm_stats = calculate_cgm_stats_from_values(cgm_values)
+        cgm_coverage = calculate_cgm_coverage_from_array(
+            cgm_timestamps, epoch_seconds(start), epoch_seconds(end)
+        )
+
+        # --- Mergeable state for weekly/monthly/quarterly rollups ---
+        cgm_sums = calculate_cgm_sums(cgm_values)
+        agp_histogram = build_hourly_histogram(
+            cgm_timestamps, cgm_values, get_user_timezone(user)
+        )
 
         # --- Bolus stats ---
         bolus_qs = user.bolusentity_set.filter(timestamp_utc__range=(start, end))
@@ -79,7 +134,9 @@ def create_daily_summary(
         meal_qs = user.mealentity_set.filter(meal_time_utc__range=(start, end))
         meal_stats = calculate_meal_stats(meal_qs, period_days=1)
 
-        DailySummary.objects.update_or_create(
+    with phase("write"), summary_writer(writer) as writer:
+        writer.add(
+            DailySummary,
             user=user,
             date=summary_date,
             defaults={
@@ -95,8 +152,12 @@ def create_daily_summary(
                 "daily_total_proteins": meal_stats["total_proteins"],
                 "daily_total_fats": meal_stats["total_fats"],
                 "daily_total_calories": meal_stats["total_calories"],
+                **cgm_sums,
+                "agp_histogram": agp_histogram,
             },
         )
 
-        print(f"✅ Summary for {user.username} ({summary_date}) created/updated.")
-    print("🏁 Daily summary task completed.")
+    log_sampled(
+        logger, "Summary for %s (%s) created/updated.", user.username, summary_date
+    )
+    return True
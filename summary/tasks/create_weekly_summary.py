@@ -1,37 +1,50 @@
 # summary/tasks/create_weekly_summary.py
 
+import logging
 from datetime import date, datetime, timedelta
 from datetime import timezone as dt_timezone
-from typing import Optional
+from typing import List, Optional
 
-from django.contrib.auth import get_user_model
-from django.db.models import Avg
 from django.utils import timezone
 
+from diafit_backend.features.timezones import get_user_timezone
 from diafit_backend.models.sleep_entity import SleepSessionEntity, SleepType
 from summary.features.agp import (
     TIME_PERIODS,
     calculate_agp_from_cgm,
+    calculate_agp_from_cgm_histogram,
     calculate_agp_summary,
     detect_agp_patterns,
 )
 from summary.features.statistics import calculate_sleep_stats
 from summary.models import DailySummary, WeeklySummary
+from summary.services.rollup import rollup_summaries
+from summary.services.run_stats import log_sampled, phase
+from summary.services.summary_writer import summary_writer
+from summary.tasks.runner import run_for_users
+
+logger = logging.getLogger(__name__)
 
 
 def create_weekly_summary(
     target_year: Optional[int] = None,
     target_week: Optional[int] = None,
+    user_ids: Optional[List[int]] = None,
+    concurrency: Optional[int] = None,
+    wait: bool = False,
 ):
     """
-    Create weekly summary for all users by aggregating daily summaries.
+    Create weekly summary for all users by rolling up daily summaries.
+    Users are processed in parallel shards (see SUMMARY_CONCURRENCY).
 
     Args:
         target_year (int, optional): Year to summarize (defaults to last week)
         target_week (int, optional): Week number to summarize (defaults to last week)
+        user_ids (List[int], optional): Restrict the run to these users (defaults to all)
+        concurrency (int, optional): Number of shards (defaults to SUMMARY_CONCURRENCY)
+        wait (bool): Process every user before returning, never enqueue shards
     """
 
-    User = get_user_model()
     now = timezone.now()
 
     # Determine target week
@@ -49,31 +62,42 @@ def create_weekly_summary(
         f"📅 Generating weekly summary for {target_year}-W{target_week:02d} ({week_start} to {week_end})"
     )
 
-    for user in User.objects.all():
-        # Get daily summaries for this week
-        daily_summaries = DailySummary.objects.filter(
-            user=user, date__range=(week_start, week_end)
-        )
+    run_for_users(
+        "summary.tasks.create_weekly_summary.create_weekly_summary_for_user",
+        target_year,
+        target_week,
+        week_start,
+        week_end,
+        user_ids=user_ids,
+        concurrency=concurrency,
+        wait=wait,
+    )
+    print("🏁 Weekly summary task completed.")
+
+
+def create_weekly_summary_for_user(
+    user, target_year, target_week, week_start, week_end, writer=None
+):
+    """
+    Create the weekly summary of a single user.
 
-        if not daily_summaries.exists():
-            continue
-
-        # Aggregate the daily summaries
-        aggregated = daily_summaries.aggregate(
-            glucose_avg=Avg("glucose_avg"),
-            glucose_std=Avg("glucose_std"),
-            time_in_range=Avg("time_in_range"),
-            time_below_range=Avg("time_below_range"),
-            time_above_range=Avg("time_above_range"),
-            daily_cgm_coverage=Avg("daily_cgm_coverage"),
-            daily_total_bolus=Avg("daily_total_bolus"),  # Average per day
-            daily_total_meals=Avg("daily_total_meals"),  # Average per day
-            daily_total_carbs=Avg("daily_total_carbs"),  # Average per day
-            daily_total_proteins=Avg("daily_total_proteins"),  # Average per day
-            daily_total_fats=Avg("daily_total_fats"),  # Average per day
-            daily_total_calories=Avg("daily_total_calories"),  # Average per day
+    Args:
+        user: User instance
+        target_year (int): ISO year
+        target_week (int): ISO week number
+        week_start (date): First day of the week
+        week_end (date): Last day of the week
+        writer (SummaryWriter, optional): Shared bulk writer of the shard
+    """
+    with phase("fetch"):
+        # Roll up the daily summaries of this week
+        rolled_up = rollup_summaries(
+            DailySummary.objects.filter(user=user, date__range=(week_start, week_end))
         )
+    if rolled_up is None:
+        return
 
+    with phase("stats"):
         # Calculate sleep metrics from sleep sessions for the week
         start_datetime = datetime.combine(
             week_start, datetime.min.time(), tzinfo=dt_timezone.utc
@@ -88,11 +112,7 @@ def create_weekly_summary(
             start_time__range=(start_datetime, end_datetime),
         )
 
-        user_timezone = (
-            user.timezone
-            if hasattr(user, "timezone") and user.timezone
-            else "Europe/Berlin"
-        )
+        user_timezone = get_user_timezone(user)
         sleep_stats = calculate_sleep_stats(sleep_sessions, user_timezone)
 
         daily_sleep_duration = (
@@ -109,33 +129,31 @@ def create_weekly_summary(
         )
         avg_wake_up_time = sleep_stats["avg_wake_up_time"] if sleep_stats else None
 
-        # Calculate AGP from CGM data for the week
-        cgm_data = user.cgmentity_set.filter(
-            timestamp__range=(start_datetime, end_datetime)
-        )
-        agp_data = calculate_agp_from_cgm(cgm_data)
+    with phase("agp"):
+        # Calculate AGP from the merged hourly histograms, falling back to raw CGM
+        # data if a summary was stored before histograms existed
+        if rolled_up["agp_histogram"] is not None:
+            agp_data = calculate_agp_from_cgm_histogram(rolled_up["agp_histogram"])
+        else:
+            cgm_data = user.cgmentity_set.filter(
+                timestamp__range=(start_datetime, end_datetime)
+            )
+            agp_data = calculate_agp_from_cgm(cgm_data, user_timezone=user_timezone)
+
+    with phase("patterns"):
         agp_summary_data = (
             calculate_agp_summary(agp_data, TIME_PERIODS) if agp_data else None
         )
         agp_patterns = detect_agp_patterns(agp_data) if agp_data else None
 
-        WeeklySummary.objects.update_or_create(
+    with phase("write"), summary_writer(writer) as writer:
+        writer.add(
+            WeeklySummary,
             user=user,
             year=target_year,
             week=target_week,
             defaults={
-                "glucose_avg": round(aggregated["glucose_avg"] or 0),
-                "glucose_std": round(aggregated["glucose_std"] or 0),
-                "time_in_range": round(aggregated["time_in_range"] or 0),
-                "time_below_range": round(aggregated["time_below_range"] or 0),
-                "time_above_range": round(aggregated["time_above_range"] or 0),
-                "daily_cgm_coverage": round(aggregated["daily_cgm_coverage"] or 0),
-                "daily_total_bolus": aggregated["daily_total_bolus"] or 0,
-                "daily_total_meals": aggregated["daily_total_meals"] or 0,
-                "daily_total_carbs": aggregated["daily_total_carbs"] or 0,
-                "daily_total_proteins": aggregated["daily_total_proteins"] or 0,
-                "daily_total_fats": aggregated["daily_total_fats"] or 0,
-                "daily_total_calories": aggregated["daily_total_calories"] or 0,
+                **rolled_up,
                 "agp": agp_data,
                 "agp_summary": agp_summary_data,
                 "agp_trends": agp_patterns,
@@ -147,8 +165,10 @@ def create_weekly_summary(
             },
         )
 
-        print(
-            f"✅ Weekly summary for {user.username} ({target_year}-W{target_week:02d}) created/updated."
-        )
-
-    print("🏁 Weekly summary task completed.")
+    log_sampled(
+        logger,
+        "Weekly summary for %s (%s-W%02d) created/updated.",
+        user.username,
+        target_year,
+        target_week,
+    )
@@ -0,0 +1,131 @@
+# summary/tasks/nightly_summaries.py
+
+"""
+Nightly summaries per user shard.
+
+Users are split into SUMMARY_SCHEDULE_SHARDS shards by id, and every shard
+has a daily schedule of its own (see summary/signals.py). The shards start
+at deterministic, jittered offsets spread over NIGHTLY_WINDOW_MINUTES after
+midnight UTC, so they do not all hit the database at the top of the hour.
+
+A run chains the summaries that depend on each other instead of relying on
+wall-clock offsets: the daily summaries of the shard come first, then the
+rolling summaries are enqueued on the rolling queue and the calendar
+rollups that are due run in order (weekly on Mondays, monthly on the 1st,
+quarterly after monthly on the 1st of a quarter).
+"""
+
+import hashlib
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from summary.tasks.create_daily_summary import create_daily_summary
+from summary.tasks.create_monthly_summary import create_monthly_summary
+from summary.tasks.create_quarterly_summary import create_quarterly_summary
+from summary.tasks.create_weekly_summary import create_weekly_summary
+from summary.tasks.queues import ROLLING
+
+NIGHTLY_FUNC = "summary.tasks.nightly_summaries.run_nightly_summaries"
+ROLLING_FUNC = "summary.tasks.create_rolling_summary.create_rolling_summary"
+
+# The shards start within this window after midnight (UTC)
+NIGHTLY_WINDOW_MINUTES = 60
+
+QUARTER_START_MONTHS = (1, 4, 7, 10)
+
+
+def run_nightly_summaries(shard: int, shards: int, today: Optional[date] = None):
+    """
+    Create the nightly summaries for the users of one shard.
+
+    The summaries run inline, one after the other, because each reads the
+    rows written by the previous one (weekly and monthly roll up the daily
+    summaries, quarterly the monthly ones). They wait for every user, so a
+    shard larger than SUMMARY_CHUNK_SIZE is not enqueued in chunks that
+    would still be running when the next step starts.
+
+    Args:
+        shard (int): Index of the shard (0 <= shard < shards)
+        shards (int): Number of shards the users are split into
+        today (date, optional): Day of the run (defaults to today)
+    """
+    today = today or timezone.now().date()
+    user_ids = get_shard_user_ids(shard, shards)
+    if not user_ids:
+        return
+
+    print(f"🌙 Nightly summaries of shard {shard + 1}/{shards} ({len(user_ids)} users)")
+
+    create_daily_summary(user_ids=user_ids, concurrency=1, wait=True)
+
+    # Rolling windows end today and read the daily summaries written above
+    async_task(
+        ROLLING_FUNC,
+        user_ids=user_ids,
+        q_options={"cluster": ROLLING, "group": f"rolling-{today}"},
+    )
+
+    if today.weekday() == 0:
+        create_weekly_summary(user_ids=user_ids, concurrency=1, wait=True)
+    if today.day == 1:
+        create_monthly_summary(user_ids=user_ids, concurrency=1, wait=True)
+        if today.month in QUARTER_START_MONTHS:
+            create_quarterly_summary(user_ids=user_ids, concurrency=1, wait=True)
+
+    print(f"🏁 Nightly summaries of shard {shard + 1}/{shards} completed.")
+
+
+def get_schedule_shards() -> int:
+    return max(1, getattr(settings, "SUMMARY_SCHEDULE_SHARDS", 1))
+
+
+def get_shard_user_ids(shard: int, shards: int) -> List[int]:
+    """Ids of the users in a shard, users are assigned by id modulo shards."""
+    User = get_user_model()
+    return list(
+        User.objects.annotate(shard=F("id") % shards)
+        .filter(shard=shard)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def get_shard_offset(shard: int, shards: int) -> timedelta:
+    """
+    Start of a shard after midnight.
+
+    The window is split into one slot per shard and the shard starts at a
+    jittered point of its slot. The jitter is derived from the shard, so
+    the schedules get the same times on every migrate.
+    """
+    slot_seconds = max(1, NIGHTLY_WINDOW_MINUTES * 60 // shards)
+    return timedelta(
+        seconds=shard * slot_seconds
+        + get_jitter_seconds(f"{NIGHTLY_FUNC}:{shard}/{shards}", slot_seconds)
+    )
+
+
+def get_jitter_seconds(key: str, window_seconds: int) -> int:
+    """
+    Deterministic jitter in [0, window_seconds) for a key.
+
+    Uses sha256 instead of hash(), which is salted per process.
+    """
+    digest = hashlib.sha256(key.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % max(1, window_seconds)
+
+
+def get_next_shard_run(shard: int, shards: int, now: datetime) -> datetime:
+    """Next start of a shard after now."""
+    midnight = datetime.combine(now.date(), datetime.min.time(), tzinfo=dt_timezone.utc)
+    next_run = midnight + get_shard_offset(shard, shards)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return next_run
@@ -0,0 +1,38 @@
+# summary/tasks/prune_run_stats.py
+
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from summary.models import SummaryRunStats
+
+PRUNE_RUN_STATS_FUNC = "summary.tasks.prune_run_stats.prune_run_stats"
+
+DEFAULT_RETENTION_DAYS = 30
+
+
+def prune_run_stats(days: Optional[int] = None) -> int:
+    """
+    Delete the summary run stats older than the retention.
+
+    Scheduled daily (see summary/signals.py), every summary task shard
+    stores a row, so the table would otherwise grow without bound.
+
+    Args:
+        days (int, optional): Days kept (defaults to
+            SUMMARY_RUN_STATS_RETENTION_DAYS)
+
+    Returns:
+        int: Number of deleted rows
+    """
+    if days is None:
+        days = getattr(
+            settings, "SUMMARY_RUN_STATS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS
+        )
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = SummaryRunStats.objects.filter(started_at__lt=cutoff).delete()
+    if deleted:
+        print(f"🗑️ Deleted {deleted} summary run stats older than {days} days")
+    return deleted
@@ -0,0 +1,32 @@
+# summary/tasks/queues.py
+
+"""
+Task queues of the summary tasks.
+
+Every queue is a django-q cluster of its own (Q_CLUSTER and its ALT_CLUSTERS
+in core/settings.py), so a long backfill never holds up the rolling updates
+and neither delays the recompute after ingestion.
+"""
+
+# The default cluster
+REALTIME = "realtime"
+ROLLING = "rolling"
+BATCH = "batch"
+
+# Queue per task module, the coordinator and its per-user function share one
+TASK_QUEUES = {
+    "summary.tasks.recompute_dirty_summaries": REALTIME,
+    "summary.tasks.create_rolling_summary": ROLLING,
+    "summary.tasks.create_daily_summary": BATCH,
+    "summary.tasks.create_weekly_summary": BATCH,
+    "summary.tasks.create_monthly_summary": BATCH,
+    "summary.tasks.create_quarterly_summary": BATCH,
+    "summary.tasks.backfill_summaries": BATCH,
+    "summary.tasks.nightly_summaries": BATCH,
+    "summary.tasks.prune_run_stats": BATCH,
+}
+
+
+def get_queue(func_path: str) -> str:
+    """Queue of a task given by its dotted path, batch if not listed."""
+    return TASK_QUEUES.get(func_path.rsplit(".", 1)[0], BATCH)
@@ -0,0 +1,116 @@
+# summary/tasks/recompute_dirty_summaries.py
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import List
+
+from django.utils import timezone
+
+from summary.models import DailySummary, DirtySummaryDay, RollingSummary
+from summary.services.run_stats import phase
+from summary.services.summary_writer import summary_writer
+from summary.tasks.create_daily_summary import create_daily_summary_for_user
+from summary.tasks.create_rolling_summary import (
+    DEFAULT_ROLLING_PERIODS,
+    create_rolling_summary_for_user,
+)
+from summary.tasks.runner import run_for_users
+
+
+def recompute_dirty_summaries():
+    """
+    Recompute summaries for the days marked dirty by the ingestion endpoints.
+
+    Scheduled every few minutes, so all uploads within that interval are
+    coalesced into one recompute. Users without new data cost a single query.
+    """
+    cutoff = timezone.now()
+
+    user_ids = list(
+        DirtySummaryDay.objects.filter(marked_at__lte=cutoff)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    if not user_ids:
+        return
+
+    print(f"🔄 Recomputing dirty summaries for {len(user_ids)} users")
+
+    run_for_users(
+        "summary.tasks.recompute_dirty_summaries.recompute_dirty_summaries_for_user",
+        cutoff,
+        user_ids=user_ids,
+    )
+    print("🏁 Dirty summary recompute completed.")
+
+
+def recompute_dirty_summaries_for_user(user, cutoff: datetime, writer=None):
+    """
+    Recompute the daily summaries of a user's dirty days and the rolling
+    windows that contain them, including stored windows of earlier days.
+
+    Args:
+        user: User instance
+        cutoff (datetime): Only days marked dirty up to this time are processed
+        writer (SummaryWriter, optional): Shared bulk writer of the shard
+    """
+    dirty_days = DirtySummaryDay.objects.filter(user=user, marked_at__lte=cutoff)
+    with phase("fetch"):
+        days = sorted(set(dirty_days.values_list("date", flat=True)))
+    today = cutoff.date()
+    # Days after today (clock skew of a device) are recomputed once they begin
+    days = [day for day in days if day <= today]
+
+    empty_days = []
+    with summary_writer(writer) as writer:
+        for day in days:
+            start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+            end = min(start + timedelta(days=1), cutoff)
+            if not create_daily_summary_for_user(user, start, end, day, writer=writer):
+                empty_days.append(day)
+
+        # The data of these days was deleted, drop their stale summaries
+        if empty_days:
+            with phase("write"):
+                DailySummary.objects.filter(user=user, date__in=empty_days).delete()
+
+        # Rolling windows containing a dirty day: the ones ending today, and
+        # the stored ones of other periods that end earlier (the newest
+        # window of a period replaces the older ones, see create_rolling_summary)
+        windows = defaultdict(list)
+        for period_days in DEFAULT_ROLLING_PERIODS:
+            if _contains_any(today, period_days, days):
+                windows[today].append(period_days)
+        with phase("fetch"):
+            stored = RollingSummary.objects.filter(
+                user=user, end_date__lt=today
+            ).values_list("period_days", "end_date")
+            for period_days, end_date in stored:
+                if period_days not in windows.get(today, []) and _contains_any(
+                    end_date, period_days, days
+                ):
+                    windows[end_date].append(period_days)
+
+        if windows:
+            # Longer rolling periods read the daily summaries written above
+            with phase("write"):
+                writer.flush(DailySummary)
+        for end_date, period_days_list in sorted(windows.items()):
+            create_rolling_summary_for_user(
+                user, sorted(period_days_list), end_date, cutoff, writer=writer
+            )
+
+        # Clear the markers only once the summaries are written, a shared
+        # writer of the shard would otherwise flush after the delete. Days
+        # marked again after the cutoff stay dirty for the next run.
+        with phase("write"):
+            writer.flush()
+            dirty_days.filter(date__lte=today).delete()
+
+
+def _contains_any(end_date: date, period_days: int, days: List[date]) -> bool:
+    """Whether the rolling window of period_days ending on end_date has a day."""
+    start_date = end_date - timedelta(days=period_days - 1)
+    return any(start_date <= day <= end_date for day in days)
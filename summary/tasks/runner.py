@@ -0,0 +1,207 @@
+# summary/tasks/runner.py
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import import_module
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_q.tasks import async_task
+
+from summary.services.run_stats import RunStats, is_run_stats_enabled, phase
+from summary.services.summary_writer import SummaryWriter
+from summary.tasks.queues import get_queue
+
+logger = logging.getLogger(__name__)
+
+SHARD_FUNC = "summary.tasks.runner.run_user_shard"
+SHARD_HOOK = "summary.tasks.runner.report_shard"
+
+# Imported lazily by the per-user functions (AGP), loaded once before the
+# pool forks so the shards do not each pay for the import
+WARM_MODULES = ("pandas", "scipy.interpolate")
+
+
+def run_for_users(
+    func_path: str,
+    *args,
+    concurrency: Optional[int] = None,
+    user_ids: Optional[List[int]] = None,
+    wait: bool = False,
+    **kwargs,
+) -> Dict:
+    """
+    Run a per-user summary function for every user, split into shards.
+
+    The coordinator splits the user ids into `concurrency` shards and runs
+    them in parallel:
+        - inside a django-q worker (a daemonic process that may not fork)
+          every shard is enqueued as its own task on the queue of the task
+          (see summary/tasks/queues.py) and failures are reported by the
+          `report_shard` hook. Shards hold at most SUMMARY_CHUNK_SIZE users,
+          so each finishes within the queue timeout; a shard that is retried
+          after a timeout or crash upserts the same rows again.
+        - everywhere else (management commands, shell) the shards run in a
+          forked ProcessPoolExecutor and the results are collected here.
+          Where fork is not available, the users are processed inline.
+
+    With a concurrency of 1 all users are processed inline. With `wait`
+    nothing is enqueued, so callers that depend on the written rows or on
+    the per-user result can run inside a worker too: the users are then
+    processed inline, since the worker may not fork.
+
+    Args:
+        func_path (str): Dotted path of a function taking (user, *args, writer, **kwargs)
+        concurrency (int, optional): Number of shards (defaults to SUMMARY_CONCURRENCY)
+        user_ids (List[int], optional): Restrict the run to these users (defaults to all)
+        wait (bool): Never enqueue, return once every user is processed
+
+    Returns:
+        Dict with the number of users, succeeded users and failures per user id
+        (or the django-q group name when the shards were enqueued)
+    """
+    if concurrency is None:
+        concurrency = getattr(settings, "SUMMARY_CONCURRENCY", 1)
+
+    if user_ids is None:
+        User = get_user_model()
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    enqueue = _in_cluster() and not wait
+    n_shards = max(1, concurrency)
+    if enqueue:
+        chunk_size = getattr(settings, "SUMMARY_CHUNK_SIZE", 250)
+        n_shards = max(n_shards, -(-len(user_ids) // chunk_size))
+    shards = [user_ids[i::n_shards] for i in range(n_shards)]
+    shards = [shard for shard in shards if shard]
+
+    if len(shards) <= 1 or (not enqueue and not _can_fork()):
+        return _report(func_path, run_user_shard(func_path, user_ids, *args, **kwargs))
+
+    if enqueue:
+        queue = get_queue(func_path)
+        group = f"{func_path.rsplit('.', 1)[-1]}-{timezone.now():%Y%m%dT%H%M%S}"
+        for shard in shards:
+            async_task(
+                SHARD_FUNC,
+                func_path,
+                shard,
+                *args,
+                q_options={"group": group, "hook": SHARD_HOOK, "cluster": queue},
+                **kwargs,
+            )
+        logger.info(
+            f"Enqueued {len(shards)} shards for {len(user_ids)} users "
+            f"on {queue} (group {group})"
+        )
+        return {"group": group, "shards": len(shards), "users": len(user_ids)}
+
+    for module in WARM_MODULES:
+        import_module(module)
+    # Child processes must open their own database connections
+    connections.close_all()
+
+    result = {"users": 0, "succeeded": 0, "failed": {}}
+    with ProcessPoolExecutor(
+        max_workers=len(shards), mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        futures = {
+            executor.submit(run_user_shard, func_path, shard, *args, **kwargs): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            try:
+                shard_result = future.result()
+            except Exception as e:
+                shard_result = {
+                    "users": len(futures[future]),
+                    "succeeded": 0,
+                    "failed": {user_id: repr(e) for user_id in futures[future]},
+                }
+            result["users"] += shard_result["users"]
+            result["succeeded"] += shard_result["succeeded"]
+            result["failed"].update(shard_result["failed"])
+
+    return _report(func_path, result)
+
+
+def run_user_shard(func_path: str, user_ids: List[int], *args, **kwargs) -> Dict:
+    """
+    Run a per-user summary function for a shard of users.
+
+    A failing user is logged and recorded, the remaining users still run.
+    Users are loaded with their settings (timezone, glucose targets).
+    All users of the shard share one SummaryWriter, so their summary rows
+    are written in bulk upserts; the rows of a failing user are discarded
+    (SummaryWriter.atomic). The wall time and queries of every user
+    and phase are stored as SummaryRunStats (see SUMMARY_RUN_STATS).
+
+    Returns:
+        Dict with the number of users, succeeded users and failures per user id
+    """
+    func = import_string(func_path)
+    User = get_user_model()
+    stats = RunStats(func_path)
+
+    result = {"users": len(user_ids), "succeeded": 0, "failed": {}}
+    with stats.record():
+        writer = SummaryWriter()
+        for user in (
+            User.objects.filter(id__in=user_ids)
+            .select_related("settings")
+            .order_by("id")
+        ):
+            try:
+                with stats.user(user.id), writer.atomic():
+                    func(user, *args, writer=writer, **kwargs)
+                result["succeeded"] += 1
+            except Exception as e:
+                logger.exception(f"{func_path} failed for user {user.id}")
+                result["failed"][user.id] = repr(e)
+
+        # Write the rows still buffered
+        with phase("write"):
+            writer.flush()
+
+    if is_run_stats_enabled():
+        stats.save()
+    return result
+
+
+def _in_cluster() -> bool:
+    """
+    Whether shards are enqueued: inside a django-q worker, which is a daemonic
+    process that may not fork, and with the local broker of the tests.
+    """
+    return (
+        multiprocessing.current_process().daemon
+        or getattr(settings, "Q_BROKER", "orm") == "local"
+    )
+
+
+def _can_fork() -> bool:
+    """Whether the shards can run in a forked process pool."""
+    return (
+        not multiprocessing.current_process().daemon
+        and "fork" in multiprocessing.get_all_start_methods()
+    )
+
+
+def report_shard(task):
+    """django-q hook: report the outcome of an enqueued shard."""
+    func_path, user_ids = task.args[0], task.args[1]
+    if not task.success:
+        logger.error(f"❌ {func_path} shard failed for users {user_ids}: {task.result}")
+        return
+    _report(func_path, task.result)
+
+
+def _report(func_path: str, result: Dict) -> Dict:
+    for user_id, error in result["failed"].items():
+        logger.error(f"❌ {func_path} failed for user {user_id}: {error}")
+    logger.info(f"{func_path}: {result['succeeded']}/{result['users']} users succeeded")
+    return result
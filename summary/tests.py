@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import Future
+from dataclasses import fields
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from statistics import median
+from unittest import mock
 
-# Create your tests here.
+import django_q.conf
+import numpy as np
+import pytz
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django_q.models import Schedule, Task
+from django_q.tasks import async_task
+
+from benchmarks.generator import generate_bench_data
+from charts.charts.agp.agp_chart_payload import build_agp_chart_payload
+from core.brokers import LocalBroker
+from diafit_backend.features.array_fetch import epoch_seconds, fetch_arrays
+from diafit_backend.features.timezones import (
+    get_user_timezone,
+    local_hours,
+    utc_offsets,
+)
+from diafit_backend.models.cgm_entity import CgmEntity
+from summary.features.agp import (
+    build_hourly_histogram,
+    calculate_stats_from_arrays,
+    calculate_stats_from_histogram,
+    merge_hourly_histograms,
+)
+from summary.features.statistics import (
+    calculate_cgm_coverage,
+    calculate_cgm_coverage_by_user,
+    calculate_cgm_coverage_from_array,
+    calculate_cgm_stats_from_values,
+)
+from summary.models import (
+    DailySummary,
+    DirtySummaryDay,
+    MonthlySummary,
+    QuarterlySummary,
+    RollingSummary,
+    SummaryRunStats,
+    WeeklySummary,
+)
+from summary.services import get_agp_chart_payload
+from summary.services.dirty_tracking import mark_summary_days_dirty
+from summary.services.rollup import rollup_summaries
+from summary.services.run_stats import RunStats, log_sampled, phase
+from summary.services.summary_writer import SummaryWriter
+from summary.services.window_bundle import load_window_bundle
+from summary.signals import CHAINED_FUNCS, create_summary_schedules
+from summary.tasks import backfill_summaries as backfill_module
+from summary.tasks import runner
+from summary.tasks.backfill_summaries import _complete_periods, backfill_summaries
+from summary.tasks.create_daily_summary import (
+    create_daily_summary,
+    create_daily_summary_for_user,
+)
+from summary.tasks.create_monthly_summary import create_monthly_summary_for_user
+from summary.tasks.create_quarterly_summary import create_quarterly_summary_for_user
+from summary.tasks.create_rolling_summary import (
+    create_rolling_summary,
+    create_rolling_summary_for_user,
+)
+from summary.tasks.create_weekly_summary import create_weekly_summary_for_user
+from summary.tasks.nightly_summaries import (
+    NIGHTLY_FUNC,
+    NIGHTLY_WINDOW_MINUTES,
+    get_jitter_seconds,
+    get_next_shard_run,
+    get_shard_offset,
+)
+from summary.tasks.prune_run_stats import PRUNE_RUN_STATS_FUNC, prune_run_stats
+from summary.tasks.queues import BATCH, REALTIME, ROLLING, get_queue
+from summary.tasks.recompute_dirty_summaries import (
+    recompute_dirty_summaries,
+    recompute_dirty_summaries_for_user,
+)
+
+# Fixed end of the generated data, so every run writes the same rows
+NOW = datetime(2025, 6, 18, 9, 30, tzinfo=dt_timezone.utc)
+
+
+def utc_day(day: date):
+    """Start and end of a day as the daily summary task windows it."""
+    start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def create_daily_summaries(user, days):
+    for day in days:
+        create_daily_summary_for_user(user, *utc_day(day), day)
+
+
+def reference_coverage(timestamps, start, end, expected=None, fallback=300.0):
+    """The per-reading coverage loop the array version replaced."""
+    if not timestamps:
+        return 0.0
+    timestamps = sorted(timestamps)
+    total_seconds = end - start
+    if total_seconds <= 0:
+        return 0.0
+
+    deltas = [b - a for a, b in zip(timestamps, timestamps[1:]) if b - a > 0]
+    if expected is None:
+        expected = float(median(deltas)) if deltas else fallback
+    half_expected = max(float(expected), 1.0) / 2.0
+
+    covered = 0.0
+    for i, ts in enumerate(timestamps):
+        if i == 0:
+            left = min(ts - start, half_expected)
+        else:
+            left = min((ts - timestamps[i - 1]) / 2.0, half_expected)
+        if i == len(timestamps) - 1:
+            right = min(end - ts, half_expected)
+        else:
+            right = min((timestamps[i + 1] - ts) / 2.0, half_expected)
+        covered += max(0.0, left) + max(0.0, right)
+
+    return round(min(covered, total_seconds) / total_seconds * 100.0)
+
+
+class CgmCoverageTest(SimpleTestCase):
+    """The vectorized coverage matches the per-reading calculation."""
+
+    start = 1_750_000_000
+    end = start + 86400
+
+    def make_cases(self):
+        rng = np.random.default_rng(0)
+        regular = self.start + 300 * np.arange(288)
+        # Sensor gaps, jittered readings and duplicates
+        irregular = np.sort(
+            np.concatenate(
+                (
+                    self.start + 300 * np.arange(100) + rng.integers(-20, 20, 100),
+                    self.start + 50000 + 60 * np.arange(200),
+                    [self.start + 50000] * 3,
+                )
+            )
+        )
+        return {
+            "empty": np.array([], dtype=np.int64),
+            "single": np.array([self.start + 3600]),
+            "regular": regular,
+            "irregular": irregular,
+            # Readings outside the window do not count as negative coverage
+            "overhang": np.array([self.start - 600, self.start + 600]),
+        }
+
+    def test_matches_reference(self):
+        for name, timestamps in self.make_cases().items():
+            for expected in (None, 300.0):
+                with self.subTest(name=name, expected=expected):
+                    self.assertEqual(
+                        calculate_cgm_coverage_from_array(
+                            timestamps.astype(np.int64),
+                            self.start,
+                            self.end,
+                            expected_interval_seconds=expected,
+                        ),
+                        reference_coverage(
+                            timestamps.tolist(), self.start, self.end, expected
+                        ),
+                    )
+
+    def test_empty_window(self):
+        timestamps = np.array([self.start], dtype=np.int64)
+        self.assertEqual(
+            calculate_cgm_coverage_from_array(timestamps, self.start, self.start), 0
+        )
+
+    def test_by_user(self):
+        cases = [case for case in self.make_cases().values() if len(case)]
+        user_ids = np.concatenate(
+            [np.full(len(case), uid) for uid, case in enumerate(cases, start=1)]
+        ).astype(np.int64)
+        timestamps = np.concatenate(cases).astype(np.int64)
+
+        coverage = calculate_cgm_coverage_by_user(
+            user_ids, timestamps, self.start, self.end
+        )
+        self.assertEqual(
+            coverage,
+            {
+                uid: reference_coverage(case.tolist(), self.start, self.end)
+                for uid, case in enumerate(cases, start=1)
+            },
+        )
+
+
+class CgmCoverageQuerysetTest(TestCase):
+    def test_queryset_wrapper(self):
+        (user,), _ = generate_bench_data(1, 2, now=NOW)
+        # Bounds with fractions of a second are rounded down like the readings
+        start = NOW - timedelta(days=1, microseconds=700000)
+        end = NOW - timedelta(microseconds=300000)
+        queryset = CgmEntity.objects.filter(user=user, timestamp__range=(start, end))
+        (timestamps,) = fetch_arrays(queryset.order_by("timestamp"), "timestamp")
+
+        self.assertEqual(
+            calculate_cgm_coverage(queryset, start, end),
+            reference_coverage(
+                timestamps.tolist(), epoch_seconds(start), epoch_seconds(end)
+            ),
+        )
+        self.assertEqual(epoch_seconds(start), NOW.timestamp() - 86401)
+        self.assertEqual(epoch_seconds(end), NOW.timestamp() - 1)
+
+
+class RollingSummaryStatsTest(TestCase):
+    """Rolling periods over 3 days derive glucose statistics from the sums."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 10, now=NOW)
+        self.end_date = NOW.date() - timedelta(days=1)
+        self.days = [self.end_date - timedelta(days=i) for i in range(6, -1, -1)]
+        create_daily_summaries(self.user, self.days)
+
+    def test_matches_rollup(self):
+        create_rolling_summary_for_user(self.user, [7], self.end_date, NOW)
+
+        rolling = RollingSummary.objects.get(user=self.user, period_days=7)
+        expected = rollup_summaries(
+            DailySummary.objects.filter(user=self.user, date__in=self.days)
+        )
+        for field in (
+            "glucose_avg",
+            "glucose_std",
+            "time_in_range",
+            "time_below_range",
+            "time_above_range",
+            "glucose_count",
+            "glucose_in_range_count",
+            "day_count",
+        ):
+            with self.subTest(field=field):
+                self.assertEqual(getattr(rolling, field), expected[field])
+        self.assertAlmostEqual(rolling.glucose_sumsq, expected["glucose_sumsq"])
+
+    def test_std_of_raw_readings(self):
+        start, _ = utc_day(self.days[0])
+        _, end = utc_day(self.end_date)
+        bundle = load_window_bundle(self.user, start, end)
+
+        averages = bundle.daily_averages()
+        self.assertEqual(averages["day_count"], 7)
+        # Readings on midnight fall into both days, the std stays within rounding
+        self.assertLessEqual(
+            abs(averages["glucose_std"] - np.std(bundle.cgm_values)), 1
+        )
+
+    def test_slice_matches_load(self):
+        start, _ = utc_day(self.days[0])
+        end = datetime.combine(
+            self.end_date, datetime.max.time(), tzinfo=dt_timezone.utc
+        )
+        bundle = load_window_bundle(self.user, start, end)
+
+        for days in (1, 3, 7):
+            window_start, _ = utc_day(self.end_date - timedelta(days=days - 1))
+            window = bundle.slice(window_start, end)
+            expected = load_window_bundle(self.user, window_start, end)
+            for field in fields(expected):
+                with self.subTest(days=days, field=field.name):
+                    np.testing.assert_array_equal(
+                        getattr(window, field.name), getattr(expected, field.name)
+                    )
+
+    def test_empty_bundle(self):
+        start, end = utc_day(NOW.date() + timedelta(days=30))
+        self.assertEqual(load_window_bundle(self.user, start, end).daily_averages(), {})
+
+
+def fake_shard(func_path, user_ids, *args, **kwargs):
+    return {"users": len(user_ids), "succeeded": len(user_ids), "failed": {}}
+
+
+class FakeExecutor:
+    """Runs submitted shards inline and records how the pool was created."""
+
+    created = []
+
+    def __init__(self, max_workers, mp_context=None):
+        self.mp_context = mp_context
+        self.warm = all(module in sys.modules for module in runner.WARM_MODULES)
+        self.created.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+
+
+def write_daily_summaries(user, writer, failing_user=None):
+    """Per-user shard function: buffer two days, then fail for failing_user."""
+    for days in (1, 2):
+        writer.add(
+            DailySummary,
+            user=user,
+            date=NOW.date() - timedelta(days=days),
+            defaults=summary_defaults(),
+        )
+    if user.username == failing_user:
+        raise ValueError("failed after writing")
+
+
+@override_settings(SUMMARY_RUN_STATS=False)
+class RunUserShardTest(TestCase):
+    """A failing user of a shard leaves none of its rows behind."""
+
+    func_path = "summary.tests.write_daily_summaries"
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = [User.objects.create(username=f"shard{i}") for i in range(3)]
+
+    def test_failing_user_rows_discarded(self):
+        with self.assertLogs(runner.logger, "ERROR"):
+            result = runner.run_user_shard(
+                self.func_path,
+                [user.id for user in self.users],
+                failing_user="shard1",
+            )
+
+        self.assertEqual(result["succeeded"], 2)
+        self.assertEqual(list(result["failed"]), [self.users[1].id])
+        self.assertCountEqual(
+            DailySummary.objects.values_list("user__username", flat=True),
+            ["shard0", "shard0", "shard2", "shard2"],
+        )
+
+    def test_atomic_holds_full_batches(self):
+        writer = SummaryWriter(batch_size=1)
+        with self.assertRaises(ValueError):
+            with writer.atomic():
+                write_daily_summaries(self.users[0], writer, failing_user="shard0")
+        self.assertFalse(DailySummary.objects.exists())
+
+        with writer.atomic():
+            write_daily_summaries(self.users[0], writer)
+        # Full batches are flushed when the block exits
+        self.assertEqual(DailySummary.objects.count(), 2)
+
+
+@override_settings(Q_BROKER="orm")
+@mock.patch.object(runner, "connections")
+@mock.patch.object(runner, "run_user_shard", side_effect=fake_shard)
+class RunnerPoolTest(SimpleTestCase):
+    func_path = "summary.tasks.create_daily_summary.create_daily_summary_for_user"
+
+    def setUp(self):
+        FakeExecutor.created = []
+
+    def test_forked_pool(self, run_user_shard, connections):
+        with mock.patch.object(runner, "ProcessPoolExecutor", FakeExecutor):
+            result = runner.run_for_users(
+                self.func_path, user_ids=[1, 2, 3], concurrency=2
+            )
+
+        (executor,) = FakeExecutor.created
+        self.assertEqual(executor.mp_context.get_start_method(), "fork")
+        self.assertTrue(executor.warm)
+        connections.close_all.assert_called_once()
+        self.assertEqual(run_user_shard.call_count, 2)
+        self.assertEqual(result, {"users": 3, "succeeded": 3, "failed": {}})
+
+    def test_inline_without_fork(self, run_user_shard, connections):
+        with (
+            mock.patch.object(runner, "ProcessPoolExecutor", FakeExecutor),
+            mock.patch.object(
+                runner.multiprocessing, "get_all_start_methods", return_value=["spawn"]
+            ),
+        ):
+            result = runner.run_for_users(
+                self.func_path, user_ids=[1, 2, 3], concurrency=2
+            )
+
+        self.assertEqual(FakeExecutor.created, [])
+        run_user_shard.assert_called_once_with(self.func_path, [1, 2, 3])
+        self.assertEqual(result["succeeded"], 3)
+
+
+@override_settings(Q_BROKER="orm", SUMMARY_CONCURRENCY=1)
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class DirtyRecomputeTest(TestCase):
+    """Ingestion marks days dirty, the recompute rebuilds and clears them."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 3, now=NOW)
+        self.yesterday = NOW.date() - timedelta(days=1)
+
+    def test_recompute_cycle(self, now):
+        readings = CgmEntity.objects.filter(
+            user=self.user, timestamp__range=utc_day(self.yesterday)
+        ).order_by("timestamp")[:5]
+        mark_summary_days_dirty(readings, "timestamp")
+        # A device clock ahead of the server
+        future = DirtySummaryDay.objects.create(
+            user=self.user, date=NOW.date() + timedelta(days=2), marked_at=NOW
+        )
+
+        recompute_dirty_summaries()
+
+        self.assertTrue(
+            DailySummary.objects.filter(user=self.user, date=self.yesterday).exists()
+        )
+        # Every rolling window ending today that reaches back to yesterday
+        self.assertEqual(
+            set(
+                RollingSummary.objects.filter(
+                    user=self.user, end_date=NOW.date()
+                ).values_list("period_days", flat=True)
+            ),
+            {3, 7, 14, 30, 90},
+        )
+        self.assertQuerySetEqual(
+            DirtySummaryDay.objects.filter(user=self.user), [future]
+        )
+
+    def test_stored_past_windows(self, now):
+        create_daily_summaries(
+            self.user, [self.yesterday - timedelta(days=day) for day in range(3)]
+        )
+        create_rolling_summary_for_user(self.user, [1, 3], self.yesterday, NOW)
+        # An edit of yesterday's readings after its windows were stored
+        CgmEntity.objects.filter(
+            user=self.user, timestamp__range=utc_day(self.yesterday)
+        ).update(value_mgdl=300)
+        DirtySummaryDay.objects.create(
+            user=self.user, date=self.yesterday, marked_at=NOW
+        )
+
+        recompute_dirty_summaries()
+
+        # No 1-day window ending today contains yesterday, the stored one is
+        # rebuilt at its own end date
+        one_day = RollingSummary.objects.get(user=self.user, period_days=1)
+        self.assertEqual((one_day.end_date, one_day.glucose_avg), (self.yesterday, 300))
+        # The 3-day window ending today replaces the stored one
+        self.assertEqual(
+            list(
+                RollingSummary.objects.filter(
+                    user=self.user, period_days=3
+                ).values_list("end_date", flat=True)
+            ),
+            [NOW.date()],
+        )
+
+    def test_deleted_data(self, now):
+        create_daily_summaries(self.user, [self.yesterday])
+        CgmEntity.objects.filter(
+            user=self.user, timestamp__range=utc_day(self.yesterday)
+        ).delete()
+        DirtySummaryDay.objects.create(
+            user=self.user, date=self.yesterday, marked_at=NOW
+        )
+
+        recompute_dirty_summaries()
+
+        self.assertFalse(
+            DailySummary.objects.filter(user=self.user, date=self.yesterday).exists()
+        )
+        self.assertFalse(DirtySummaryDay.objects.filter(user=self.user).exists())
+
+    def test_shared_writer(self, now):
+        DirtySummaryDay.objects.create(
+            user=self.user, date=self.yesterday, marked_at=NOW
+        )
+        writer = SummaryWriter()
+        flush = writer.flush
+
+        def fail_final_flush(model=None):
+            if model is None:
+                raise RuntimeError("database unavailable")
+            flush(model)
+
+        # The markers stay when the buffered rows cannot be written
+        with mock.patch.object(writer, "flush", side_effect=fail_final_flush):
+            with self.assertRaises(RuntimeError):
+                recompute_dirty_summaries_for_user(self.user, NOW, writer=writer)
+        self.assertTrue(DirtySummaryDay.objects.filter(user=self.user).exists())
+
+        recompute_dirty_summaries_for_user(self.user, NOW, writer=writer)
+        self.assertTrue(
+            DailySummary.objects.filter(user=self.user, date=self.yesterday).exists()
+        )
+        self.assertFalse(DirtySummaryDay.objects.filter(user=self.user).exists())
+
+
+def reference_hourly_stats(timestamps, values, user_timezone):
+    """The pandas groupby-quantile path the histogram percentiles replaced."""
+    import pandas as pd
+
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(timestamps, unit="s", utc=True),
+            "value": values,
+        }
+    )
+    df["group"] = df["timestamp"].dt.tz_convert(user_timezone).dt.hour
+    stats = df.groupby("group")["value"].agg(
+        [
+            ("p_10", lambda x: x.quantile(0.10)),
+            ("p_25", lambda x: x.quantile(0.25)),
+            ("p_50", lambda x: x.quantile(0.50)),
+            ("p_75", lambda x: x.quantile(0.75)),
+            ("p_90", lambda x: x.quantile(0.90)),
+        ]
+    )
+    stats = pd.DataFrame(index=range(24)).join(stats, how="left")
+    return stats.interpolate(method="linear", limit_direction="both")
+
+
+class HistogramAgpTest(SimpleTestCase):
+    """AGP percentiles from merged histograms match the raw readings."""
+
+    user_timezone = "Europe/Berlin"
+
+    def make_days(self, days=5):
+        rng = np.random.default_rng(1)
+        start = 1_750_000_000
+        readings = []
+        for day in range(days):
+            timestamps = start + day * 86400 + 300 * np.arange(288)
+            # A sensor gap of several hours on every other day
+            if day % 2:
+                timestamps = timestamps[timestamps % 86400 > 6 * 3600]
+            values = rng.normal(140, 40, len(timestamps)).clip(40, 400).round()
+            readings.append((timestamps.astype(np.int64), values))
+        return readings
+
+    def test_matches_pandas_quantiles(self):
+        readings = self.make_days()
+        histogram = merge_hourly_histograms(
+            build_hourly_histogram(timestamps, values, self.user_timezone)
+            for timestamps, values in readings
+        )
+        timestamps = np.concatenate([timestamps for timestamps, _ in readings])
+        values = np.concatenate([values for _, values in readings])
+
+        expected = reference_hourly_stats(timestamps, values, self.user_timezone)
+        for stats in (
+            calculate_stats_from_histogram(histogram),
+            calculate_stats_from_arrays(timestamps, values, "hour", self.user_timezone),
+        ):
+            np.testing.assert_allclose(
+                stats[expected.columns].to_numpy(), expected.to_numpy()
+            )
+
+    def test_missing_hours(self):
+        # Readings in two hours only, the others are interpolated
+        timestamps = np.array([1_750_000_000 + 60 * i for i in range(30)])
+        timestamps = np.concatenate((timestamps, timestamps + 5 * 3600))
+        values = np.arange(len(timestamps), dtype=np.float64) + 100
+
+        histogram = build_hourly_histogram(timestamps, values, self.user_timezone)
+        np.testing.assert_allclose(
+            calculate_stats_from_histogram(histogram).to_numpy(),
+            reference_hourly_stats(timestamps, values, self.user_timezone).to_numpy(),
+        )
+
+    def test_empty(self):
+        self.assertEqual(build_hourly_histogram([], []), {})
+        self.assertTrue(calculate_stats_from_histogram({}).empty)
+
+
+class RollupTest(TestCase):
+    """Rolled up daily state matches the aggregates of the raw readings."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 8, now=NOW)
+        self.days = [NOW.date() - timedelta(days=i) for i in range(7, 0, -1)]
+        create_daily_summaries(self.user, self.days)
+
+    def raw_readings(self):
+        # The readings of every daily window, as the daily task fetched them
+        arrays = [
+            fetch_arrays(
+                CgmEntity.objects.filter(
+                    user=self.user, timestamp__range=utc_day(day)
+                ).order_by("timestamp"),
+                "timestamp",
+                "value_mgdl",
+            )
+            for day in self.days
+        ]
+        return (
+            np.concatenate([timestamps for timestamps, _ in arrays]),
+            np.concatenate([values for _, values in arrays]).astype(np.float64),
+        )
+
+    def test_matches_raw_aggregates(self):
+        rollup = rollup_summaries(
+            DailySummary.objects.filter(user=self.user).order_by("date")
+        )
+        timestamps, values = self.raw_readings()
+
+        self.assertEqual(rollup["day_count"], len(self.days))
+        self.assertEqual(rollup["glucose_count"], len(values))
+        self.assertAlmostEqual(rollup["glucose_sum"], values.sum())
+        for field, value in calculate_cgm_stats_from_values(values).items():
+            with self.subTest(field=field):
+                self.assertEqual(rollup[field], value)
+
+        user_timezone = self.user.settings.timezone
+        np.testing.assert_allclose(
+            calculate_stats_from_histogram(rollup["agp_histogram"]).to_numpy(),
+            calculate_stats_from_arrays(
+                timestamps, values, "hour", user_timezone
+            ).to_numpy(),
+        )
+
+    def test_falls_back_without_state(self):
+        # Summaries written before the state was stored
+        DailySummary.objects.filter(user=self.user, date=self.days[0]).update(
+            glucose_count=0, agp_histogram=None
+        )
+        summaries = list(DailySummary.objects.filter(user=self.user))
+        rollup = rollup_summaries(summaries)
+
+        self.assertIsNone(rollup["agp_histogram"])
+        self.assertEqual(
+            rollup["glucose_std"],
+            round(np.mean([summary.glucose_std for summary in summaries])),
+        )
+
+
+def summary_defaults(**overrides):
+    """Values of the required summary fields."""
+    return {
+        "glucose_avg": 140,
+        "glucose_std": 40,
+        "time_in_range": 70,
+        "time_below_range": 5,
+        "time_above_range": 25,
+        "daily_cgm_coverage": 95,
+        "daily_total_bolus": 20.0,
+        "daily_total_meals": 3,
+        "daily_total_carbs": 180,
+        "daily_total_proteins": 80,
+        "daily_total_fats": 60,
+        "daily_total_calories": 1800,
+        **overrides,
+    }
+
+
+class SummaryWriterTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="writer")
+        self.day = NOW.date()
+
+    def test_upsert_updates_defaults_only(self):
+        DailySummary.objects.create(
+            user=self.user,
+            date=self.day,
+            agp_histogram={"0": {"100": 1}},
+            **summary_defaults(),
+        )
+
+        with SummaryWriter() as writer:
+            writer.add(
+                DailySummary,
+                user=self.user,
+                date=self.day,
+                defaults=summary_defaults(glucose_avg=150),
+            )
+
+        summary = DailySummary.objects.get(user=self.user, date=self.day)
+        self.assertEqual(summary.glucose_avg, 150)
+        # Not in defaults, so left as it was
+        self.assertEqual(summary.agp_histogram, {"0": {"100": 1}})
+
+    def test_last_add_wins(self):
+        with SummaryWriter() as writer:
+            for glucose_avg in (120, 130):
+                writer.add(
+                    DailySummary,
+                    user=self.user,
+                    date=self.day,
+                    defaults=summary_defaults(glucose_avg=glucose_avg),
+                )
+
+        self.assertQuerySetEqual(
+            DailySummary.objects.values_list("glucose_avg", flat=True), [130]
+        )
+
+    def test_flushes_full_batches(self):
+        writer = SummaryWriter(batch_size=2)
+        for days in range(3):
+            writer.add(
+                DailySummary,
+                user=self.user,
+                date=self.day - timedelta(days=days),
+                defaults=summary_defaults(),
+            )
+        self.assertEqual(DailySummary.objects.count(), 2)
+
+        writer.flush()
+        self.assertEqual(DailySummary.objects.count(), 3)
+
+    def test_no_flush_on_error(self):
+        with self.assertRaises(ValueError):
+            with SummaryWriter() as writer:
+                writer.add(
+                    DailySummary,
+                    user=self.user,
+                    date=self.day,
+                    defaults=summary_defaults(),
+                )
+                raise ValueError
+        self.assertFalse(DailySummary.objects.exists())
+
+    def add_rolling(self, writer, end_date, period_days):
+        writer.replace(
+            RollingSummary,
+            "end_date",
+            user=self.user,
+            end_date=end_date,
+            period_days=period_days,
+            defaults=summary_defaults(
+                start_date=end_date - timedelta(days=period_days - 1)
+            ),
+        )
+
+    def test_rolling_keeps_latest_per_period(self):
+        yesterday = self.day - timedelta(days=1)
+        with mock.patch("django.utils.timezone.now", return_value=NOW):
+            with SummaryWriter() as writer:
+                self.add_rolling(writer, yesterday, 7)
+                self.add_rolling(writer, yesterday, 30)
+
+        later = NOW + timedelta(days=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            with SummaryWriter() as writer:
+                self.add_rolling(writer, self.day, 7)
+                self.add_rolling(writer, yesterday, 30)
+
+        self.assertQuerySetEqual(
+            RollingSummary.objects.order_by("period_days").values_list(
+                "period_days", "end_date"
+            ),
+            [(7, self.day), (30, yesterday)],
+        )
+        # auto_now fields are updated on conflict
+        self.assertEqual(RollingSummary.objects.get(period_days=30).updated_at, later)
+
+    def test_rolling_same_group_in_one_batch(self):
+        with SummaryWriter() as writer:
+            self.add_rolling(writer, self.day - timedelta(days=1), 7)
+            self.add_rolling(writer, self.day, 7)
+
+        self.assertQuerySetEqual(
+            RollingSummary.objects.values_list("end_date", flat=True), [self.day]
+        )
+
+    def test_rolling_older_end_date_keeps_newer(self):
+        with SummaryWriter() as writer:
+            self.add_rolling(writer, self.day, 7)
+        # A backfill or recompute of an earlier window
+        with SummaryWriter() as writer:
+            self.add_rolling(writer, self.day - timedelta(days=3), 7)
+
+        self.assertQuerySetEqual(
+            RollingSummary.objects.values_list("end_date", flat=True),
+            [self.day, self.day - timedelta(days=3)],
+        )
+
+    def test_add_never_deletes(self):
+        with SummaryWriter() as writer:
+            self.add_rolling(writer, self.day - timedelta(days=1), 7)
+        with SummaryWriter() as writer:
+            writer.add(
+                RollingSummary,
+                user=self.user,
+                end_date=self.day,
+                period_days=7,
+                defaults=summary_defaults(start_date=self.day - timedelta(days=6)),
+            )
+
+        self.assertEqual(RollingSummary.objects.count(), 2)
+
+
+PERIOD_TASKS = {
+    WeeklySummary: create_weekly_summary_for_user,
+    MonthlySummary: create_monthly_summary_for_user,
+    QuarterlySummary: create_quarterly_summary_for_user,
+}
+
+
+def summary_rows(model):
+    """Stored summaries keyed by their unique fields, without ids and timestamps."""
+    unique_fields = model._meta.unique_together[0]
+    rows = {}
+    for row in model.objects.values():
+        row = {
+            field: value
+            for field, value in row.items()
+            if field not in ("id", "updated_at", "created_at")
+        }
+        rows[tuple(row[f"{f}_id" if f == "user" else f] for f in unique_fields)] = row
+    return rows
+
+
+@override_settings(Q_BROKER="orm", SUMMARY_CONCURRENCY=1)
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class BackfillTest(TestCase):
+    """The single-pass backfill writes what the per-day and period tasks write."""
+
+    start_date = date(2025, 4, 20)
+    end_date = date(2025, 6, 17)
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 60, now=NOW)
+
+    def assertSummariesEqual(self, expected, actual):
+        self.assertEqual(expected.keys(), actual.keys())
+        for key, row in expected.items():
+            for field, value in row.items():
+                with self.subTest(key=key, field=field):
+                    if isinstance(value, float):
+                        self.assertAlmostEqual(actual[key][field], value, places=6)
+                    else:
+                        self.assertEqual(actual[key][field], value)
+
+    def test_matches_daily_and_period_tasks(self, now):
+        result = backfill_summaries(self.start_date, self.end_date)
+        self.assertEqual(result, {"users": 1, "succeeded": 1, "failed": {}})
+        backfilled = {
+            model: summary_rows(model)
+            for model in (DailySummary, WeeklySummary, MonthlySummary)
+        }
+        for model in backfilled:
+            model.objects.all().delete()
+
+        days = (self.end_date - self.start_date).days + 1
+        create_daily_summaries(
+            self.user, [self.start_date + timedelta(days=i) for i in range(days)]
+        )
+        for model, lookup, period_start, period_end in _complete_periods(
+            self.start_date, self.end_date
+        ):
+            PERIOD_TASKS[model](self.user, *lookup.values(), period_start, period_end)
+
+        self.assertEqual(len(backfilled[MonthlySummary]), 1)
+        for model, rows in backfilled.items():
+            with self.subTest(model=model.__name__):
+                self.assertSummariesEqual(summary_rows(model), rows)
+
+    def test_fetch_blocks(self, now):
+        results = []
+        for fetch_days in (365, 4):
+            with mock.patch.object(backfill_module, "FETCH_DAYS", fetch_days):
+                backfill_summaries(self.start_date, self.end_date)
+            results.append(
+                {
+                    model: summary_rows(model)
+                    for model in (DailySummary, WeeklySummary, MonthlySummary)
+                }
+            )
+            for model in results[-1]:
+                model.objects.all().delete()
+
+        for model, rows in results[0].items():
+            with self.subTest(model=model.__name__):
+                self.assertTrue(rows)
+                self.assertSummariesEqual(rows, results[1][model])
+
+    def test_complete_periods(self, now):
+        periods = [
+            (model.__name__, lookup, period_start, period_end)
+            for model, lookup, period_start, period_end in _complete_periods(
+                date(2025, 3, 30), date(2025, 7, 1)
+            )
+        ]
+        weeks = [period for period in periods if period[0] == "WeeklySummary"]
+        self.assertEqual(
+            weeks[0],
+            (
+                "WeeklySummary",
+                {"year": 2025, "week": 14},
+                date(2025, 3, 31),
+                date(2025, 4, 6),
+            ),
+        )
+        self.assertEqual(weeks[-1][3], date(2025, 6, 29))
+        self.assertEqual(len(weeks), 13)
+        self.assertEqual(
+            [period for period in periods if period[0] != "WeeklySummary"],
+            [
+                (
+                    "MonthlySummary",
+                    {"year": 2025, "month": 4},
+                    date(2025, 4, 1),
+                    date(2025, 4, 30),
+                ),
+                (
+                    "MonthlySummary",
+                    {"year": 2025, "month": 5},
+                    date(2025, 5, 1),
+                    date(2025, 5, 31),
+                ),
+                (
+                    "MonthlySummary",
+                    {"year": 2025, "month": 6},
+                    date(2025, 6, 1),
+                    date(2025, 6, 30),
+                ),
+                (
+                    "QuarterlySummary",
+                    {"year": 2025, "quarter": 2},
+                    date(2025, 4, 1),
+                    date(2025, 6, 30),
+                ),
+            ],
+        )
+
+    @override_settings(SUMMARY_CHUNK_SIZE=1)
+    def test_checkpoint_inside_cluster(self, now):
+        generate_bench_data(1, 2, now=NOW, seed=1)
+        checkpoint = self.enterContext(tempfile.TemporaryDirectory())
+        path = os.path.join(checkpoint, "backfill.json")
+
+        with mock.patch.object(runner, "_in_cluster", return_value=True):
+            result = backfill_summaries(
+                self.end_date, self.end_date, checkpoint_path=path
+            )
+
+        # The shards ran here instead of being enqueued
+        self.assertEqual(result, {"users": 2, "succeeded": 2, "failed": {}})
+        self.assertEqual(DailySummary.objects.filter(date=self.end_date).count(), 2)
+        with open(path) as f:
+            self.assertEqual(len(json.load(f)["completed_user_ids"]), 2)
+
+
+class TimezoneOffsetTest(SimpleTestCase):
+    """Cached offset transitions match pytz around DST changes."""
+
+    def around(self, moment: datetime, hours=3):
+        # Every 15 minutes from a few hours before to a few hours after
+        center = int(moment.timestamp())
+        return center + 900 * np.arange(-4 * hours, 4 * hours + 1)
+
+    def reference_offsets(self, timestamps, zone):
+        tz = pytz.timezone(zone)
+        return [
+            int(
+                datetime.fromtimestamp(int(ts), dt_timezone.utc)
+                .astimezone(tz)
+                .utcoffset()
+                .total_seconds()
+            )
+            for ts in timestamps
+        ]
+
+    def test_dst_transitions(self):
+        cases = {
+            # Spring forward and fall back at 01:00 UTC
+            "Europe/Berlin": (
+                datetime(2025, 3, 30, 1, tzinfo=dt_timezone.utc),
+                datetime(2025, 10, 26, 1, tzinfo=dt_timezone.utc),
+            ),
+            "America/New_York": (
+                datetime(2025, 3, 9, 7, tzinfo=dt_timezone.utc),
+                datetime(2025, 11, 2, 6, tzinfo=dt_timezone.utc),
+            ),
+            # Southern hemisphere, DST ends in April
+            "Australia/Sydney": (
+                datetime(2025, 4, 5, 16, tzinfo=dt_timezone.utc),
+                datetime(2025, 10, 4, 16, tzinfo=dt_timezone.utc),
+            ),
+            "UTC": (datetime(2025, 3, 30, 1, tzinfo=dt_timezone.utc),),
+        }
+        for zone, transitions in cases.items():
+            for transition in transitions:
+                with self.subTest(zone=zone, transition=transition):
+                    timestamps = self.around(transition)
+                    expected = self.reference_offsets(timestamps, zone)
+                    self.assertEqual(utc_offsets(timestamps, zone).tolist(), expected)
+                    self.assertEqual(
+                        local_hours(timestamps, pytz.timezone(zone)).tolist(),
+                        [
+                            (int(ts) + offset) // 3600 % 24
+                            for ts, offset in zip(timestamps, expected)
+                        ],
+                    )
+
+    def test_fall_back_repeats_an_hour(self):
+        timestamps = self.around(
+            datetime(2025, 10, 26, 1, tzinfo=dt_timezone.utc), hours=1
+        )
+        hours = local_hours(timestamps, "Europe/Berlin").tolist()
+        # 02:xx local time occurs before and after the transition
+        self.assertEqual(hours, [2] * 4 + [2] * 4 + [3])
+
+    def test_default_timezone(self):
+        timestamps = self.around(datetime(2025, 3, 30, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            utc_offsets(timestamps).tolist(),
+            utc_offsets(timestamps, "Europe/Berlin").tolist(),
+        )
+        self.assertEqual(get_user_timezone(get_user_model()()), "Europe/Berlin")
+
+
+class RunStatsTest(TestCase):
+    """Per-phase wall time and queries of a shard run."""
+
+    def setUp(self):
+        self.clock = 0.0
+        perf_counter = self.enterContext(
+            mock.patch("summary.services.run_stats.time")
+        ).perf_counter
+        perf_counter.side_effect = lambda: self.clock
+
+    def tick(self, ms):
+        self.clock += ms / 1000
+
+    def query(self):
+        get_user_model().objects.exists()
+
+    def test_phase_totals(self):
+        stats = RunStats("summary.tasks.create_daily_summary.create_daily_summary")
+        with stats.record():
+            self.tick(1)
+            with stats.user(1):
+                self.tick(2)
+                with phase("fetch"):
+                    self.query()
+                    self.tick(10)
+                    with phase("stats"):
+                        self.tick(5)
+            with self.assertRaises(ValueError), stats.user(2):
+                with phase("write"):
+                    self.query()
+                    self.query()
+                    self.tick(3)
+                    raise ValueError
+            self.tick(4)
+        stats.save()
+
+        row = SummaryRunStats.objects.get()
+        self.assertEqual(row.duration_ms, 25.0)
+        self.assertEqual((row.users, row.failed, row.queries), (2, 1, 3))
+        self.assertEqual(
+            row.phases,
+            {
+                "other": {"ms": 7.0, "queries": 0},
+                "fetch": {"ms": 10.0, "queries": 1},
+                "stats": {"ms": 5.0, "queries": 0},
+                "write": {"ms": 3.0, "queries": 2},
+            },
+        )
+        self.assertEqual(
+            [(u["user_id"], u["ms"], u["failed"]) for u in row.slowest_users],
+            [(1, 17.0, False), (2, 3.0, True)],
+        )
+
+    def test_phase_outside_run(self):
+        with phase("fetch"):
+            self.query()
+        self.assertFalse(SummaryRunStats.objects.exists())
+
+    def test_log_sampled(self):
+        log = logging.getLogger("summary.tests.sampled")
+        with self.assertNoLogs(log, "DEBUG"):
+            log_sampled(log, "user %s", 1, rate=0.0)
+        with self.assertLogs(log, "DEBUG") as logs:
+            log_sampled(log, "user %s", 1, rate=1.0)
+        self.assertEqual(logs.output, ["DEBUG:summary.tests.sampled:user 1"])
+
+        draws = random.Random(7)
+        expected = sum(draws.random() < 0.1 for _ in range(200))
+        rng = random.Random(7)
+        with self.assertLogs(log, "DEBUG") as logs:
+            for user_id in range(200):
+                log_sampled(log, "user %s", user_id, rate=0.1, rng=rng)
+        self.assertEqual(len(logs.output), expected)
+
+        log.setLevel(logging.INFO)
+        self.addCleanup(log.setLevel, logging.NOTSET)
+        rng = mock.Mock()
+        log_sampled(log, "user %s", 1, rate=1.0, rng=rng)
+        rng.random.assert_not_called()
+
+
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class RunStatsRetentionTest(TestCase):
+    """Run stats are pruned daily after the retention."""
+
+    def create_run_stats(self, days_ago):
+        return SummaryRunStats.objects.create(
+            task="summary.tasks.create_daily_summary.create_daily_summary",
+            started_at=NOW - timedelta(days=days_ago),
+            duration_ms=1.0,
+            users=1,
+            queries=1,
+            phases={},
+            slowest_users=[],
+        )
+
+    @override_settings(SUMMARY_RUN_STATS_RETENTION_DAYS=7)
+    def test_prune_keeps_retention(self, now):
+        kept = [self.create_run_stats(days_ago) for days_ago in (0, 3, 6.9, 7)]
+        for days_ago in (7.1, 30):
+            self.create_run_stats(days_ago)
+
+        self.assertEqual(prune_run_stats(), 2)
+        self.assertCountEqual(SummaryRunStats.objects.all(), kept)
+        self.assertEqual(prune_run_stats(days=1), 3)
+
+    def test_daily_schedule(self, now):
+        Schedule.objects.filter(func=PRUNE_RUN_STATS_FUNC).delete()
+        create_summary_schedules(sender=None)
+        create_summary_schedules(sender=None)
+
+        schedule = Schedule.objects.get(func=PRUNE_RUN_STATS_FUNC)
+        self.assertEqual(schedule.schedule_type, Schedule.DAILY)
+        self.assertEqual(schedule.repeats, -1)
+        self.assertEqual(schedule.cluster, BATCH)
+        self.assertGreater(schedule.next_run, NOW)
+        self.assertLessEqual(schedule.next_run, NOW + timedelta(days=1))
+
+
+def use_local_broker(test):
+    """Enqueue the tasks of a test on the in-memory LocalBroker."""
+    test.enterContext(
+        mock.patch.object(
+            django_q.conf.Conf, "BROKER_CLASS", "core.brokers.LocalBroker"
+        )
+    )
+    test.enterContext(override_settings(Q_BROKER="local"))
+    test.addCleanup(LocalBroker.reset)
+
+
+@override_settings(SUMMARY_CONCURRENCY=2)
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class QueueRoutingTest(TestCase):
+    """Shards and schedules go to the queue of their task."""
+
+    def setUp(self):
+        use_local_broker(self)
+        self.users, _ = generate_bench_data(2, 2, now=NOW)
+        self.user_ids = [user.id for user in self.users]
+
+    def assertQueued(self, queue, count):
+        for other in (REALTIME, ROLLING, BATCH):
+            with self.subTest(queue=other):
+                self.assertEqual(
+                    LocalBroker.queued(other), count if other == queue else 0
+                )
+
+    def assertDrained(self, queue, count):
+        self.assertEqual(LocalBroker.drain(queue), count)
+        self.assertEqual(Task.objects.filter(success=False).count(), 0)
+
+    def test_dirty_recompute_on_realtime(self, now):
+        yesterday = NOW.date() - timedelta(days=1)
+        mark_summary_days_dirty(
+            CgmEntity.objects.filter(timestamp__range=utc_day(yesterday)),
+            "timestamp",
+        )
+
+        recompute_dirty_summaries()
+
+        self.assertQueued(REALTIME, 2)
+        self.assertDrained(REALTIME, 2)
+        self.assertFalse(DirtySummaryDay.objects.exists())
+        self.assertEqual(DailySummary.objects.filter(date=yesterday).count(), 2)
+
+    def test_rolling_on_rolling(self, now):
+        create_rolling_summary(period_days_list=[1], user_ids=self.user_ids)
+
+        self.assertQueued(ROLLING, 2)
+        self.assertDrained(ROLLING, 2)
+        self.assertEqual(RollingSummary.objects.filter(period_days=1).count(), 2)
+
+    def test_daily_on_batch(self, now):
+        create_daily_summary(user_ids=self.user_ids)
+
+        self.assertQueued(BATCH, 2)
+        self.assertDrained(BATCH, 2)
+        self.assertEqual(
+            DailySummary.objects.filter(date=NOW.date() - timedelta(days=1)).count(),
+            2,
+        )
+
+    def test_schedules(self, now):
+        Schedule.objects.all().delete()
+        create_summary_schedules(sender=None)
+
+        clusters = dict(Schedule.objects.values_list("func", "cluster"))
+        self.assertEqual(
+            clusters,
+            {
+                "summary.tasks.nightly_summaries.run_nightly_summaries": BATCH,
+                "summary.tasks.recompute_dirty_summaries."
+                "recompute_dirty_summaries": REALTIME,
+                PRUNE_RUN_STATS_FUNC: BATCH,
+            },
+        )
+        for func, cluster in clusters.items():
+            with self.subTest(func=func):
+                self.assertEqual(get_queue(func), cluster)
+
+
+# A Monday on the 1st of a quarter, so the nightly chain runs every step
+CHAIN_NOW = datetime(2024, 7, 1, 0, 45, tzinfo=dt_timezone.utc)
+
+
+@override_settings(SUMMARY_CONCURRENCY=2, SUMMARY_CHUNK_SIZE=1)
+@mock.patch("django.utils.timezone.now", return_value=CHAIN_NOW)
+class NightlyChainTest(TestCase):
+    """Each step of a nightly shard reads the rows of the step before."""
+
+    def setUp(self):
+        use_local_broker(self)
+        self.users, _ = generate_bench_data(3, 2, now=CHAIN_NOW)
+
+    def test_chain_on_the_batch_queue(self, now):
+        async_task(NIGHTLY_FUNC, 0, 1, q_options={"cluster": get_queue(NIGHTLY_FUNC)})
+
+        # The steps ran inside the nightly task, none was enqueued in chunks
+        self.assertEqual(LocalBroker.drain(BATCH), 1)
+        self.assertEqual(Task.objects.filter(success=False).count(), 0)
+        yesterday = CHAIN_NOW.date() - timedelta(days=1)
+        for model, lookup in (
+            (DailySummary, {"date": yesterday}),
+            (WeeklySummary, {"year": 2024, "week": 26}),
+            (MonthlySummary, {"year": 2024, "month": 6}),
+            (QuarterlySummary, {"year": 2024, "quarter": 2}),
+        ):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(model.objects.filter(**lookup).count(), 3)
+
+        # Rolling summaries follow on their own queue and fan out in chunks
+        self.assertEqual(LocalBroker.queued(ROLLING), 1)
+        self.assertEqual(LocalBroker.drain(ROLLING), 4)
+        self.assertEqual(RollingSummary.objects.values("user").distinct().count(), 3)
+
+
+class NightlyOffsetTest(SimpleTestCase):
+    """Nightly shards start at stable, jittered points of their own slot."""
+
+    def test_jitter_is_deterministic_and_in_range(self):
+        for window in (0, 1, 7, 900, 3600):
+            for key in ("a", "b", f"{NIGHTLY_FUNC}:3/4"):
+                with self.subTest(window=window, key=key):
+                    jitter = get_jitter_seconds(key, window)
+                    self.assertEqual(get_jitter_seconds(key, window), jitter)
+                    self.assertGreaterEqual(jitter, 0)
+                    self.assertLess(jitter, max(1, window))
+
+        # sha256 based, so the same in every process (hash() is salted)
+        self.assertEqual(get_jitter_seconds(f"{NIGHTLY_FUNC}:0/1", 3600), 2121)
+
+    def test_shard_offsets_within_their_slot(self):
+        window = NIGHTLY_WINDOW_MINUTES * 60
+        for shards in (1, 2, 4, 7):
+            slot = window // shards
+            offsets = [
+                get_shard_offset(shard, shards).total_seconds()
+                for shard in range(shards)
+            ]
+            with self.subTest(shards=shards):
+                for shard, offset in enumerate(offsets):
+                    self.assertGreaterEqual(offset, shard * slot)
+                    self.assertLess(offset, (shard + 1) * slot)
+                self.assertEqual(offsets, sorted(offsets))
+        self.assertEqual(
+            [get_shard_offset(shard, 4).seconds for shard in range(4)],
+            [685, 1162, 2300, 2917],
+        )
+
+    def test_next_shard_run(self):
+        midnight = datetime(2025, 6, 18, tzinfo=dt_timezone.utc)
+        offset = get_shard_offset(1, 4)
+        for now, expected in (
+            (midnight, midnight + offset),
+            (midnight + offset - timedelta(seconds=1), midnight + offset),
+            (midnight + offset, midnight + timedelta(days=1) + offset),
+            (NOW, midnight + timedelta(days=1) + offset),
+        ):
+            with self.subTest(now=now):
+                self.assertEqual(get_next_shard_run(1, 4, now), expected)
+
+
+@override_settings(SUMMARY_SCHEDULE_SHARDS=3)
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class NightlyScheduleTest(TestCase):
+    """Schedules are created when missing and keep the edits of an operator."""
+
+    def setUp(self):
+        Schedule.objects.all().delete()
+
+    def nightly(self):
+        return Schedule.objects.filter(func=NIGHTLY_FUNC).order_by("name")
+
+    def test_shard_schedules(self, now):
+        create_summary_schedules(sender=None)
+
+        self.assertEqual(
+            [(s.name, s.args, s.next_run) for s in self.nightly()],
+            [
+                (
+                    f"Nightly summaries {shard + 1}/3",
+                    f"({shard}, 3)",
+                    get_next_shard_run(shard, 3, NOW),
+                )
+                for shard in range(3)
+            ],
+        )
+
+    def test_replaces_chained_schedules_once(self, now):
+        for func in CHAINED_FUNCS:
+            Schedule.objects.create(func=func, schedule_type=Schedule.DAILY)
+        create_summary_schedules(sender=None)
+        self.assertFalse(Schedule.objects.filter(func__in=CHAINED_FUNCS).exists())
+
+        # Added back by an operator after the shards exist
+        rolling = Schedule.objects.create(
+            func=CHAINED_FUNCS[-1], schedule_type=Schedule.HOURLY
+        )
+        create_summary_schedules(sender=None)
+        self.assertTrue(Schedule.objects.filter(pk=rolling.pk).exists())
+
+    def test_keeps_edited_schedules(self, now):
+        create_summary_schedules(sender=None)
+        next_run = NOW + timedelta(hours=5)
+        self.nightly().filter(name="Nightly summaries 2/3").update(
+            next_run=next_run, repeats=10
+        )
+        Schedule.objects.filter(func=PRUNE_RUN_STATS_FUNC).update(next_run=next_run)
+
+        create_summary_schedules(sender=None)
+
+        self.assertEqual(self.nightly().count(), 3)
+        edited = self.nightly().get(name="Nightly summaries 2/3")
+        self.assertEqual((edited.next_run, edited.repeats), (next_run, 10))
+        self.assertEqual(
+            Schedule.objects.get(func=PRUNE_RUN_STATS_FUNC).next_run, next_run
+        )
+
+    def test_shard_count_change(self, now):
+        create_summary_schedules(sender=None)
+        with override_settings(SUMMARY_SCHEDULE_SHARDS=2):
+            create_summary_schedules(sender=None)
+
+        self.assertEqual(
+            list(self.nightly().values_list("name", "args")),
+            [("Nightly summaries 1/2", "(0, 2)"), ("Nightly summaries 2/2", "(1, 2)")],
+        )
+
+
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class AgpChartPayloadTest(TestCase):
+    """Payloads are rebuilt on a target change, views only read them."""
+
+    def setUp(self):
+        (self.user,), _ = generate_bench_data(1, 3, now=NOW)
+        create_daily_summaries(
+            self.user, [NOW.date() - timedelta(days=day) for day in (1, 2, 3)]
+        )
+        create_rolling_summary_for_user(self.user, [3], NOW.date(), NOW)
+        self.summary = RollingSummary.objects.get(user=self.user)
+
+    def test_target_change_rebuilds_payload(self, now):
+        self.assertEqual(self.summary.agp_chart["target_range"], [70, 180])
+
+        self.user.settings.glucose_target_high = 160
+        self.user.settings.save()
+
+        self.summary.refresh_from_db()
+        self.assertEqual(
+            self.summary.agp_chart,
+            build_agp_chart_payload(self.summary.agp, (70, 160)),
+        )
+
+    def test_outdated_payload_is_not_stored(self, now):
+        RollingSummary.objects.update(agp_chart=None)
+        self.summary.refresh_from_db()
+
+        with self.assertNumQueries(0):
+            payload = get_agp_chart_payload(self.summary, (70, 180))
+
+        self.assertEqual(payload, build_agp_chart_payload(self.summary.agp, (70, 180)))
+        self.summary.refresh_from_db()
+        self.assertIsNone(self.summary.agp_chart)
@@ -5,7 +5,12 @@ from django.http import HttpResponseForbidden
 from django.shortcuts import render
 
 from charts.charts.agp.agp_chart import get_agp_chart
-from summary.services import get_agp_summary
+from charts.charts.cache import get_chart_cache_key, get_or_build_chart
+from summary.services import (
+    get_agp_chart_payload,
+    get_agp_summary,
+    get_user_target_range,
+)
 
 
 @login_required
@@ -22,7 +27,13 @@ def agp_visualization(request):
 
     if summary and summary.agp:
         try:
-            plotly_graph = get_agp_chart(summary.agp)
+            target_range = get_user_target_range(user)
+            plotly_graph = get_or_build_chart(
+                get_chart_cache_key(
+                    "agp", user.id, period_days, summary.updated_at, *target_range
+                ),
+                lambda: get_agp_chart(get_agp_chart_payload(summary, target_range)),
+            )
             agp_patterns = summary.agp_trends
         except Exception as e:
             error_message = f"Error creating graph: {e}"